@@ -1,6 +1,16 @@
+from typing import Iterable
+
 import streamlit as __st
+from config import speech_to_text_tool as __speech_to_text_tool
+from config import speech_tool as __speech_tool
 
 from app.types import UserData
+from lib import tracing as __tracing
+from lib.configs import STT_BACKEND as __STT_BACKEND
+from lib.limits import get_limiter as __get_limiter
+from lib.resume import ingest_resume as __ingest_resume
+from lib.resume import resume_types as __resume_types
+from lib.session import InterviewSession as __InterviewSession
 
 
 def sidebar():
@@ -51,7 +61,7 @@ def sidebar():
             # Resume uploader
             resume = __st.file_uploader(
                 label="Upload Resume",
-                type=["pdf", "docx"],
+                type=__resume_types(),
                 label_visibility="visible",
                 help="Upload your resume here",
             )
@@ -73,80 +83,194 @@ def sidebar():
                 if fullname and role and about:
                     __st.toast("Your data has been submitted successfully")
 
-                    # Save user data
-                    __st.session_state.user_data = UserData(
+                    # Save user data, keeping only a bounded summary of the resume instead of the upload
+                    summary = __ingest_resume(resume.getvalue(), resume.name) if resume else None
+                    if resume and summary is None:
+                        __st.warning(
+                            "Your resume could not be read, the questions will not be based on it"
+                        )
+                    user_data = UserData(
                         fullname=fullname,
                         role=role,
                         experience=experience,
                         about=about,
-                        resume=resume,
+                        resume=summary,
                     )
 
+                    # Generate the questions in the background while the greeting is shown
+                    __st.session_state.session.start(user_data)
+                    __st.session_state.session.generate()
+
+        # Questions and feedback read aloud
+        __st.toggle(
+            label="Read aloud", key="read_aloud", help="Read the questions and feedback aloud"
+        )
+
         __st.divider()
 
         # Footer - Copyright info
         __st.markdown(body="`©2023 by Omdena. All rights reserved.`", unsafe_allow_html=True)
 
 
-def chat() -> None:
-    # Check if user data is available in the session state
-    user_data = __st.session_state.user_data
+def debug_panel():
+    # Per-session cost and latency of the agent calls, only when tracing is enabled
+    if not __tracing.enabled():
+        return
 
-    # Display chat messages from history on app rerun
-    for message in __st.session_state.messages:
+    session: __InterviewSession = __st.session_state.session
+    totals = __tracing.totals(session.id)
+
+    with __st.sidebar.expander("Debug", expanded=False):
+        left, right = __st.columns(2)
+        left.metric("Agent calls", totals["calls"], help=f"{totals['errors']} failed")
+        right.metric("Estimated cost", f"${totals['cost']:.4f}")
+        left.metric("Prompt tokens", totals["prompt_tokens"])
+        right.metric("Completion tokens", totals["completion_tokens"])
+
+        __st.caption(
+            f"Time: {totals['duration']:.2f}s in calls, {totals['network']:.2f}s network, "
+            f"{totals['queue_wait']:.2f}s queued, {totals['parse'] * 1000:.1f}ms parsing"
+        )
+
+        # The provider queue shared by every session of the process
+        scheduler = __get_limiter("openai").stats()
+        __st.caption(
+            f"OpenAI queue: {scheduler['in_flight']} in flight, "
+            + ", ".join(
+                f"{scheduler['waiting'][priority]} {priority} waiting "
+                f"(p95 ≤ {scheduler['wait'][priority]['p95']}s)"
+                for priority in scheduler["waiting"]
+            )
+        )
+
+        spans = __tracing.spans(session.id)
+        if spans:
+            __st.dataframe(
+                [
+                    {
+                        "call": span["name"],
+                        "seconds": round(span["duration"], 3),
+                        "network": round(span["network"], 3),
+                        "tokens": span["prompt_tokens"] + span["completion_tokens"],
+                        "error": span["error"],
+                    }
+                    for span in reversed(spans)
+                ],
+                hide_index=True,
+            )
+
+
+def speak(text: str) -> None:
+    # A player per sentence, shown as soon as it is synthesized while the next ones are
+    tool = __speech_tool()
+    for audio in tool.stream(text):
+        __st.audio(audio, format=f"audio/{tool.format}")
+
+
+def render(messages: list, aloud: bool = False) -> None:
+    for message in messages:
         with __st.chat_message(message["role"]):
             __st.markdown(message["content"])
+            if aloud and message["role"] == "assistant":
+                speak(message["content"])
 
-    # React to user input
-    prompt = __st.chat_input("Start typing ...", disabled=not user_data)
 
-    if not user_data:
-        # Display welcome message from assistant if user data is None
-        welcome_message = "Hi there! Before we start, please fill out the form so I can better assist you. 📝"
+def history(session: __InterviewSession) -> None:
+    # Older messages are collapsed, so each rerun renders the same few messages however long the chat
+    older = len(session.messages) - session.memory.window
+    if older <= 0:
+        render(session.messages)
+        return
 
-        # Add welcome message to chat history only if it's not already present
-        if not __st.session_state.messages or __st.session_state.messages[-1]["content"] != welcome_message:
-            with __st.chat_message("assistant"):
-                __st.markdown(welcome_message)
+    if __st.toggle(f"Show {older} earlier messages", key="show_history"):
+        render(session.messages[:older])
+    elif session.memory.summary:
+        __st.caption(session.memory.summary)
 
-            __st.session_state.messages.append({"role": "assistant", "content": welcome_message})
-    elif user_data and prompt:
-        # Display user message in chat message container
-        __st.chat_message("user").markdown(prompt)
+    render(session.messages[older:])
 
-        # Add user message to chat history
-        __st.session_state.messages.append({"role": "user", "content": prompt})
 
-        response = f"HR: {prompt}"
-        # Display assistant response in chat message container
-        with __st.chat_message("assistant"):
-            __st.markdown(response)
+def voice_input(session: __InterviewSession) -> str | None:
+    # Spoken answers, when speech-to-text is configured and Streamlit can record audio
+    if not __STT_BACKEND or not hasattr(__st, "audio_input"):
+        return None
 
-        # Add assistant response to chat history
-        __st.session_state.messages.append({"role": "assistant", "content": response})
+    # Load the speech model before offering the recorder, so a misconfigured backend or a
+    # missing model shows when the page renders rather than after the first answer
+    tool = __speech_to_text_tool()
 
-    # Greet the user and start the interview questions after successful form submission
-    if user_data and not __st.session_state.greeted:
-        # Greet the user with their name and the role they applied for
-        greeting_message = (
-            f"Hi {user_data['fullname']}! Welcome to the interview for the " f"{user_data['role']} position. 🌟"
-        )
-        with __st.chat_message("assistant"):
-            __st.markdown(greeting_message)
+    # A new recorder for each question
+    recording = __st.audio_input("Or answer aloud", key=f"voice_{len(session.state['answers'])}")
+    if recording is None:
+        return None
 
-        # Add greeting message to chat history
-        __st.session_state.messages.append({"role": "assistant", "content": greeting_message})
+    with __st.spinner("Transcribing your answer ..."):
+        return tool.run(recording.getvalue())
 
-        # Start asking interview questions
-        interview_start_message = (
-            "Let's get started with the interview questions. "
-            "I'll ask a series of questions, and you can respond when you're ready. 😊"
-        )
-        with __st.chat_message("assistant"):
-            __st.markdown(interview_start_message)
 
-        # Add interview start message to chat history
-        __st.session_state.messages.append({"role": "assistant", "content": interview_start_message})
+def write_stream(stream: Iterable[str]) -> str:
+    # Render text chunks as they arrive, st.write_stream only exists from Streamlit 1.31
+    if hasattr(__st, "write_stream"):
+        return __st.write_stream(stream)
+
+    placeholder = __st.empty()
+    placeholder.markdown("▌")
+
+    text = ""
+    for chunk in stream:
+        text += chunk
+        placeholder.markdown(text + "▌")
+
+    placeholder.markdown(text)
+
+    return text
+
+
+def stream_message(stream: Iterable[str], aloud: bool = False) -> None:
+    # An assistant message shown as it is produced, recorded by the session once complete
+    with __st.chat_message("assistant"):
+        text = write_stream(stream)
+        if aloud:
+            speak(text)
+
+
+def chat() -> None:
+    session: __InterviewSession = __st.session_state.session
+    user_data = session.state["user_data"]
+    # Only the new messages are read aloud, not the history shown again on reruns
+    aloud = __st.session_state.get("read_aloud", False)
+
+    # Ask for the form data before the interview starts
+    session.welcome()
+
+    # Display chat messages from history on app rerun
+    history(session)
+
+    # React to user input
+    prompt = __st.chat_input("Start typing ...", disabled=not user_data)
+    if not prompt and user_data and session.phase == "collect":
+        prompt = voice_input(session)
+
+    if user_data and prompt and session.phase == "collect":
+        # Record the answer, it is evaluated in the background while the interview goes on
+        shown = len(session.messages)
+        session.collect(prompt)
+        render(session.messages[shown:], aloud)
+
+        # Ask the next question
+        if session.phase == "ask":
+            stream_message(session.stream_ask(), aloud)
+
+        # Report the evaluations once the last question has been answered, each one as it is done
+        if session.phase == "evaluate":
+            stream_message(session.stream_evaluate(), aloud)
+
+    # Greet the user and start the interview questions after successful form submission
+    if user_data and session.phase == "greet":
+        shown = len(session.messages)
+        session.greet()
+        render(session.messages[shown:], aloud)
 
-        # Mark the user as greeted to avoid repeating this section
-        __st.session_state.greeted = True
+        # The first question has been generated in the background since the form submit, it is
+        # shown as soon as the model has written it
+        stream_message(session.stream_ask(), aloud)
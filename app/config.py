@@ -1,5 +1,19 @@
 import streamlit as __st
 
+from lib.agents import OpenAIConversationSummaryAgent as __ConversationSummaryAgent
+from lib.agents import OpenAIQuestionGeneratorAgent as __QuestionGeneratorAgent
+from lib.agents import OpenAIResponseEvaluationAgent as __ResponseEvaluationAgent
+from lib.clients import get_agent as __get_agent
+from lib.clients import get_semantic_cache as __get_semantic_cache
+from lib.configs import JOBS_APP_WORKERS as __JOBS_APP_WORKERS
+from lib.configs import JOBS_BACKEND as __JOBS_BACKEND
+from lib.jobs import JobWorker as __JobWorker
+from lib.jobs import get_job_queue as __get_job_queue
+from lib.retrieval import RetrievalQuestionGeneratorAgent as __RetrievalQuestionGeneratorAgent
+from lib.session import InterviewSession as __InterviewSession
+from lib.tools import SpeechToTextTool as __SpeechToTextTool
+from lib.tools import TextToSpeechTool as __TextToSpeechTool
+
 
 def page_config():
     # Set the page config
@@ -11,14 +25,47 @@ def page_config():
 
 
 def page_session():
-    # Initialize chat history
-    if "messages" not in __st.session_state:
-        __st.session_state.messages = []
+    if __JOBS_BACKEND == "sqlite" and __JOBS_APP_WORKERS > 0:
+        job_worker()
+
+    # The whole interview lives in one headless session, the app only renders it
+    if "session" not in __st.session_state:
+        __st.session_state.session = __InterviewSession(
+            question_agent(), evaluation_agent(), summary_agent=summary_agent()
+        )
+
+
+@__st.cache_resource
+def question_agent():
+    # Questions come from the local question bank, the model only writes them for roles it misses
+    return __RetrievalQuestionGeneratorAgent(fallback=__get_agent(__QuestionGeneratorAgent))
+
+
+@__st.cache_resource
+def evaluation_agent():
+    # One agent, connection pool and semantic cache per process, shared by every session and rerun
+    return __get_agent(__ResponseEvaluationAgent, semantic_cache=__get_semantic_cache())
+
+
+@__st.cache_resource
+def summary_agent():
+    # Summarizes the older messages of long interviews, shared like the other agents
+    return __get_agent(__ConversationSummaryAgent)
+
+
+@__st.cache_resource
+def job_worker():
+    # Evaluation workers in the app process, `python -m lib.jobs` runs them on their own instead
+    return __JobWorker(__get_job_queue(), workers=__JOBS_APP_WORKERS).start()
+
+
+@__st.cache_resource
+def speech_tool():
+    # One synthesis pool and audio cache per process, the same question is only synthesized once
+    return __TextToSpeechTool()
 
-    # Initialize user data
-    if "user_data" not in __st.session_state:
-        __st.session_state.user_data = None
 
-    # Initialize greeting
-    if "greeted" not in __st.session_state:
-        __st.session_state.greeted = False
+@__st.cache_resource
+def speech_to_text_tool():
+    # The speech model is loaded once per process
+    return __SpeechToTextTool()
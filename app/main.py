@@ -1,23 +1,26 @@
 import streamlit as st
-from components import chat, sidebar
+from components import chat, debug_panel, sidebar
 from config import page_config, page_session
 
 # from lib.agents import
 
 
 def main():
+    # Page config, before any other Streamlit command
+    page_config()
+
     # Page session
     page_session()
 
-    # Page config
-    page_config()
-
     # Sidebar
     sidebar()
 
     # Chat UI
     chat()
 
+    # Tracing totals of the session, when enabled
+    debug_panel()
+
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,3 @@
-from typing import Literal, TypedDict
+from lib.types import UserData
 
-from streamlit.runtime.uploaded_file_manager import UploadedFile
-
-
-class UserData(TypedDict):
-    fullname: str
-    role: str
-    experience: int | float
-    about: str
-    resume: UploadedFile | None
+__all__ = ["UserData"]
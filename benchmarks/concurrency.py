@@ -0,0 +1,136 @@
+"""
+Calls per second of the async agents at increasing concurrency against a local mock provider.
+
+Then checks that callers cancelled while waiting for a limiter slot, or for its rate, never
+keep the slot, whether they are cancelled directly or by the deadline of lib.retry. The exit
+status is 1 if one does.
+
+Usage:
+    python -m benchmarks.concurrency [--latency 0.05] [--calls 256]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.mock_server import MockServer
+
+CONCURRENCY = [1, 8, 64]
+
+
+async def measure(agent, concurrency: int, calls: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with gate:
+            return await agent.arun("Data Scientist with 3 years of experience in NLP.")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+
+    assert all(result is not None for result in results), "mock provider returned unparsable output"
+
+    return calls / elapsed
+
+
+async def measure_levels(agent, calls: int) -> list[float]:
+    return [await measure(agent, concurrency, calls) for concurrency in CONCURRENCY]
+
+
+async def cancel_waiters() -> int:
+    # One slot and 6 requests per minute: the first caller holds the slot, the second waits for
+    # it, the third for the rate, and all of them are cancelled midway
+    from lib.limits import ProviderLimiter
+
+    limiter = ProviderLimiter(max_concurrency=1, requests_per_minute=6)
+
+    async def hold(seconds: float):
+        async with limiter.slot():
+            await asyncio.sleep(seconds)
+
+    first = asyncio.create_task(hold(0.2))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(hold(0))
+    await asyncio.sleep(0.05)
+    second.cancel()
+    third = asyncio.create_task(hold(0))
+    await asyncio.sleep(0.3)
+    third.cancel()
+    await asyncio.gather(first, second, third, return_exceptions=True)
+
+    return limiter.in_flight
+
+
+async def deadline_waiters() -> int:
+    # The same waits, cut short by the retry deadline instead of an explicit cancel
+    from lib.limits import ProviderLimiter
+    from lib.retry import DeadlineExceeded, RetryPolicy, acall
+
+    limiter = ProviderLimiter(max_concurrency=1, requests_per_minute=6)
+    policy = RetryPolicy(max_attempts=1, deadline=0.1)
+
+    async def hold(seconds: float):
+        async with limiter.slot():
+            await asyncio.sleep(seconds)
+
+    # The first call takes the rate token, the next one waits for the rate
+    await hold(0)
+    for seconds in (0, 0.5):
+        try:
+            await acall(lambda: hold(seconds), policy, "mock")
+        except DeadlineExceeded:
+            pass
+
+    return limiter.in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="mock provider latency in seconds"
+    )
+    parser.add_argument("--calls", type=int, default=256, help="calls per concurrency level")
+    args = parser.parse_args()
+
+    with MockServer(latency=args.latency) as server:
+        # The SDKs and limiters read their settings on import
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{server.url}/v1",
+            COHERE_API_KEY="mock",
+            CO_API_URL=server.url,
+            OPENAI_MAX_CONCURRENCY=str(max(CONCURRENCY)),
+            OPENAI_REQUESTS_PER_MINUTE="0",
+            OPENAI_TOKENS_PER_MINUTE="0",
+            COHERE_MAX_CONCURRENCY=str(max(CONCURRENCY)),
+            COHERE_REQUESTS_PER_MINUTE="0",
+            COHERE_TOKENS_PER_MINUTE="0",
+            # Every call sends the same prompt, and must reach the mock provider
+            SINGLE_FLIGHT="false",
+        )
+        from lib.agents import CohereQuestionGeneratorAgent, OpenAIQuestionGeneratorAgent
+
+        agents = [OpenAIQuestionGeneratorAgent(), CohereQuestionGeneratorAgent()]
+
+        print(f"mock latency: {args.latency * 1000:.0f} ms, {args.calls} calls per level")
+        print(f"{'agent':<32}" + "".join(f"{f'c={c}':>12}" for c in CONCURRENCY))
+        for agent in agents:
+            rates = asyncio.run(measure_levels(agent, args.calls))
+            print(f"{type(agent).__name__:<32}" + "".join(f"{rate:>10.1f}/s" for rate in rates))
+
+    in_flight = asyncio.run(cancel_waiters())
+    print(f"slots held after cancelling the waiters: {in_flight}")
+    deadline_in_flight = asyncio.run(deadline_waiters())
+    print(f"slots held after the deadline of the waiters: {deadline_in_flight}")
+    if in_flight or deadline_in_flight:
+        print("FAIL: cancelled callers leaked limiter slots")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cold against warm call latency: a fresh SDK client per call, as on every Streamlit rerun before
+the shared client registry, against the shared keep-alive pool of `lib.clients`.
+
+Usage:
+    python -m benchmarks.connections [--calls 50]
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.mock_server import MockServer
+
+
+def measure(call, calls: int) -> list[float]:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=50, help="calls per configuration")
+    args = parser.parse_args()
+
+    with MockServer(latency=0.0) as server:
+        os.environ.update(OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{server.url}/v1")
+        from openai import OpenAI
+
+        from lib import clients
+
+        messages = [{"role": "user", "content": "Candidate Description:\nData Scientist"}]
+
+        def cold():
+            client = OpenAI(api_key="mock")
+            client.chat.completions.create(model="mock", messages=messages)
+            client.close()
+
+        def warm():
+            clients.get_openai_client().chat.completions.create(model="mock", messages=messages)
+
+        warm()
+
+        print(f"{'client':<28}{'p50':>10}{'mean':>10}")
+        for name, call in {"fresh client per call": cold, "shared pool": warm}.items():
+            latencies = measure(call, args.calls)
+            p50, mean = statistics.median(latencies), statistics.fmean(latencies)
+            print(f"{name:<28}{p50 * 1000:>8.2f}ms{mean * 1000:>8.2f}ms")
+
+        print(f"pool: {clients.pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Cold-start import time of the library, with budgets enforced through the exit status.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, several times,
+and the median cumulative time is compared with its budget. The first agent construction
+is timed the same way with only OpenAI enabled, and neither step may import the SDKs of
+providers that are not in use.
+
+Usage:
+    python -m benchmarks.import_time [--runs 5] [--budget lib.agents=250 ...]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Median milliseconds allowed for each import, and for building the first agent
+BUDGETS = {
+    "lib.configs": 10,
+    "lib.agents": 250,
+    "lib.session": 200,
+    "first agent": 900,
+}
+# Modules that importing the library must not load
+LAZY = ["openai", "cohere", "google.generativeai", "httpx", "numpy", "aiohttp"]
+FIRST_AGENT = """
+import time
+start = time.perf_counter()
+from lib.agents import OpenAIQuestionGeneratorAgent
+OpenAIQuestionGeneratorAgent()
+print(f"elapsed {(time.perf_counter() - start) * 1e6:.0f}")
+"""
+IMPORT_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_time(module: str) -> tuple[float, set[str]]:
+    # Cumulative milliseconds of `import module`, and the modules it loaded
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PROVIDERS": "openai"},
+    )
+
+    elapsed = 0.0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+
+        cumulative, _, name = match.groups()
+        loaded.add(name)
+        if name == module:
+            elapsed = int(cumulative) / 1000
+
+    return elapsed, loaded
+
+
+def first_agent() -> tuple[float, set[str]]:
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            FIRST_AGENT + "import sys\nprint('modules', ' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PROVIDERS": "openai", "OPENAI_API_KEY": "mock"},
+    )
+
+    lines = dict(line.split(" ", 1) for line in result.stdout.splitlines())
+
+    return int(lines["elapsed"]) / 1000, set(lines["modules"].split())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="NAME=MS",
+        help="override a budget, e.g. lib.agents=200",
+    )
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for budget in args.budget:
+        name, ms = budget.split("=")
+        budgets[name] = float(ms)
+
+    failures = []
+    print(f"{'measurement':<16}{'median':>10}{'budget':>10}  lazy modules loaded")
+    for name, budget in budgets.items():
+        runs = [
+            first_agent() if name == "first agent" else import_time(name) for _ in range(args.runs)
+        ]
+        median = statistics.median(elapsed for elapsed, _ in runs)
+        # Only OpenAI is enabled, the first agent may load it and the HTTP stack it uses
+        allowed = {"openai", "httpx"} if name == "first agent" else set()
+        loaded = sorted(module for module in LAZY if module not in allowed and module in runs[0][1])
+
+        print(f"{name:<16}{median:>8.1f}ms{budget:>8.0f}ms  {', '.join(loaded) or '-'}")
+        if median > budget:
+            failures.append(f"{name} took {median:.1f}ms, over its {budget:.0f}ms budget")
+        if loaded:
+            failures.append(f"{name} loaded {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
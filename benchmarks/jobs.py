@@ -0,0 +1,130 @@
+"""
+Throughput of the SQLite job queue at various worker counts.
+
+Each run fills a fresh queue with jobs whose handler sleeps like a provider call, then
+measures how fast the workers drain it, the latency of the jobs from submission to result,
+and the queue overhead per job compared with the ideal of `workers / latency` jobs per second.
+Workers are threads of this process, or with --processes one process each, like separate
+`python -m lib.jobs` workers sharing the database. The exit status is 1 if a job is lost or
+done more than once.
+
+Usage:
+    python -m benchmarks.jobs [--jobs 2000] [--latency 0.02] [--workers 1 4 16 64] [--processes]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from lib.jobs import JobQueue, JobWorker
+
+
+def sleep(payload: dict) -> dict:
+    time.sleep(payload["seconds"])
+    return {"index": payload["index"]}
+
+
+def serve(path: str, ready, stop) -> None:
+    # One worker process, like `python -m lib.jobs --workers 1`, the clock starts once all are up
+    worker = JobWorker(JobQueue(path), {"sleep": sleep}, workers=1, poll_interval=0.01)
+    ready.wait()
+    worker.start()
+    stop.wait()
+    worker.stop()
+
+
+def run(path: str, jobs: int, latency: float, workers: int, processes: bool) -> dict:
+    queue = JobQueue(path)
+
+    start = time.perf_counter()
+    for i in range(jobs):
+        queue.submit("sleep", {"index": i, "seconds": latency}, key=f"job:{i}")
+    submitted = time.perf_counter() - start
+
+    if processes:
+        context = multiprocessing.get_context("spawn")
+        ready, stop = context.Barrier(workers + 1), context.Event()
+        pool = [context.Process(target=serve, args=(path, ready, stop)) for _ in range(workers)]
+        for process in pool:
+            process.start()
+        ready.wait()
+    else:
+        pool = JobWorker(queue, {"sleep": sleep}, workers=workers, poll_interval=0.01).start()
+
+    start = time.perf_counter()
+    stats = queue.stats()
+    while stats["done"] + stats["failed"] < jobs:
+        time.sleep(0.01)
+        stats = queue.stats()
+    elapsed = time.perf_counter() - start
+
+    if processes:
+        stop.set()
+        for process in pool:
+            process.join()
+    else:
+        pool.stop()
+
+    rows = queue._connection().execute(
+        "SELECT attempts, updated_at - created_at, result FROM jobs WHERE status = 'done'"
+    )
+    attempts, latencies, indices = [], [], set()
+    for attempt, seconds, result in rows:
+        attempts.append(attempt)
+        latencies.append(seconds)
+        indices.add(result)
+
+    return {
+        "submit_per_second": jobs / submitted,
+        "per_second": jobs / elapsed,
+        "ideal_per_second": workers / latency if latency else float("inf"),
+        "p50": statistics.median(latencies),
+        "p95": statistics.quantiles(latencies, n=20)[-1],
+        "done": len(indices),
+        "reruns": sum(attempts) - len(attempts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--jobs", type=int, default=2000, help="jobs per run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per job")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--processes", action="store_true", help="one process per worker")
+    args = parser.parse_args()
+
+    failures = []
+    print(
+        f"{'workers':>8}{'submit/s':>10}{'jobs/s':>9}{'ideal/s':>9}{'efficiency':>12}"
+        f"{'p50 s':>8}{'p95 s':>8}{'reruns':>8}"
+    )
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "jobs.sqlite3")
+            result = run(path, args.jobs, args.latency, workers, args.processes)
+
+        efficiency = result["per_second"] / result["ideal_per_second"]
+        print(
+            f"{workers:>8}{result['submit_per_second']:>10.0f}{result['per_second']:>9.0f}"
+            f"{result['ideal_per_second']:>9.0f}{efficiency:>12.0%}"
+            f"{result['p50']:>8.2f}{result['p95']:>8.2f}{result['reruns']:>8}"
+        )
+        if result["done"] != args.jobs:
+            failures.append(f"{workers} workers finished {result['done']} of {args.jobs} jobs")
+        if result["reruns"]:
+            failures.append(f"{workers} workers ran {result['reruns']} jobs more than once")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
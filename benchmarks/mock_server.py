@@ -0,0 +1,322 @@
+"""
+Local mock of the OpenAI and Cohere HTTP APIs used by the agents.
+
+Point the SDKs at it with `OPENAI_BASE_URL=http://127.0.0.1:<port>/v1` and
+`CO_API_URL=http://127.0.0.1:<port>`.
+
+Run it standalone, e.g. for the load tests of another process, with:
+    python -m benchmarks.mock_server [--port 8000] [--latency 0.05] [--token-rate 0] [--error-rate 0]
+"""
+
+import argparse as _argparse
+import json as _json
+import random as _random
+import re as _re
+import threading as _threading
+import time as _time
+import uuid as _uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__all__ = ["MockServer"]
+
+QUESTIONS = [
+    {"question": "Tell me about yourself.", "type": "personal"},
+    {"question": "Why do you want this role?", "type": "role-specific"},
+    {"question": "Describe a conflict you resolved.", "type": "behavioural"},
+    {"question": "How would you handle a missed deadline?", "type": "situational"},
+]
+
+EVALUATION = {
+    "evaluation": "average",
+    "reason": "The response is relevant but lacks concrete examples.",
+    "feedback": "Use the STAR method and quantify the outcome.",
+    "samples": ["Good response 1", "Good response 2"],
+}
+
+
+SUMMARY = "The candidate introduced themselves and answered the first questions briefly."
+
+
+def completion_text(prompt: str) -> str:
+    """
+    Pick a canned completion that matches the kind of prompt.
+
+    Args:
+        prompt (str): The full prompt text sent by the agent.
+
+    Returns:
+        str: A JSON completion the agents can parse, or a plain text summary.
+    """
+
+    if "summarizing an interview" in prompt:
+        return SUMMARY
+
+    if "evaluating a candidate" in prompt:
+        # Packed evaluation requests number their items
+        ids = _re.findall(r"^ITEM (\d+):$", prompt, flags=_re.M)
+        if ids:
+            return _json.dumps([{"id": int(i), **EVALUATION} for i in ids])
+
+        return _json.dumps(EVALUATION)
+
+    return _json.dumps(QUESTIONS)
+
+
+def count_tokens(text: str) -> int:
+    # About four characters per token, like the real tokenizers on English text
+    return max(1, len(text) // 4)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockServer"
+    # Keep connections alive between requests like the real APIs do
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = _json.loads(self.rfile.read(length) or b"{}")
+
+        _time.sleep(self.server.latency)
+
+        status = self.server.inject_error()
+        if status is not None:
+            self._send_error(status)
+            return
+
+        if self.path.endswith("/chat/completions"):
+            prompt = "\n".join(message["content"] for message in body.get("messages", []))
+            text = completion_text(prompt)
+
+            if body.get("stream"):
+                self._send_stream(
+                    (
+                        f"data: {_json.dumps(self._openai_chunk(body, chunk))}\n\n"
+                        for chunk in self._chunks(text)
+                    ),
+                    "text/event-stream",
+                    end="data: [DONE]\n\n",
+                )
+                return
+
+            payload = {
+                "id": f"chatcmpl-{_uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(_time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": text},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": count_tokens(prompt),
+                    "completion_tokens": count_tokens(text),
+                    "total_tokens": count_tokens(prompt) + count_tokens(text),
+                },
+            }
+        elif self.path.endswith("/generate"):
+            prompt = body.get("prompt", "")
+            text = completion_text(prompt)
+            payload = {
+                "id": _uuid.uuid4().hex,
+                "generations": [{"id": _uuid.uuid4().hex, "text": text}],
+                "prompt": prompt,
+                "meta": {
+                    "api_version": {"version": "1"},
+                    "billed_units": {
+                        "input_tokens": count_tokens(prompt),
+                        "output_tokens": count_tokens(text),
+                    },
+                },
+            }
+
+            if body.get("stream"):
+                self._send_stream(
+                    (
+                        _json.dumps({"text": chunk, "is_finished": False}) + "\n"
+                        for chunk in self._chunks(text)
+                    ),
+                    "application/stream+json",
+                    end=_json.dumps(
+                        {"is_finished": True, "finish_reason": "COMPLETE", "response": payload}
+                    )
+                    + "\n",
+                )
+                return
+        else:
+            self.close_connection = True
+            self.send_error(404)
+            return
+
+        # Whole completions arrive after the time the model takes to write them
+        if self.server.token_rate:
+            _time.sleep(count_tokens(text) / self.server.token_rate)
+
+        data = _json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunks(self, text: str):
+        size = self.server.chunk_size
+        for i in range(0, len(text), size):
+            chunk = text[i : i + size]
+            if i and self.server.chunk_delay:
+                _time.sleep(self.server.chunk_delay)
+            if self.server.token_rate:
+                _time.sleep(count_tokens(chunk) / self.server.token_rate)
+
+            yield chunk
+
+    def _send_error(self, status: int):
+        data = _json.dumps({"error": {"message": "Injected error", "code": status}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("retry-after-ms", str(int(self.server.retry_after * 1000)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _openai_chunk(self, body: dict, content: str) -> dict:
+        return {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(_time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        }
+
+    def _send_stream(self, events, content_type: str, end: str):
+        # Response without a length, the body ends when the connection closes
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        for event in events:
+            self.wfile.write(event.encode())
+            self.wfile.flush()
+
+        self.wfile.write(end.encode())
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        chunk_size: int = 16,
+        chunk_delay: float = 0.0,
+        token_rate: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: tuple[int, ...] = (429, 500, 503),
+        retry_after: float = 0.05,
+        seed: int | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """
+        Mock provider server with a fixed per-request latency, a token rate and injected errors.
+
+        Args:
+            latency (float, optional): Seconds to sleep before answering. Defaults to 0.05.
+            chunk_size (int, optional): Characters per streamed chunk. Defaults to 16.
+            chunk_delay (float, optional): Seconds between streamed chunks. Defaults to 0.
+            token_rate (float, optional): Completion tokens written per second, 0 writes them
+                instantly. Defaults to 0.
+            error_rate (float, optional): Fraction of requests answered with an error. Defaults to 0.
+            error_statuses (tuple[int, ...], optional): The HTTP statuses of injected errors, picked
+                at random. Defaults to (429, 500, 503).
+            retry_after (float, optional): Seconds of the Retry-After of injected 429s. Defaults to 0.05.
+            seed (int | None, optional): Seed of the error injection. Defaults to None.
+            host (str, optional): The interface to bind. Defaults to "127.0.0.1".
+            port (int, optional): The port to bind, 0 picks a free one. Defaults to 0.
+        """
+
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+
+        self._random = _random.Random(seed)
+        self._lock = _threading.Lock()
+
+    def inject_error(self) -> int | None:
+        """
+        Count a request and decide whether it fails.
+
+        Returns:
+            int | None: The HTTP status of the injected error, or None to answer normally.
+        """
+
+        with self._lock:
+            self.requests += 1
+            if self._random.random() >= self.error_rate:
+                return None
+
+            self.errors += 1
+
+            return self._random.choice(self.error_statuses)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        _threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = _argparse.ArgumentParser(
+        description=__doc__, formatter_class=_argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="port to bind")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before answering")
+    parser.add_argument(
+        "--token-rate", type=float, default=0.0, help="completion tokens per second"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failed requests")
+    args = parser.parse_args()
+
+    server = MockServer(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"mock provider listening on {server.url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
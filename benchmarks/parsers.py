@@ -0,0 +1,75 @@
+"""
+Parse time of model outputs: `json.loads` with regex cleanup against the lenient parsers in `lib.parsers`.
+
+Usage:
+    python -m benchmarks.parsers [--repeat 20]
+"""
+
+import argparse
+import json
+import re
+import timeit
+
+from lib.parsers import IncrementalJSONParser, loads
+
+SIZES = [4, 100, 2000]
+CHUNK = 16
+
+
+def output(n_questions: int) -> str:
+    questions = [
+        {
+            "question": f'Question {i}: describe a time you had to "push back" on a deadline.',
+            "type": "situational",
+        }
+        for i in range(n_questions)
+    ]
+
+    # A fenced, prose-wrapped output with a trailing comma, as models tend to produce
+    return (
+        "Here are the questions:\n```json\n" + json.dumps(questions, indent=4)[:-1] + ",\n]\n```\n"
+    )
+
+
+def regex_loads(text: str):
+    text = re.sub(r"^.*?```(?:json)?\s*|\s*```.*$", "", text, flags=re.S)
+    text = re.sub(r",\s*([\]}])", r"\1", text)
+
+    return json.loads(text)
+
+
+def incremental(text: str):
+    parser = IncrementalJSONParser()
+    members = []
+    for i in range(0, len(text), CHUNK):
+        members.extend(parser.feed(text[i : i + CHUNK]))
+
+    return members
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per measurement")
+    args = parser.parse_args()
+
+    candidates = {
+        "json.loads + regex": regex_loads,
+        "parsers.loads": loads,
+        f"incremental ({CHUNK} char chunks)": incremental,
+    }
+
+    print(f"{'parser':<32}" + "".join(f"{f'{n} items':>14}" for n in SIZES))
+    for name, parse in candidates.items():
+        timings = []
+        for n in SIZES:
+            text = output(n)
+            assert len(parse(text)) == n
+            timings.append(min(timeit.repeat(lambda: parse(text), number=1, repeat=args.repeat)))
+
+        print(f"{name:<32}" + "".join(f"{t * 1e6:>11.0f} us" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
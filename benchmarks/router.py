@@ -0,0 +1,81 @@
+"""
+Tail latency of a single provider against the RouterAgent, with and without hedging.
+
+Fake providers sleep for latencies drawn from scripted distributions, so no network is involved.
+
+Usage:
+    python -m benchmarks.router [--calls 400] [--concurrency 16]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.router import RouterAgent
+
+
+class FakeAgent:
+    def __init__(
+        self, provider: str, median: float, tail: float, tail_rate: float, error_rate: float
+    ):
+        self.provider = provider
+        self.median = median
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.random = random.Random(provider)
+
+    def __call__(self, description: str, n_questions: int = 4):
+        # Mostly fast around the median, sometimes stuck in a slow tail
+        slow = self.random.random() < self.tail_rate
+        time.sleep(self.tail if slow else self.random.lognormvariate(0, 0.25) * self.median)
+
+        if self.random.random() < self.error_rate:
+            return None
+
+        return [{"question": "Tell me about yourself.", "type": "personal"}]
+
+
+def providers() -> list[FakeAgent]:
+    return [
+        FakeAgent("openai", median=0.05, tail=1.0, tail_rate=0.08, error_rate=0.01),
+        FakeAgent("cohere", median=0.08, tail=1.0, tail_rate=0.04, error_rate=0.02),
+        FakeAgent("palm", median=0.12, tail=1.5, tail_rate=0.05, error_rate=0.30),
+    ]
+
+
+def measure(agent, calls: int, concurrency: int) -> list[float]:
+    def call(_):
+        start = time.perf_counter()
+        agent("Data Scientist")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(call, range(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=400, help="calls per configuration")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent callers")
+    args = parser.parse_args()
+
+    configurations = {
+        "single provider (openai)": lambda: providers()[0],
+        "router": lambda: RouterAgent(providers()),
+        "router + hedging": lambda: RouterAgent(providers(), hedge=True),
+    }
+
+    print(f"{'configuration':<28}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, factory in configurations.items():
+        latencies = measure(factory(), args.calls, args.concurrency)
+        p50, p95, p99 = (statistics.quantiles(latencies, n=100)[q - 1] for q in (50, 95, 99))
+        print(f"{name:<28}{p50 * 1000:>8.0f}ms{p95 * 1000:>8.0f}ms{p99 * 1000:>8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Interactive latency under mixed load, with the fair-share scheduler and with a plain FIFO queue.
+
+Simulated provider calls share one limiter for a few seconds:
+- interview sessions ask for a question or an evaluation now and then;
+- a noisy session floods evaluations;
+- a bulk job keeps many batch calls queued.
+
+The calls only hold their slot for a fixed latency, no provider is involved.
+
+In the "fifo" run every call waits in one queue and spends tokens ahead of the budget, like the
+limiter before the scheduler. In the "fair" run the calls are scheduled by priority class and
+tenant. The table shows the slot waits of each kind of call and how many completed.
+
+The "app" run goes through InterviewSession and its worker pools like the Streamlit app, with
+mock agents that hold a limiter slot: noisy interviews flood evaluations while the sessions'
+interviews measure how long their first question takes, its latency included.
+
+The exit status is 1 if the p95 wait of the sessions' calls exceeds --bound with the scheduler,
+or their first question takes longer than --bound plus --latency in the app run.
+
+Usage:
+    python -m benchmarks.scheduler [--seconds 10] [--sessions 12] [--bound 1.0]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import threading
+import time
+
+from lib.limits import ProviderLimiter, scheduling
+from lib.session import InterviewSession
+from lib.types import UserData
+
+# Tokens of each kind of call, a prompt and its maximum completion
+TOKENS = {"question": 1500, "evaluation": 1200, "noisy": 1200, "batch": 2000}
+
+QUESTIONS = [
+    {"question": "Tell me about yourself.", "type": "personal"},
+    {"question": "Why do you want this role?", "type": "role-specific"},
+    {"question": "Describe a conflict you resolved.", "type": "behavioural"},
+    {"question": "How would you handle a missed deadline?", "type": "situational"},
+]
+
+USER_DATA = UserData(
+    fullname="Candidate", role="Data Scientist", experience=3, about="I like data", resume=None
+)
+
+
+def call(limiter: ProviderLimiter, kind: str, latency: float, waits: dict) -> None:
+    start = time.perf_counter()
+    with limiter.slot(TOKENS[kind]):
+        waits[kind].append(time.perf_counter() - start)
+        time.sleep(latency)
+
+
+def session(limiter, tenant, fair, stop, args, waits, seed) -> None:
+    # An interview: a question now and then, and the evaluation of each answer
+    rng = random.Random(seed)
+    with scheduling(tenant if fair else "all", "question"):
+        while not stop.wait(rng.expovariate(1 / args.think)):
+            kind = "question" if rng.random() < 0.3 else "evaluation"
+            with scheduling(priority=kind if fair else "question"):
+                call(limiter, kind, args.latency, waits)
+
+
+def flood(limiter, tenant, kind, fair, stop, args, waits) -> None:
+    # A caller that always has a call queued
+    priority = {"noisy": "evaluation", "batch": "batch"}[kind]
+    with scheduling(tenant if fair else "all", priority if fair else "question"):
+        while not stop.is_set():
+            call(limiter, kind, args.latency, waits)
+
+
+def simulate(fair: bool, args) -> tuple[dict, ProviderLimiter]:
+    # Without the scheduler every call is in the first class, it never waits for the budget
+    limiter = ProviderLimiter(
+        args.max_concurrency,
+        requests_per_minute=0,
+        tokens_per_minute=args.tokens_per_minute,
+        interactive_reserve=args.reserve if fair else 0,
+    )
+    waits = {kind: [] for kind in TOKENS}
+    stop = threading.Event()
+
+    threads = [
+        threading.Thread(target=session, args=(limiter, f"session-{i}", fair, stop, args, waits, i))
+        for i in range(args.sessions)
+    ]
+    threads += [
+        threading.Thread(target=flood, args=(limiter, "noisy", "noisy", fair, stop, args, waits))
+        for _ in range(args.noisy)
+    ]
+    threads += [
+        threading.Thread(target=flood, args=(limiter, "batch", "batch", fair, stop, args, waits))
+        for _ in range(args.batch)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return waits, limiter
+
+
+class MockQuestionAgent:
+    def __init__(self, limiter: ProviderLimiter, latency: float):
+        self.limiter = limiter
+        self.latency = latency
+
+    def stream(self, description: str):
+        with self.limiter.slot(TOKENS["question"]):
+            time.sleep(self.latency)
+        yield from QUESTIONS
+
+
+class MockEvaluationAgent:
+    def __init__(self, limiter: ProviderLimiter, latency: float):
+        self.limiter = limiter
+        self.latency = latency
+
+    def run(self, question: str, response: str):
+        with self.limiter.slot(TOKENS["evaluation"]):
+            time.sleep(self.latency)
+        return {"evaluation": "average", "reason": "", "feedback": "", "samples": None}
+
+
+def interview(question_agent, evaluation_agent, rng, think: float) -> float:
+    # One interview like the app runs it, returns the seconds until the first question
+    session = InterviewSession(question_agent, evaluation_agent)
+    session.start(USER_DATA)
+    session.greet()
+
+    start = time.perf_counter()
+    session.ask()
+    first = time.perf_counter() - start
+
+    while session.phase == "ask" or session.phase == "collect":
+        if session.phase == "ask":
+            session.ask()
+        time.sleep(rng.uniform(0, 2 * think))
+        session.collect("My answer")
+    session.evaluate()
+
+    return first
+
+
+def through_sessions(args) -> dict:
+    limiter = ProviderLimiter(
+        args.max_concurrency,
+        requests_per_minute=0,
+        tokens_per_minute=args.tokens_per_minute,
+        interactive_reserve=args.reserve,
+    )
+    question_agent = MockQuestionAgent(limiter, args.latency)
+    evaluation_agent = MockEvaluationAgent(limiter, args.latency)
+    waits = {"first question": [], "noisy interviews": []}
+    stop = threading.Event()
+
+    def candidate(seed: int, kind: str, think: float) -> None:
+        rng = random.Random(seed)
+        while not stop.is_set():
+            waits[kind].append(interview(question_agent, evaluation_agent, rng, think))
+            if kind == "first question":
+                stop.wait(rng.expovariate(1 / args.think))
+
+    threads = [
+        threading.Thread(target=candidate, args=(i, "first question", args.think / 4))
+        for i in range(args.sessions)
+    ]
+    threads += [
+        threading.Thread(target=candidate, args=(args.sessions + i, "noisy interviews", 0))
+        for i in range(args.noisy * 4)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return waits
+
+
+def quantile(values: list[float], q: float) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+
+    return statistics.quantiles(values, n=100, method="inclusive")[round(q * 100) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each run")
+    parser.add_argument("--sessions", type=int, default=12, help="interview sessions")
+    parser.add_argument("--think", type=float, default=2.0, help="seconds between session calls")
+    parser.add_argument("--noisy", type=int, default=8, help="threads of the noisy session")
+    parser.add_argument("--batch", type=int, default=48, help="threads of the bulk job")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per call")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="provider slots")
+    parser.add_argument("--tokens-per-minute", type=float, default=1_200_000)
+    parser.add_argument("--reserve", type=float, default=0.25, help="interactive reserve")
+    parser.add_argument("--bound", type=float, default=1.0, help="p95 of the sessions' calls")
+    args = parser.parse_args()
+
+    print(f"{'run':<6}{'calls of':<12}{'count':>7}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for fair in (False, True):
+        waits, limiter = simulate(fair, args)
+        for kind, values in waits.items():
+            print(
+                f"{'fair' if fair else 'fifo':<6}{kind:<12}{len(values):>7}"
+                f"{quantile(values, 0.5):>8.2f}{quantile(values, 0.95):>8.2f}"
+                f"{max(values, default=0):>8.2f}"
+            )
+
+    # The histograms the limiter exposes, from the last run
+    stats = limiter.stats()
+    print(
+        "\nfair limiter histograms: "
+        + ", ".join(f"{kind} wait p95 <= {stats['wait'][kind]['p95']}s" for kind in stats["wait"])
+        + f", queue depth p95 <= {stats['depth']['p95']}"
+    )
+
+    failures = []
+    interactive = quantile(waits["question"] + waits["evaluation"], 0.95)
+    if interactive > args.bound:
+        failures.append(f"interactive p95 wait {interactive:.2f}s exceeds {args.bound}s")
+
+    print(f"\n{'run':<6}{'seconds to':<18}{'count':>7}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for kind, values in through_sessions(args).items():
+        print(
+            f"{'app':<6}{kind:<18}{len(values):>7}{quantile(values, 0.5):>8.2f}"
+            f"{quantile(values, 0.95):>8.2f}{max(values, default=0):>8.2f}"
+        )
+        if kind == "first question" and quantile(values, 0.95) > args.bound + args.latency:
+            failures.append(
+                f"first question p95 {quantile(values, 0.95):.2f}s in the app run exceeds "
+                f"{args.bound + args.latency}s"
+            )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
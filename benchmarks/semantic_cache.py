@@ -0,0 +1,145 @@
+"""
+Hit rate of the semantic evaluation cache against agreement with a fresh evaluation.
+
+A synthetic corpus of candidate answers is built from stock answers with small rewordings,
+some of which change the answer quality. A rule-based judge stands in for the evaluation
+model: every answer is looked up in the cache, and a hit counts as agreeing when the cached
+evaluation matches the judge's fresh evaluation of the answer.
+
+Usage:
+    python -m benchmarks.semantic_cache [--answers 5000] [--seed 0]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from lib.cache import SemanticCache
+
+STOCK_ANSWERS = {
+    "Tell me about yourself.": [
+        "I am a data scientist with 3 years of experience building machine learning models "
+        "in python, and last year my churn model reduced customer churn by 12 percent",
+        "I recently graduated in computer science and I enjoy solving problems with data",
+        "I am a hard worker",
+    ],
+    "Why do you want this role?": [
+        "The role matches my experience in analytics and I want to grow into leading projects "
+        "where I can mentor others, as I did for 4 interns in my current team",
+        "I like the company and the role looks interesting to me",
+        "For the salary",
+    ],
+    "Describe a conflict you resolved.": [
+        "Two teammates disagreed on the data pipeline design, I set up a meeting where each "
+        "presented trade-offs and we agreed on a hybrid that cut runtime by 30 percent",
+        "I had a disagreement with a colleague and we talked it through until we agreed",
+        "I avoid conflicts",
+    ],
+    "How would you handle a missed deadline?": [
+        "I would tell the stakeholders as early as possible, agree on a reduced scope for the "
+        "first 2 weeks and share a new plan with daily progress updates",
+        "I would work extra hours and inform my manager about the delay",
+        "I never miss deadlines",
+    ],
+}
+
+SYNONYMS = {
+    "experience": "background",
+    "enjoy": "love",
+    "agreed": "settled",
+    "interesting": "exciting",
+    "colleague": "coworker",
+    "inform": "tell",
+    "reduced": "smaller",
+    "meeting": "call",
+}
+FILLERS = ["Well,", "Honestly,", "So,", "Basically,", "To be honest,"]
+
+
+def judge(answer: str) -> str:
+    # Concrete, quantified answers are good, plain but relevant ones average
+    words = re.findall(r"\w+", answer)
+    if len(words) >= 20 and re.search(r"\d", answer):
+        return "good"
+    if len(words) >= 10:
+        return "average"
+    return "bad"
+
+
+def reword(answer: str, rng: random.Random) -> str:
+    words = answer.split()
+
+    if rng.random() < 0.5:
+        words = [SYNONYMS.get(word, word) if rng.random() < 0.5 else word for word in words]
+    if rng.random() < 0.3 and len(words) > 4:
+        del words[rng.randrange(len(words))]
+    if rng.random() < 0.3:
+        words.insert(0, rng.choice(FILLERS))
+    # Some rewordings change the quality, e.g. a stock answer cut short or a dropped figure
+    if rng.random() < 0.1:
+        words = words[: max(3, len(words) // 3)]
+    if rng.random() < 0.1:
+        words = [word for word in words if not re.search(r"\d", word)]
+
+    text = " ".join(words)
+
+    return text.lower() if rng.random() < 0.2 else text
+
+
+def corpus(answers: int, seed: int) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    questions = list(STOCK_ANSWERS)
+
+    pairs = []
+    for _ in range(answers):
+        question = rng.choice(questions)
+        # A third of the candidates write something of their own
+        if rng.random() < 0.3:
+            answer = f"In my {rng.randrange(100)} projects I learned {rng.randrange(10**6)} lessons"
+        else:
+            answer = reword(rng.choice(STOCK_ANSWERS[question]), rng)
+
+        pairs.append((question, answer))
+
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--answers", type=int, default=5000, help="answers in the corpus")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    args = parser.parse_args()
+
+    pairs = corpus(args.answers, args.seed)
+
+    print(f"{'threshold':>10}{'hit rate':>10}{'agreement':>11}{'lookup':>10}")
+    for threshold in (0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99):
+        cache = SemanticCache(max_size=1024, threshold=threshold)
+        agreed = 0
+        lookup = 0.0
+
+        for question, answer in pairs:
+            fresh = {"evaluation": judge(answer)}
+
+            start = time.perf_counter()
+            cached = cache.get(question, answer)
+            lookup += time.perf_counter() - start
+
+            if cached is None:
+                cache.set(question, answer, fresh)
+            elif cached["evaluation"] == fresh["evaluation"]:
+                agreed += 1
+
+        stats = cache.stats()
+        agreement = agreed / stats["hits"] if stats["hits"] else 1.0
+        print(
+            f"{threshold:>10.2f}{stats['hit_rate']:>10.1%}{agreement:>11.1%}"
+            f"{lookup / len(pairs) * 1e6:>8.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Simulated interviews through the headless InterviewSession, all on one event loop.
+
+Mock agents sleep instead of calling a provider, and mock candidates answer after a short
+think time, so the run measures the interview engine itself.
+
+Usage:
+    python -m benchmarks.sessions [--sessions 5000] [--latency 0.05] [--think 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import time
+
+from lib.session import InterviewSession
+from lib.types import UserData
+
+QUESTIONS = [
+    {"question": "Tell me about yourself.", "type": "personal"},
+    {"question": "Why do you want this role?", "type": "role-specific"},
+    {"question": "Describe a conflict you resolved.", "type": "behavioural"},
+    {"question": "How would you handle a missed deadline?", "type": "situational"},
+]
+
+
+class MockQuestionAgent:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def arun(self, description: str, n_questions: int = 4):
+        await asyncio.sleep(random.expovariate(1 / self.latency))
+        return list(QUESTIONS)
+
+
+class MockEvaluationAgent:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def arun(self, question: str, response: str):
+        await asyncio.sleep(random.expovariate(1 / self.latency))
+        return {
+            "evaluation": random.choice(["good", "average", "bad"]),
+            "reason": "The response is relevant but lacks concrete examples.",
+            "feedback": "Use the STAR method and quantify the outcome.",
+            "samples": None,
+        }
+
+
+async def simulate(sessions: int, latency: float, think: float) -> tuple[list[float], list[int]]:
+    question_agent = MockQuestionAgent(latency)
+    evaluation_agent = MockEvaluationAgent(latency)
+
+    async def answer(question: str) -> str:
+        await asyncio.sleep(random.uniform(0, 2 * think))
+        return f"My answer to: {question}"
+
+    async def interview(i: int) -> tuple[float, int]:
+        session = InterviewSession(question_agent, evaluation_agent)
+        user_data = UserData(
+            fullname=f"Candidate {i}",
+            role="Data Scientist",
+            experience=3,
+            about="I like data",
+            resume=None,
+        )
+
+        start = time.perf_counter()
+        await session.arun(user_data, answer)
+
+        return time.perf_counter() - start, len(json.dumps(session.to_dict()))
+
+    results = await asyncio.gather(*(interview(i) for i in range(sessions)))
+
+    return [duration for duration, _ in results], [size for _, size in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sessions", type=int, default=5000, help="concurrent sessions")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean agent latency in s")
+    parser.add_argument("--think", type=float, default=0.01, help="mean candidate think time in s")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    durations, sizes = asyncio.run(simulate(args.sessions, args.latency, args.think))
+    elapsed = time.perf_counter() - start
+    # Peak resident memory of the process, in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    p50, p95 = (statistics.quantiles(durations, n=100)[q - 1] for q in (50, 95))
+    print(f"sessions:        {args.sessions}")
+    print(f"wall time:       {elapsed:.2f}s ({args.sessions / elapsed:.0f} sessions/s)")
+    print(f"session p50/p95: {p50 * 1000:.0f}ms / {p95 * 1000:.0f}ms")
+    print(f"state size:      {statistics.mean(sizes):.0f} bytes of JSON per session")
+    print(f"peak memory:     {peak / 2**10:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
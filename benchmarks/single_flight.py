@@ -0,0 +1,105 @@
+"""
+Single-flight coalescing of identical agent calls, against a slow local mock provider.
+
+A cohort of callers asks for the questions of the same role at the same moment, from threads,
+from coroutines and through streams. Identical calls must reach the provider once, while
+distinct calls are not coalesced. The exit status is 1 if any scenario makes more upstream
+requests than expected.
+
+Usage:
+    python -m benchmarks.single_flight [--callers 50] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from benchmarks.mock_server import MockServer
+
+DESCRIPTION = "Role: Data Scientist\nYears of Experience: 3\nAbout: I build NLP models in Python."
+
+
+def in_threads(callers: int, call) -> list:
+    # Start every caller at once, like a cohort starting the interview together
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+
+    def run(i: int):
+        barrier.wait()
+        results[i] = call(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def scenarios(agent, callers: int) -> dict:
+    async def gather(call):
+        return await asyncio.gather(*(call(i) for i in range(callers)))
+
+    return {
+        "threads": (1, lambda: in_threads(callers, lambda _: agent.run(DESCRIPTION))),
+        "asyncio": (1, lambda: asyncio.run(gather(lambda _: agent.arun(DESCRIPTION)))),
+        "streams": (1, lambda: in_threads(callers, lambda _: list(agent.stream(DESCRIPTION)))),
+        "distinct": (
+            callers,
+            lambda: in_threads(callers, lambda i: agent.run(f"{DESCRIPTION}\nCandidate: {i}")),
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--callers", type=int, default=50, help="concurrent callers")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock latency in seconds")
+    args = parser.parse_args()
+
+    with MockServer(latency=args.latency) as server:
+        # The SDKs, limiters and the single-flight switch read their settings on import
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{server.url}/v1",
+            OPENAI_MAX_CONCURRENCY=str(args.callers),
+            OPENAI_REQUESTS_PER_MINUTE="0",
+            OPENAI_TOKENS_PER_MINUTE="0",
+            HTTP_MAX_CONNECTIONS=str(args.callers),
+            SINGLE_FLIGHT="true",
+        )
+        from lib.agents import OpenAIQuestionGeneratorAgent
+
+        agent = OpenAIQuestionGeneratorAgent()
+
+        failures = []
+        print(f"{'scenario':<12}{'callers':>9}{'upstream':>10}{'coalesced':>11}{'seconds':>9}")
+        for name, (expected, run) in scenarios(agent, args.callers).items():
+            requests = server.requests
+            coalesced = agent.flight.stats()["coalesced"]
+            start = time.perf_counter()
+            results = run()
+            elapsed = time.perf_counter() - start
+            upstream = server.requests - requests
+            coalesced = agent.flight.stats()["coalesced"] - coalesced
+
+            print(f"{name:<12}{args.callers:>9}{upstream:>10}{coalesced:>11}{elapsed:>9.2f}")
+            if upstream != expected:
+                failures.append(f"{name} made {upstream} upstream requests, expected {expected}")
+            if any(not result for result in results):
+                failures.append(f"{name} returned no questions to some callers")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
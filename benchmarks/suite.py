@@ -0,0 +1,263 @@
+"""
+Load test of the agents and the end-to-end interview flow against a local mock provider.
+
+The mock OpenAI and Cohere server runs in a child process, so the CPU time and memory
+reported here are the agents' own overhead. Every scenario runs at increasing concurrency
+and reports throughput, p50/p95/p99 latency, CPU time per request and resident memory.
+Results are written to JSON, tagged with the commit, to compare runs across commits.
+
+Usage:
+    python -m benchmarks.suite [--concurrency 1,8,32,128] [--requests 200] [--latency 0.05]
+        [--token-rate 0] [--error-rate 0] [--scenarios openai-questions,interview]
+        [--output benchmarks/results/<commit>.json] [--baseline <previous results>.json]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import time
+
+from benchmarks.mock_server import MockServer
+
+DESCRIPTION = "Role: Data Scientist\nYears of Experience: 3\nAbout: I build NLP models in Python."
+QUESTION = "Describe a conflict you resolved."
+ANSWER = "Two teammates disagreed on a design, I set up a meeting and we agreed on a hybrid."
+SCENARIOS = [
+    "openai-questions",
+    "cohere-questions",
+    "openai-evaluation",
+    "cohere-evaluation",
+    "interview",
+]
+
+
+def serve(connection, **kwargs):
+    server = MockServer(**kwargs)
+    connection.send(server.url)
+    server.serve_forever()
+
+
+def make_scenario(name: str):
+    # Imported late, the SDKs and limiters read the environment on import
+    from lib import agents
+    from lib.session import InterviewSession
+    from lib.types import UserData
+
+    if name == "interview":
+        question_agent = agents.OpenAIQuestionGeneratorAgent()
+        evaluation_agent = agents.OpenAIResponseEvaluationAgent()
+        user_data = UserData(
+            fullname="Jane Doe", role="Data Scientist", experience=3, about="NLP", resume=None
+        )
+
+        async def answer(question: str) -> str:
+            return ANSWER
+
+        async def interview():
+            session = InterviewSession(question_agent, evaluation_agent)
+            await session.arun(user_data, answer)
+            return None if None in session.state["evaluations"] else session
+
+        return interview
+
+    provider, kind = name.split("-")
+    prefix = {"openai": "OpenAI", "cohere": "Cohere"}[provider]
+    if kind == "questions":
+        agent = getattr(agents, f"{prefix}QuestionGeneratorAgent")()
+        return lambda: agent.arun(DESCRIPTION)
+
+    agent = getattr(agents, f"{prefix}ResponseEvaluationAgent")()
+    return lambda: agent.arun(QUESTION, ANSWER)
+
+
+def rss_mb() -> float:
+    # Current resident memory, the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+async def measure(call, concurrency: int, requests: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed():
+        nonlocal errors
+
+        async with gate:
+            start = time.perf_counter()
+            try:
+                result = await call()
+            except Exception:
+                result = None
+            latencies.append(time.perf_counter() - start)
+
+            errors += result is None
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "cpu_ms_per_request": cpu / requests * 1000,
+        "rss_mb": rss_mb(),
+    }
+
+
+async def run_scenario(name: str, levels: list[int], requests: int) -> list[dict]:
+    from lib.clients import aclose
+
+    call = make_scenario(name)
+    try:
+        # One warm-up call opens the connections and loads the SDKs before measuring
+        await call()
+
+        return [{"scenario": name, **await measure(call, level, requests)} for level in levels]
+    finally:
+        await aclose()
+
+
+def commit() -> str:
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"]).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return f"{head}-dirty" if dirty else head
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nagainst {baseline['commit']}:")
+    print(f"{'scenario':<20}{'c':>5}{'throughput':>12}{'p95':>10}{'cpu/req':>10}")
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+
+        deltas = [
+            result[key] / before[key] - 1 if before[key] else 0.0
+            for key in ("throughput", "p95_ms", "cpu_ms_per_request")
+        ]
+        print(
+            f"{result['scenario']:<20}{result['concurrency']:>5}"
+            + "".join(f"{delta:>+10.1%}  " for delta in deltas)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per level")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="mock tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock error rate")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated names")
+    parser.add_argument(
+        "--output", help="results file, defaults to benchmarks/results/<commit>.json"
+    )
+    parser.add_argument("--baseline", help="previous results file to compare with")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = args.scenarios.split(",")
+
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=serve,
+        args=(sender,),
+        kwargs={
+            "latency": args.latency,
+            "token_rate": args.token_rate,
+            "error_rate": args.error_rate,
+            "seed": 0,
+        },
+        daemon=True,
+    )
+    server.start()
+    url = receiver.recv()
+
+    os.environ.update(
+        OPENAI_API_KEY="mock",
+        OPENAI_BASE_URL=f"{url}/v1",
+        COHERE_API_KEY="mock",
+        CO_API_URL=url,
+        OPENAI_MAX_CONCURRENCY=str(max(levels)),
+        OPENAI_REQUESTS_PER_MINUTE="0",
+        OPENAI_TOKENS_PER_MINUTE="0",
+        COHERE_MAX_CONCURRENCY=str(max(levels)),
+        COHERE_REQUESTS_PER_MINUTE="0",
+        COHERE_TOKENS_PER_MINUTE="0",
+        # Every call sends the same prompt, and must reach the mock provider
+        SINGLE_FLIGHT="false",
+        HTTP_MAX_CONNECTIONS=str(max(levels)),
+        HTTP_MAX_KEEPALIVE=str(max(levels)),
+    )
+
+    results = []
+    print(
+        f"{'scenario':<20}{'c':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'cpu/req':>10}{'rss':>8}{'errors':>8}"
+    )
+    try:
+        for name in scenarios:
+            for result in asyncio.run(run_scenario(name, levels, args.requests)):
+                results.append(result)
+                print(
+                    f"{name:<20}{result['concurrency']:>5}{result['throughput']:>9.1f}"
+                    f"{result['p50_ms']:>7.0f}ms{result['p95_ms']:>7.0f}ms{result['p99_ms']:>7.0f}ms"
+                    f"{result['cpu_ms_per_request']:>8.2f}ms{result['rss_mb']:>6.0f}MB"
+                    f"{result['errors']:>8}"
+                )
+    finally:
+        server.terminate()
+
+    run = {
+        "commit": commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+
+    output = args.output or os.path.join("benchmarks", "results", f"{run['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(run, file, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
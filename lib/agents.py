@@ -1,13 +1,46 @@
-import importlib as __importlib
-import json as __json
-
-import cohere as __cohere
-from openai import OpenAI as __OpenAI
-
-from lib.configs import COHERE_API_KEY as __COHERE_API_KEY
-from lib.configs import OPENAI_API_KEY as __OPENAI_API_KEY
-from lib.configs import PALM_API_KEY as __PALM_API_KEY
-from lib.types import Evaluation, Question
+import asyncio as _asyncio
+import contextvars as _contextvars
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from typing import Any as _Any
+from typing import Callable as _Callable
+from typing import Iterator as _Iterator
+
+from lib.cache import BaseCache as _BaseCache
+from lib.cache import SemanticCache as _SemanticCache
+from lib.cache import make_key as _make_key
+from lib.clients import get_async_cohere_client as _get_async_cohere_client
+from lib.clients import get_async_openai_client as _get_async_openai_client
+from lib.clients import get_cohere_client as _get_cohere_client
+from lib.clients import get_openai_client as _get_openai_client
+from lib.configs import PALM_API_KEY as _PALM_API_KEY
+from lib.configs import SINGLE_FLIGHT as _SINGLE_FLIGHT
+from lib.limits import current_priority as _current_priority
+from lib.limits import get_limiter as _get_limiter
+from lib.parsers import iter_fields as _iter_fields
+from lib.parsers import iter_items as _iter_items
+from lib.parsers import loads as _loads
+from lib.parsers import parse_evaluation as _parse_evaluation
+from lib.parsers import parse_questions as _parse_questions
+from lib.prompts import PromptBudget as _PromptBudget
+from lib.prompts import PromptTemplate as _PromptTemplate
+from lib.prompts import count_tokens as _count_tokens
+from lib.prompts import truncate as _truncate
+from lib.providers import load as _load_sdk
+from lib.retry import PARSE as _PARSE
+from lib.retry import RetryPolicy as _RetryPolicy
+from lib.retry import acall as _acall
+from lib.retry import call as _call
+from lib.retry import iterate as _iterate
+from lib.retry import record as _record
+from lib.retry import request_timeout as _request_timeout
+from lib.singleflight import get_single_flight as _get_single_flight
+from lib.tracing import atrace_request as _atrace_request
+from lib.tracing import record_usage as _record_usage
+from lib.tracing import trace_parse as _trace_parse
+from lib.tracing import trace_request as _trace_request
+from lib.tracing import trace_stream as _trace_stream
+from lib.tracing import traced as _traced
+from lib.types import Evaluation, PackedEvaluation, Question
 
 __all__ = [
     "OpenAIQuestionGeneratorAgent",
@@ -16,26 +49,451 @@ __all__ = [
     "OpenAIResponseEvaluationAgent",
     "PalmResponseEvaluationAgent",
     "CohereResponseEvaluationAgent",
+    "OpenAIConversationSummaryAgent",
 ]
 
 
 class __BaseAgent:
-    def __init__(self):
-        pass
+    provider: str = ""
+    model: str = ""
+    max_tokens_param: str = "max_tokens"
+    # Tokens shared by the prompt and the completion, and the completion limit of the model
+    context_window: int = 4096
+    max_output_tokens: int = 1024
+    # Whether the outputs are JSON, only those that parse are cached
+    json_output: bool = True
+    repair_prompt = _PromptTemplate(
+        """The following text should be valid JSON, but it is malformed or truncated.
+Return only the corrected JSON, complete any truncated object or list, and don't include \
+any other verbose texts or the markdown syntax.
+
+{output}"""
+    )
+
+    def __init__(self, cache: _BaseCache | None = None):
+        self.cache = cache
+        self.params: dict = {}
+        self.budget = _PromptBudget(self.model, self.context_window, self.max_output_tokens)
+        self.retry = _RetryPolicy()
+        # Identical calls in flight at the same time share one request, e.g. a cohort starting
+        # the same role together
+        self.flight = _get_single_flight() if _SINGLE_FLIGHT else None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Every public entry point of an agent is traced as one span, see lib.tracing
+        for name in ("__call__", "run", "arun", "stream", "evaluate_many", "aevaluate_many"):
+            method = getattr(cls, name, None)
+            if method is not None and not getattr(method, "__traced__", False):
+                setattr(cls, name, _traced(method))
 
     def __call__(self, *args, **kwargs):
         return self.run(*args, **kwargs)
 
+    @property
+    def aclient(self):
+        # Async SDK clients are shared per event loop by lib.clients
+        raise NotImplementedError
+
     def run(self, *args, **kwargs):
         raise NotImplementedError
 
+    async def arun(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def _complete(self, prompt: str, system: str | None = None, **params) -> str:
+        params = {**self.params, **params}
+
+        def request() -> str:
+            return _trace_request(
+                lambda: self._request(prompt, system, params), self.model, prompt, system
+            )
+
+        if self.cache is None and self.flight is None:
+            return _call(request, self.retry, self.provider)
+
+        key = _make_key(self.provider, self.model, prompt, system, params)
+        if self.cache is not None:
+            output = self.cache.get(key)
+            if output is not None:
+                return output
+
+        def call() -> str:
+            output = _call(request, self.retry, self.provider)
+            if self.cache is not None:
+                self._cache_set(key, output)
+
+            return output
+
+        return call() if self.flight is None else self.flight.do(self._flight_key(key), call)
+
+    async def _acomplete(self, prompt: str, system: str | None = None, **params) -> str:
+        params = {**self.params, **params}
+
+        def request():
+            return _atrace_request(
+                lambda: self._arequest(prompt, system, params), self.model, prompt, system
+            )
+
+        if self.cache is None and self.flight is None:
+            return await _acall(request, self.retry, self.provider)
+
+        key = _make_key(self.provider, self.model, prompt, system, params)
+        if self.cache is not None:
+            output = self.cache.get(key)
+            if output is not None:
+                return output
+
+        async def call() -> str:
+            output = await _acall(request, self.retry, self.provider)
+            if self.cache is not None:
+                self._cache_set(key, output)
+
+            return output
+
+        return await (
+            call() if self.flight is None else self.flight.ado(self._flight_key(key), call)
+        )
+
+    def _stream(self, prompt: str, system: str | None = None, **params) -> _Iterator[str]:
+        params = {**self.params, **params}
+
+        def request() -> _Iterator[str]:
+            return _trace_stream(
+                lambda: self._stream_request(prompt, system, params), self.model, prompt, system
+            )
+
+        if self.cache is None and self.flight is None:
+            yield from _iterate(request, self.retry, self.provider)
+            return
+
+        key = _make_key(self.provider, self.model, prompt, system, params)
+        if self.cache is not None:
+            output = self.cache.get(key)
+            if output is not None:
+                yield output
+                return
+
+        def call() -> _Iterator[str]:
+            chunks = []
+            for chunk in _iterate(request, self.retry, self.provider):
+                chunks.append(chunk)
+                yield chunk
+
+            if self.cache is not None:
+                self._cache_set(key, "".join(chunks))
+
+        yield from (
+            call() if self.flight is None else self.flight.iterate(self._flight_key(key), call)
+        )
+
+    def _flight_key(self, key: str) -> str:
+        # Only calls of the same priority class share a flight, an interactive caller must not
+        # wait behind a batch call queued at the back of the limiter
+        return f"{_current_priority()}:{key}"
+
+    def _parse(self, output: str, parse: _Callable[[str], _Any]) -> _Any:
+        """
+        Parse a model output, asking the model to repair it if it is malformed.
+
+        Args:
+            output (str): The model output.
+            parse (Callable[[str], Any]): The parser, returning None for invalid outputs.
+
+        Returns:
+            Any: The parsed output, or None if it could not be repaired.
+        """
+
+        parsed = _trace_parse(parse, output)
+        if parsed is not None or not self._repairable(output):
+            return parsed
+
+        # Fixing the JSON is cheaper than generating the whole answer again
+        repaired = self._complete(self.repair_prompt.format(output=output), temperature=0)
+        parsed = _trace_parse(parse, repaired)
+        if parsed is not None:
+            _record(self.provider, "repaired")
+
+        return parsed
+
+    async def _aparse(self, output: str, parse: _Callable[[str], _Any]) -> _Any:
+        """
+        Parse a model output, asking the model to repair it if it is malformed.
+
+        Args:
+            output (str): The model output.
+            parse (Callable[[str], Any]): The parser, returning None for invalid outputs.
+
+        Returns:
+            Any: The parsed output, or None if it could not be repaired.
+        """
+
+        parsed = _trace_parse(parse, output)
+        if parsed is not None or not self._repairable(output):
+            return parsed
+
+        # Fixing the JSON is cheaper than generating the whole answer again
+        repaired = await self._acomplete(self.repair_prompt.format(output=output), temperature=0)
+        parsed = _trace_parse(parse, repaired)
+        if parsed is not None:
+            _record(self.provider, "repaired")
+
+        return parsed
+
+    def _repairable(self, output: str) -> bool:
+        _record(self.provider, _PARSE)
+
+        # Outputs without any JSON, e.g. refusals, have nothing to repair
+        return "{" in output or "[" in output
+
+    def _prompt_tokens(self, **values) -> int:
+        # Tokens of the agent's prompts rendered with `values`, missing fields count as empty
+        templates = [getattr(self, "system_prompt", None), getattr(self, "user_prompt", None)]
+
+        return sum(
+            template.count_tokens(self.model, **values)
+            for template in templates
+            if isinstance(template, _PromptTemplate)
+        )
+
+    def _tokens(self, prompt: str, system: str | None, params: dict) -> int:
+        # Tokens a request counts against the provider budget, its prompt and longest completion
+        text = prompt if system is None else f"{system}\n\n{prompt}"
+
+        return _count_tokens(text, self.model) + params.get(self.max_tokens_param, 0)
+
+    def _cache_set(self, key: str, output: str) -> None:
+        # Never cache an empty output, or a JSON output the agents would fail to parse
+        if not output.strip():
+            return
+        if self.json_output:
+            try:
+                _loads(output)
+            except ValueError:
+                return
+
+        self.cache.set(key, output)
+
+    def _request(self, prompt: str, system: str | None, params: dict) -> str:
+        raise NotImplementedError
+
+    async def _arequest(self, prompt: str, system: str | None, params: dict) -> str:
+        raise NotImplementedError
+
+    def _stream_request(self, prompt: str, system: str | None, params: dict) -> _Iterator[str]:
+        raise NotImplementedError
+
+
+class __OpenAIAgent(__BaseAgent):
+    provider = "openai"
+    model = "gpt-3.5-turbo-1106"
+    context_window = 16385
+    max_output_tokens = 4096
+
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.client = _get_openai_client()
+        self.params = {
+            "temperature": 0.5,
+            "max_tokens": 1024,
+            "top_p": 1,
+            "frequency_penalty": 0,
+            "presence_penalty": 0,
+        }
+
+    @property
+    def aclient(self):
+        return _get_async_openai_client()
+
+    def _messages(self, prompt: str, system: str | None) -> list[dict]:
+        messages = [{"role": "user", "content": prompt}]
+        if system is not None:
+            messages.insert(0, {"role": "system", "content": system})
+
+        return messages
+
+    def _request(self, prompt: str, system: str | None, params: dict) -> str:
+        with _get_limiter(self.provider).slot(self._tokens(prompt, system, params)):
+            output = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system),
+                timeout=_request_timeout(),
+                **params,
+            )
+
+        if output.usage is not None:
+            _record_usage(output.usage.prompt_tokens, output.usage.completion_tokens)
+
+        return output.choices[0].message.content or ""
+
+    async def _arequest(self, prompt: str, system: str | None, params: dict) -> str:
+        async with _get_limiter(self.provider).slot(self._tokens(prompt, system, params)):
+            output = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system),
+                **params,
+            )
+
+        if output.usage is not None:
+            _record_usage(output.usage.prompt_tokens, output.usage.completion_tokens)
+
+        return output.choices[0].message.content or ""
+
+    def _stream_request(self, prompt: str, system: str | None, params: dict) -> _Iterator[str]:
+        with _get_limiter(self.provider).slot(self._tokens(prompt, system, params)):
+            output = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system),
+                stream=True,
+                timeout=_request_timeout(),
+                **params,
+            )
+
+            for chunk in output:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
 
-class OpenAIQuestionGeneratorAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+class __PalmAgent(__BaseAgent):
+    provider = "palm"
+    model = "models/text-bison-001"
+    max_tokens_param = "max_output_tokens"
+    # 8196 input tokens and 1024 output tokens
+    context_window = 9220
+    max_output_tokens = 1024
 
-        self.client = __OpenAI(api_key=__OPENAI_API_KEY)
-        self.system_prompt = """You are a non-technical interviewer that interviews \
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.client = _load_sdk(self.provider)
+        self.client.configure(api_key=_PALM_API_KEY)
+        self.params = {"temperature": 1, "max_output_tokens": 1024}
+
+    def _request(self, prompt: str, system: str | None, params: dict) -> str:
+        if system is not None:
+            prompt = f"{system}\n\n{prompt}"
+
+        with _get_limiter(self.provider).slot(self._tokens(prompt, None, params)):
+            output = self.client.generate_text(model=self.model, prompt=prompt, **params)
+
+        return output.result or ""
+
+    async def _arequest(self, prompt: str, system: str | None, params: dict) -> str:
+        if system is not None:
+            prompt = f"{system}\n\n{prompt}"
+
+        # google.generativeai has no asyncio client, offload the blocking call to a thread
+        async with _get_limiter(self.provider).slot(self._tokens(prompt, None, params)):
+            output = await _asyncio.to_thread(
+                self.client.generate_text,
+                model=self.model,
+                prompt=prompt,
+                **params,
+            )
+
+        return output.result or ""
+
+    def _stream_request(self, prompt: str, system: str | None, params: dict) -> _Iterator[str]:
+        # The PaLM text API has no streaming endpoint, emit the whole completion at once
+        yield self._request(prompt, system, params)
+
+
+class __CohereAgent(__BaseAgent):
+    provider = "cohere"
+    model = "command"
+    max_output_tokens = 4096
+
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.client = _get_cohere_client()
+        self.params = {"temperature": 1, "max_tokens": 1024}
+
+    @property
+    def aclient(self):
+        return _get_async_cohere_client()
+
+    def _request(self, prompt: str, system: str | None, params: dict) -> str:
+        if system is not None:
+            prompt = f"{system}\n\n{prompt}"
+
+        # The Cohere SDK has no per-request timeout, an attempt ends with the client timeout
+        with _get_limiter(self.provider).slot(self._tokens(prompt, None, params)):
+            output = self.client.generate(model=self.model, prompt=prompt, **params)
+
+        self._record_usage(output)
+
+        return output.generations[0].text or ""
+
+    async def _arequest(self, prompt: str, system: str | None, params: dict) -> str:
+        if system is not None:
+            prompt = f"{system}\n\n{prompt}"
+
+        async with _get_limiter(self.provider).slot(self._tokens(prompt, None, params)):
+            output = await self.aclient.generate(model=self.model, prompt=prompt, **params)
+
+        self._record_usage(output)
+
+        return output.generations[0].text or ""
+
+    def _stream_request(self, prompt: str, system: str | None, params: dict) -> _Iterator[str]:
+        if system is not None:
+            prompt = f"{system}\n\n{prompt}"
+
+        with _get_limiter(self.provider).slot(self._tokens(prompt, None, params)):
+            output = self.client.generate(model=self.model, prompt=prompt, stream=True, **params)
+
+            for token in output:
+                if token.text:
+                    yield token.text
+
+    def _record_usage(self, output) -> None:
+        billed = (output.meta or {}).get("billed_units") or {}
+        _record_usage(billed.get("input_tokens"), billed.get("output_tokens"))
+
+
+class __QuestionGeneratorMixin:
+    # Tokens of one generated question and of the JSON list around the questions
+    tokens_per_question = 48
+    tokens_overhead = 64
+
+    def _plan(self, description: str, n_questions: int) -> tuple[str, int, dict]:
+        """
+        Fit the candidate description and the questions in the token budget of the model.
+
+        Args:
+            description (str): The candidate description.
+            n_questions (int): The number of questions requested.
+
+        Returns:
+            tuple[str, int, dict]: The description, trimmed if needed, the number of questions
+                that fits in one completion and the completion size parameter.
+        """
+
+        # Ensure that there are at least 4 questions, and no more than one completion can hold
+        fitting = (self.budget.max_output_tokens - self.tokens_overhead) // self.tokens_per_question
+        n_questions = max(4, min(n_questions, fitting))
+
+        wanted = n_questions * self.tokens_per_question + self.tokens_overhead
+        used = self._prompt_tokens(n_questions=n_questions)
+        description = self.budget.fit(description, used, wanted)
+
+        prompt_tokens = used + _count_tokens(description, self.model)
+        max_tokens = self.budget.output_tokens(
+            prompt_tokens, max(wanted, self.params[self.max_tokens_param])
+        )
+
+        return description, n_questions, {self.max_tokens_param: max_tokens}
+
+
+class OpenAIQuestionGeneratorAgent(__QuestionGeneratorMixin, __OpenAIAgent):
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.system_prompt = _PromptTemplate(
+            """You are a non-technical interviewer that interviews \
 across the following categories:
 - personal
 - role-specific
@@ -58,8 +516,9 @@ JSON format:
     {{"question": "<situational_question>", "type": "situational"}},
     ...more questions to make up {n_questions} questions
 ]"""
+        )
 
-        self.user_prompt = "Candidate Description:\n{description}"
+        self.user_prompt = _PromptTemplate("Candidate Description:\n{description}")
 
     def __call__(self, description: str, n_questions: int = 4) -> list[Question] | None:
         """
@@ -95,6 +554,47 @@ JSON format:
 
         return questions
 
+    async def arun(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        # Generate questions
+        questions = await self._agenerate(description, n_questions)
+
+        return questions
+
+    def stream(self, description: str, n_questions: int = 4) -> _Iterator[Question]:
+        """
+        Generate interview questions, yielding each question as soon as it is complete.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Yields:
+            Question: The generated interview questions. The stream ends early if an error occurs.
+        """
+
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = self._stream(
+                self.user_prompt.format(description=description),
+                system=self.system_prompt.format(n_questions=n_questions),
+                **params,
+            )
+            yield from _iter_items(output, Question)
+        except Exception:
+            return
+
     def _generate(self, description: str, n_questions: int) -> list[Question] | None:
         """
         Generate interview questions based on the given description.
@@ -108,42 +608,52 @@ JSON format:
         """
 
         try:
-            # Ensure that there are at least 4 questions
-            if n_questions < 4:
-                n_questions = 4
+            description, n_questions, params = self._plan(description, n_questions)
 
-            output = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.system_prompt.format(n_questions=n_questions),
-                    },
-                    {
-                        "role": "user",
-                        "content": self.user_prompt.format(description=description),
-                    },
-                ],
-                temperature=0.5,
-                max_tokens=1024,
-                top_p=1,
-                frequency_penalty=0,
-                presence_penalty=0,
+            output = self._complete(
+                self.user_prompt.format(description=description),
+                system=self.system_prompt.format(n_questions=n_questions),
+                **params,
             )
-            questions = __json.loads(output.choices[0].message.content or "[]")
+            questions = self._parse(output, _parse_questions)
 
             return questions
         except Exception:
             return None
 
+    async def _agenerate(self, description: str, n_questions: int) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
 
-class PalmQuestionGeneratorAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int): The number of questions to generate.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
 
-        self.client = __importlib.import_module("google.generativeai")
-        self.client.configure(api_key=__PALM_API_KEY)
-        self.system_prompt = """You are a non-technical interviewer that interviews \
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = await self._acomplete(
+                self.user_prompt.format(description=description),
+                system=self.system_prompt.format(n_questions=n_questions),
+                **params,
+            )
+            questions = await self._aparse(output, _parse_questions)
+
+            return questions
+        except Exception:
+            return None
+
+
+class PalmQuestionGeneratorAgent(__QuestionGeneratorMixin, __PalmAgent):
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.system_prompt = _PromptTemplate(
+            """You are a non-technical interviewer that interviews \
 across the following categories:
 - personal
 - role-specific
@@ -171,6 +681,7 @@ JSON format:
 ===
 Candidate Description:
 {description}"""
+        )
 
     def __call__(self, description: str, n_questions: int = 4) -> list[Question] | None:
         """
@@ -206,6 +717,46 @@ Candidate Description:
 
         return questions
 
+    async def arun(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        # Generate questions
+        questions = await self._agenerate(description, n_questions)
+
+        return questions
+
+    def stream(self, description: str, n_questions: int = 4) -> _Iterator[Question]:
+        """
+        Generate interview questions, yielding each question as soon as it is complete.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Yields:
+            Question: The generated interview questions. The stream ends early if an error occurs.
+        """
+
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = self._stream(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
+            )
+            yield from _iter_items(output, Question)
+        except Exception:
+            return
+
     def _generate(self, description: str, n_questions: int) -> list[Question] | None:
         """
         Generate interview questions based on the given description.
@@ -219,29 +770,50 @@ Candidate Description:
         """
 
         try:
-            # Ensure that there are at least 4 questions
-            if n_questions < 4:
-                n_questions = 4
-
-            output = self.client.generate_text(
-                model="models/text-bison-001",
-                prompt=self.system_prompt.format(n_questions=n_questions, description=description),
-                temperature=1,
-                max_output_tokens=1024,
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = self._complete(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
             )
-            questions = __json.loads(output.result or "[]")
+            questions = self._parse(output, _parse_questions)
 
             return questions
         except Exception:
             return None
 
+    async def _agenerate(self, description: str, n_questions: int) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int): The number of questions to generate.
 
-class CohereQuestionGeneratorAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
 
-        self.client = __cohere.Client(__COHERE_API_KEY)
-        self.system_prompt = """You are a non-technical interviewer that interviews \
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = await self._acomplete(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
+            )
+            questions = await self._aparse(output, _parse_questions)
+
+            return questions
+        except Exception:
+            return None
+
+
+class CohereQuestionGeneratorAgent(__QuestionGeneratorMixin, __CohereAgent):
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.system_prompt = _PromptTemplate(
+            """You are a non-technical interviewer that interviews \
 across the following categories:
 - personal
 - role-specific
@@ -269,77 +841,392 @@ JSON format:
 ===
 Candidate Description:
 {description}"""
+        )
+
+    def __call__(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        # Generate questions
+        questions = self._generate(description, n_questions)
+
+        return questions
+
+    def run(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        # Generate questions
+        questions = self._generate(description, n_questions)
+
+        return questions
+
+    async def arun(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        # Generate questions
+        questions = await self._agenerate(description, n_questions)
+
+        return questions
+
+    def stream(self, description: str, n_questions: int = 4) -> _Iterator[Question]:
+        """
+        Generate interview questions, yielding each question as soon as it is complete.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Yields:
+            Question: The generated interview questions. The stream ends early if an error occurs.
+        """
+
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = self._stream(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
+            )
+            yield from _iter_items(output, Question)
+        except Exception:
+            return
+
+    def _generate(self, description: str, n_questions: int) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int): The number of questions to generate.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = self._complete(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
+            )
+            questions = self._parse(output, _parse_questions)
+
+            return questions
+        except Exception:
+            return None
+
+    async def _agenerate(self, description: str, n_questions: int) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int): The number of questions to generate.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        try:
+            description, n_questions, params = self._plan(description, n_questions)
+
+            output = await self._acomplete(
+                self.system_prompt.format(n_questions=n_questions, description=description),
+                **params,
+            )
+            questions = await self._aparse(output, _parse_questions)
+
+            return questions
+        except Exception:
+            return None
+
+
+class __ResponseEvaluationMixin:
+    batch_system_prompt = """You are an interviewer evaluating a candidate's \
+responses to several interview questions. For every item, your task is to:
+- Evaluate the candidate's response on the scale of "good", "average", and "bad".
+- Provide a reason for why it's categorized as good, average, or bad.
+- Offer constructive feedback or suggestions for improvement.
+- Provide 2 samples of good responses.
+
+You will be provided with numbered items, each with an interview question and a candidate response.
+
+* You answer strictly as a list of JSON objects, one per item and in the same order. \
+Don't include any other verbose texts, and don't include the markdown syntax anywhere.
+
+JSON format:
+[
+    {
+        "id": <item number>,
+        "evaluation": "good, average, or bad",
+        "reason": "Reason why it's good, average, or bad",
+        "feedback": "Feedback or suggestions for improvement",
+        "samples": [
+            "<Good response 1>",
+            "<Good response 2>"
+        ]
+    },
+    ...one object for every item
+]"""
+    batch_item_prompt = _PromptTemplate(
+        """ITEM {id}:
+QUESTION:
+{question}
+
+RESPONSE:
+{response}"""
+    )
+    # Tokens of one evaluation with its two sample responses
+    tokens_per_evaluation = 384
+    semantic_cache: _SemanticCache | None = None
 
-    def __call__(self, description: str, n_questions: int = 4) -> list[Question] | None:
+    def _plan(self, question: str, response: str) -> tuple[str, dict]:
         """
-        Generate interview questions based on the given description.
+        Fit the candidate response and the evaluation in the token budget of the model.
 
         Args:
-            description (str): The description used as input for question generation.
-            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+            question (str): The interview question.
+            response (str): The candidate's response.
 
         Returns:
-            list[Question] | None: A list of generated interview questions or None if an error occurs.
+            tuple[str, dict]: The response, trimmed if needed, and the completion size parameter.
         """
 
-        # Generate questions
-        questions = self._generate(description, n_questions)
+        used = self._prompt_tokens(question=question)
+        response = self.budget.fit(response, used, self.tokens_per_evaluation)
 
-        return questions
+        prompt_tokens = used + _count_tokens(response, self.model)
+        max_tokens = self.budget.output_tokens(
+            prompt_tokens, max(self.tokens_per_evaluation, self.params[self.max_tokens_param])
+        )
 
-    def run(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        return response, {self.max_tokens_param: max_tokens}
+
+    def evaluate_many(
+        self, pairs: list[tuple[str, str]], batch_size: int = 4
+    ) -> list[Evaluation | None]:
         """
-        Generate interview questions based on the given description.
+        Evaluate several (question, response) pairs, packing up to `batch_size` pairs per request.
+
+        Packed requests run concurrently. Items missing from a packed output, or a whole pack that
+        failed, are evaluated again one by one. A pair alone in its request is evaluated one by one
+        already, it is not retried.
 
         Args:
-            description (str): The description used as input for question generation.
-            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+            pairs (list[tuple[str, str]]): The interview questions and candidate responses.
+            batch_size (int, optional): The number of pairs per request, 1 disables packing. Defaults to 4.
 
         Returns:
-            list[Question] | None: A list of generated interview questions or None if an error occurs.
+            list[Evaluation | None]: The evaluations in the order of `pairs`, None where an evaluation failed.
         """
 
-        # Generate questions
-        questions = self._generate(description, n_questions)
+        evaluations = [self._recall(question, response) for question, response in pairs]
+        batches = self._batches(pairs, batch_size, evaluations)
+        if not batches:
+            return evaluations
 
-        return questions
+        # Evaluate the packed requests concurrently, the provider limiter bounds the fan-out.
+        # The workers run in copies of the caller's context, to add to its trace span.
+        context = _contextvars.copy_context()
+        with _ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            packed = list(
+                executor.map(
+                    lambda batch: context.copy().run(self._evaluate_packed, batch), batches
+                )
+            )
 
-    def _generate(self, description: str, n_questions: int) -> list[Question] | None:
+            evaluations = self._merge(evaluations, batches, packed)
+            missing = self._missing(evaluations, batches)
+            retried = executor.map(lambda i: context.copy().run(self._generate, *pairs[i]), missing)
+
+            for i, evaluation in zip(missing, retried):
+                evaluations[i] = evaluation
+
+        return evaluations
+
+    async def aevaluate_many(
+        self, pairs: list[tuple[str, str]], batch_size: int = 4
+    ) -> list[Evaluation | None]:
         """
-        Generate interview questions based on the given description.
+        Evaluate several (question, response) pairs, packing up to `batch_size` pairs per request.
+
+        Packed requests run concurrently. Items missing from a packed output, or a whole pack that
+        failed, are evaluated again one by one. A pair alone in its request is evaluated one by one
+        already, it is not retried.
 
         Args:
-            description (str): The description used as input for question generation.
-            n_questions (int): The number of questions to generate.
+            pairs (list[tuple[str, str]]): The interview questions and candidate responses.
+            batch_size (int, optional): The number of pairs per request, 1 disables packing. Defaults to 4.
 
         Returns:
-            list[Question] | None: A list of generated interview questions or None if an error occurs.
+            list[Evaluation | None]: The evaluations in the order of `pairs`, None where an evaluation failed.
         """
 
-        try:
-            # Ensure that there are at least 4 questions
-            if n_questions < 4:
-                n_questions = 4
-
-            output = self.client.generate(
-                model="command",
-                prompt=self.system_prompt.format(n_questions=n_questions, description=description),
-                temperature=1,
-                max_tokens=1024,
+        evaluations = [self._recall(question, response) for question, response in pairs]
+        batches = self._batches(pairs, batch_size, evaluations)
+        packed = await _asyncio.gather(*(self._aevaluate_packed(batch) for batch in batches))
+
+        evaluations = self._merge(evaluations, batches, packed)
+        missing = self._missing(evaluations, batches)
+        retried = await _asyncio.gather(*(self._agenerate(*pairs[i]) for i in missing))
+
+        for i, evaluation in zip(missing, retried):
+            evaluations[i] = evaluation
+
+        return evaluations
+
+    def _batches(
+        self, pairs: list[tuple[str, str]], batch_size: int, evaluations: list[Evaluation | None]
+    ) -> list[list[tuple[int, str, str]]]:
+        # Only the pairs without a cached evaluation are sent
+        indexed = [
+            (i, question, response)
+            for i, (question, response) in enumerate(pairs)
+            if evaluations[i] is None
+        ]
+        # Never pack more evaluations than one completion can hold
+        fitting = self.budget.max_output_tokens // self.tokens_per_evaluation
+        batch_size = max(1, min(batch_size, fitting))
+
+        return [indexed[i : i + batch_size] for i in range(0, len(indexed), batch_size)]
+
+    def _pack(self, batch: list[tuple[int, str, str]]) -> tuple[str, dict]:
+        # Each response gets an equal share of the window left by the system prompt, the
+        # questions and one evaluation per item, so one long answer cannot crowd out the others
+        reserved = min(self.budget.max_output_tokens, self.tokens_per_evaluation * len(batch))
+        used = _count_tokens(self.batch_system_prompt, self.model) + sum(
+            self.batch_item_prompt.count_tokens(self.model, id=i + 1, question=question)
+            for i, question, _ in batch
+        )
+        share = (self.budget.context_window - used - reserved) // len(batch)
+
+        prompt = "\n\n".join(
+            self.batch_item_prompt.format(
+                id=i + 1, question=question, response=_truncate(response, share, self.model)
             )
-            questions = __json.loads(output.generations[0].text or "[]")
+            for i, question, response in batch
+        )
+        # Leave room for one full evaluation per packed item, within the context window
+        prompt_tokens = _count_tokens(self.batch_system_prompt + prompt, self.model)
+        max_tokens = self.budget.output_tokens(
+            prompt_tokens, self.params[self.max_tokens_param] * len(batch)
+        )
+        params = {self.max_tokens_param: max_tokens}
+
+        return prompt, params
+
+    def _unpack(self, batch: list[tuple[int, str, str]], output: str) -> dict[int, Evaluation]:
+        evaluations = {}
+        for item in _loads(output, partial=True, schema=PackedEvaluation):
+            evaluations[item.pop("id") - 1] = item
+
+        # Single pairs are remembered by `_generate`, the packed ones here, each once
+        for i, question, response in batch:
+            self._remember(question, response, evaluations.get(i))
+
+        return evaluations
+
+    def _evaluate_packed(self, batch: list[tuple[int, str, str]]) -> dict[int, Evaluation]:
+        # A single pair is cheaper to evaluate with the regular prompt
+        if len(batch) == 1:
+            i, question, response = batch[0]
+            return {i: self._generate(question, response)}
 
-            return questions
+        try:
+            prompt, params = self._pack(batch)
+            output = self._complete(prompt, system=self.batch_system_prompt, **params)
+
+            return self._unpack(batch, output)
+        except Exception:
+            return {}
+
+    async def _aevaluate_packed(self, batch: list[tuple[int, str, str]]) -> dict[int, Evaluation]:
+        # A single pair is cheaper to evaluate with the regular prompt
+        if len(batch) == 1:
+            i, question, response = batch[0]
+            return {i: await self._agenerate(question, response)}
+
+        try:
+            prompt, params = self._pack(batch)
+            output = await self._acomplete(prompt, system=self.batch_system_prompt, **params)
+
+            return self._unpack(batch, output)
         except Exception:
+            return {}
+
+    def _merge(
+        self,
+        evaluations: list[Evaluation | None],
+        batches: list[list[tuple[int, str, str]]],
+        packed: list[dict[int, Evaluation]],
+    ) -> list[Evaluation | None]:
+        evaluations = list(evaluations)
+        for batch, results in zip(batches, packed):
+            # Ignore ids the model made up that do not belong to this batch
+            for i, _, _ in batch:
+                evaluations[i] = results.get(i)
+
+        return evaluations
+
+    def _missing(
+        self, evaluations: list[Evaluation | None], batches: list[list[tuple[int, str, str]]]
+    ) -> list[int]:
+        # A single pair already went through `_generate` and its retry policy, retrying it
+        # would double its attempts and deadline
+        single = {batch[0][0] for batch in batches if len(batch) == 1}
+
+        return [
+            i for i, evaluation in enumerate(evaluations) if evaluation is None and i not in single
+        ]
+
+    def _recall(self, question: str, response: str) -> Evaluation | None:
+        if self.semantic_cache is None:
             return None
 
+        return self.semantic_cache.get(question, response)
+
+    def _remember(self, question: str, response: str, evaluation: Evaluation | None) -> None:
+        if self.semantic_cache is not None and evaluation is not None:
+            self.semantic_cache.set(question, response, evaluation)
+
 
-class OpenAIResponseEvaluationAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+class OpenAIResponseEvaluationAgent(__ResponseEvaluationMixin, __OpenAIAgent):
+    def __init__(
+        self, cache: _BaseCache | None = None, semantic_cache: _SemanticCache | None = None
+    ):
+        super().__init__(cache=cache)
 
-        self.client = __OpenAI(api_key=__OPENAI_API_KEY)
-        self.system_prompt = """You are an interviewer evaluating a candidate's \
+        self.semantic_cache = semantic_cache
+
+        self.system_prompt = _PromptTemplate(
+            """You are an interviewer evaluating a candidate's \
 response to an interview question. Your task is to:
 - Evaluate the candidate's response on the scale of "good", "average", and "bad".
 - Provide a reason for why it's categorized as good, average, or bad.
@@ -358,11 +1245,14 @@ Evaluate and provide output in the following JSON format:
         "<Good response 2>"
     ]
 }}"""
-        self.user_prompt = """QUESTION:
+        )
+        self.user_prompt = _PromptTemplate(
+            """QUESTION:
 {question}
 
 RESPONSE:
 {response}"""
+        )
 
     def __call__(self, question: str, response: str) -> Evaluation | None:
         """
@@ -398,6 +1288,58 @@ RESPONSE:
 
         return evaluation
 
+    async def arun(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        # Generate questions
+        evaluation = await self._agenerate(question, response)
+
+        return evaluation
+
+    def stream(self, question: str, response: str) -> _Iterator[tuple[str, _Any]]:
+        """
+        Evaluate a candidate's response, yielding each evaluation field as soon as it is complete.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Yields:
+            tuple[str, Any]: The `(field, value)` pairs of the evaluation. The stream ends early if an error occurs.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                yield from evaluation.items()
+                return
+
+            trimmed, params = self._plan(question, response)
+            output = self._stream(
+                self.user_prompt.format(question=question, response=trimmed),
+                system=self.system_prompt.format(),
+                **params,
+            )
+            evaluation = {}
+            for field, value in _iter_fields(output, Evaluation):
+                evaluation[field] = value
+                yield field, value
+
+            # A stream cut short is not remembered, only a complete evaluation
+            if evaluation.keys() == Evaluation.__annotations__.keys():
+                self._remember(question, response, evaluation)
+        except Exception:
+            return
+
     def _generate(self, question: str, response: str) -> Evaluation | None:
         """
         Evaluate a candidate's response to an interview question.
@@ -411,39 +1353,64 @@ RESPONSE:
         """
 
         try:
-            output = self.client.chat.completions.create(
-                model="gpt-3.5-turbo-1106",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.system_prompt,
-                    },
-                    {
-                        "role": "user",
-                        "content": self.user_prompt.format(question=question, response=response),
-                    },
-                ],
-                temperature=0.5,
-                max_tokens=1024,
-                top_p=1,
-                frequency_penalty=0,
-                presence_penalty=0,
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = self._complete(
+                self.user_prompt.format(question=question, response=trimmed),
+                system=self.system_prompt.format(),
+                **params,
             )
+            evaluation = self._parse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
 
-            questions = __json.loads(output.choices[0].message.content or "{}")
+            return evaluation
+        except Exception:
+            return None
 
-            return questions
+    async def _agenerate(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = await self._acomplete(
+                self.user_prompt.format(question=question, response=trimmed),
+                system=self.system_prompt.format(),
+                **params,
+            )
+            evaluation = await self._aparse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
+
+            return evaluation
         except Exception:
             return None
 
 
-class PalmResponseEvaluationAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+class PalmResponseEvaluationAgent(__ResponseEvaluationMixin, __PalmAgent):
+    def __init__(
+        self, cache: _BaseCache | None = None, semantic_cache: _SemanticCache | None = None
+    ):
+        super().__init__(cache=cache)
 
-        self.client = __importlib.import_module("google.generativeai")
-        self.client.configure(api_key=__PALM_API_KEY)
-        self.system_prompt = """You are an interviewer evaluating a candidate's \
+        self.semantic_cache = semantic_cache
+
+        self.system_prompt = _PromptTemplate(
+            """You are an interviewer evaluating a candidate's \
 response to an interview question. Your task is to:
 - Evaluate the candidate's response on the scale of "good", "average", and "bad".
 - Provide a reason for why it's categorized as good, average, or bad.
@@ -470,6 +1437,7 @@ QUESTION:
 
 RESPONSE:
 {response}"""
+        )
 
     def __call__(self, question: str, response: str) -> Evaluation | None:
         """
@@ -505,6 +1473,56 @@ RESPONSE:
 
         return evaluation
 
+    async def arun(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        # Generate questions
+        evaluation = await self._agenerate(question, response)
+
+        return evaluation
+
+    def stream(self, question: str, response: str) -> _Iterator[tuple[str, _Any]]:
+        """
+        Evaluate a candidate's response, yielding each evaluation field as soon as it is complete.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Yields:
+            tuple[str, Any]: The `(field, value)` pairs of the evaluation. The stream ends early if an error occurs.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                yield from evaluation.items()
+                return
+
+            trimmed, params = self._plan(question, response)
+            output = self._stream(
+                self.system_prompt.format(question=question, response=trimmed), **params
+            )
+            evaluation = {}
+            for field, value in _iter_fields(output, Evaluation):
+                evaluation[field] = value
+                yield field, value
+
+            # A stream cut short is not remembered, only a complete evaluation
+            if evaluation.keys() == Evaluation.__annotations__.keys():
+                self._remember(question, response, evaluation)
+        except Exception:
+            return
+
     def _generate(self, question: str, response: str) -> Evaluation | None:
         """
         Evaluate a candidate's response to an interview question.
@@ -518,26 +1536,60 @@ RESPONSE:
         """
 
         try:
-            output = self.client.generate_text(
-                model="models/text-bison-001",
-                prompt=self.system_prompt.format(question=question, response=response),
-                temperature=1,
-                max_output_tokens=1024,
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = self._complete(
+                self.system_prompt.format(question=question, response=trimmed), **params
             )
+            evaluation = self._parse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
+
+            return evaluation
+        except Exception:
+            return None
 
-            evaluations = __json.loads(output.result)
+    async def _agenerate(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
 
-            return evaluations
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = await self._acomplete(
+                self.system_prompt.format(question=question, response=trimmed), **params
+            )
+            evaluation = await self._aparse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
+
+            return evaluation
         except Exception:
             return None
 
 
-class CohereResponseEvaluationAgent(__BaseAgent):
-    def __init__(self):
-        super().__init__()
+class CohereResponseEvaluationAgent(__ResponseEvaluationMixin, __CohereAgent):
+    def __init__(
+        self, cache: _BaseCache | None = None, semantic_cache: _SemanticCache | None = None
+    ):
+        super().__init__(cache=cache)
+
+        self.semantic_cache = semantic_cache
 
-        self.client = __cohere.Client(__COHERE_API_KEY)
-        self.system_prompt = """You are an interviewer evaluating a candidate's \
+        self.system_prompt = _PromptTemplate(
+            """You are an interviewer evaluating a candidate's \
 response to an interview question. Your task is to:
 - Evaluate the candidate's response on the scale of "good", "average", and "bad".
 - Provide a reason for why it's categorized as good, average, or bad.
@@ -564,6 +1616,7 @@ QUESTION:
 
 RESPONSE:
 {response}"""
+        )
 
     def __call__(self, question: str, response: str) -> Evaluation | None:
         """
@@ -599,6 +1652,56 @@ RESPONSE:
 
         return evaluation
 
+    async def arun(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        # Generate questions
+        evaluation = await self._agenerate(question, response)
+
+        return evaluation
+
+    def stream(self, question: str, response: str) -> _Iterator[tuple[str, _Any]]:
+        """
+        Evaluate a candidate's response, yielding each evaluation field as soon as it is complete.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Yields:
+            tuple[str, Any]: The `(field, value)` pairs of the evaluation. The stream ends early if an error occurs.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                yield from evaluation.items()
+                return
+
+            trimmed, params = self._plan(question, response)
+            output = self._stream(
+                self.system_prompt.format(question=question, response=trimmed), **params
+            )
+            evaluation = {}
+            for field, value in _iter_fields(output, Evaluation):
+                evaluation[field] = value
+                yield field, value
+
+            # A stream cut short is not remembered, only a complete evaluation
+            if evaluation.keys() == Evaluation.__annotations__.keys():
+                self._remember(question, response, evaluation)
+        except Exception:
+            return
+
     def _generate(self, question: str, response: str) -> Evaluation | None:
         """
         Evaluate a candidate's response to an interview question.
@@ -612,15 +1715,197 @@ RESPONSE:
         """
 
         try:
-            output = self.client.generate(
-                model="command",
-                prompt=self.system_prompt.format(question=question, response=response),
-                temperature=1,
-                max_tokens=1024,
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = self._complete(
+                self.system_prompt.format(question=question, response=trimmed), **params
             )
+            evaluation = self._parse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
+
+            return evaluation
+        except Exception:
+            return None
 
-            evaluations = __json.loads(output.generations[0].text)
+    async def _agenerate(self, question: str, response: str) -> Evaluation | None:
+        """
+        Evaluate a candidate's response to an interview question.
 
-            return evaluations
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The evaluation of the candidate's response or None if an error occurred.
+        """
+
+        try:
+            evaluation = self._recall(question, response)
+            if evaluation is not None:
+                return evaluation
+
+            trimmed, params = self._plan(question, response)
+            output = await self._acomplete(
+                self.system_prompt.format(question=question, response=trimmed), **params
+            )
+            evaluation = await self._aparse(output, _parse_evaluation)
+            self._remember(question, response, evaluation)
+
+            return evaluation
+        except Exception:
+            return None
+
+
+class OpenAIConversationSummaryAgent(__OpenAIAgent):
+    # Words of the running summary, and the tokens they take
+    max_words = 150
+    tokens_per_summary = 256
+    # The summary is plain text
+    json_output = False
+
+    def __init__(self, cache: _BaseCache | None = None):
+        super().__init__(cache=cache)
+
+        self.params = {**self.params, "temperature": 0.2, "max_tokens": self.tokens_per_summary}
+
+        self.system_prompt = _PromptTemplate(
+            """You are summarizing an interview between an interviewer and a candidate, \
+so that the interviewer can recall it later without the full transcript.
+
+You will be provided with the summary so far and the next messages of the interview.
+
+Update the summary with the new messages in at most {max_words} words. Keep the questions \
+asked, the facts the candidate shared about themselves and how well they answered.
+
+* You answer strictly with the summary. Don't include any other verbose texts, and don't \
+include the markdown syntax anywhere."""
+        )
+        self.user_prompt = _PromptTemplate(
+            """SUMMARY SO FAR:
+{summary}
+
+NEW MESSAGES:
+{transcript}"""
+        )
+
+    def __call__(self, summary: str, transcript: str) -> str | None:
+        """
+        Fold the next messages of an interview into its running summary.
+
+        Args:
+            summary (str): The summary so far, empty at first.
+            transcript (str): The next messages, one "Role: content" line each.
+
+        Returns:
+            str | None: The updated summary or None if an error occurs.
+        """
+
+        # Summarize
+        summary = self._summarize(summary, transcript)
+
+        return summary
+
+    def run(self, summary: str, transcript: str) -> str | None:
+        """
+        Fold the next messages of an interview into its running summary.
+
+        Args:
+            summary (str): The summary so far, empty at first.
+            transcript (str): The next messages, one "Role: content" line each.
+
+        Returns:
+            str | None: The updated summary or None if an error occurs.
+        """
+
+        # Summarize
+        summary = self._summarize(summary, transcript)
+
+        return summary
+
+    async def arun(self, summary: str, transcript: str) -> str | None:
+        """
+        Fold the next messages of an interview into its running summary.
+
+        Args:
+            summary (str): The summary so far, empty at first.
+            transcript (str): The next messages, one "Role: content" line each.
+
+        Returns:
+            str | None: The updated summary or None if an error occurs.
+        """
+
+        # Summarize
+        summary = await self._asummarize(summary, transcript)
+
+        return summary
+
+    def _plan(self, summary: str, transcript: str) -> tuple[str, dict]:
+        """
+        Fit the new messages and the updated summary in the token budget of the model.
+
+        Args:
+            summary (str): The summary so far.
+            transcript (str): The next messages.
+
+        Returns:
+            tuple[str, dict]: The messages, trimmed if needed, and the completion size parameter.
+        """
+
+        used = self._prompt_tokens(summary=summary, max_words=self.max_words)
+        transcript = self.budget.fit(transcript, used, self.tokens_per_summary)
+
+        prompt_tokens = used + _count_tokens(transcript, self.model)
+        max_tokens = self.budget.output_tokens(prompt_tokens, self.tokens_per_summary)
+
+        return transcript, {self.max_tokens_param: max_tokens}
+
+    def _summarize(self, summary: str, transcript: str) -> str | None:
+        """
+        Fold the next messages of an interview into its running summary.
+
+        Args:
+            summary (str): The summary so far.
+            transcript (str): The next messages.
+
+        Returns:
+            str | None: The updated summary or None if an error occurs.
+        """
+
+        try:
+            trimmed, params = self._plan(summary, transcript)
+            output = self._complete(
+                self.user_prompt.format(summary=summary or "-", transcript=trimmed),
+                system=self.system_prompt.format(max_words=self.max_words),
+                **params,
+            )
+
+            return output.strip() or None
+        except Exception:
+            return None
+
+    async def _asummarize(self, summary: str, transcript: str) -> str | None:
+        """
+        Fold the next messages of an interview into its running summary.
+
+        Args:
+            summary (str): The summary so far.
+            transcript (str): The next messages.
+
+        Returns:
+            str | None: The updated summary or None if an error occurs.
+        """
+
+        try:
+            trimmed, params = self._plan(summary, transcript)
+            output = await self._acomplete(
+                self.user_prompt.format(summary=summary or "-", transcript=trimmed),
+                system=self.system_prompt.format(max_words=self.max_words),
+                **params,
+            )
+
+            return output.strip() or None
         except Exception:
             return None
@@ -0,0 +1,440 @@
+"""
+Bulk question generation and evaluation, streaming rows from CSV, JSONL or Parquet files.
+
+Each input row goes through one agent of lib.agents on a thread or process pool, and its
+result is appended to a JSONL output as soon as it is ready. Progress is checkpointed next
+to the output, so a job that crashed resumes where it stopped. Rows are read lazily and at
+most a few per worker are in flight, so memory stays flat whatever the size of the input.
+
+Rows need the columns of the agent's `run` arguments: `description` for question generators,
+or `role`, `experience` and `about` to build it, `question` and `response` for evaluators.
+
+Usage:
+    python -m lib.batch data/candidates.csv data/processed/questions.jsonl
+        --agent OpenAIQuestionGeneratorAgent [--workers 8] [--pool thread|process]
+        [--max-concurrency 16] [--requests-per-minute 3500] [--restart]
+"""
+
+import argparse as _argparse
+import concurrent.futures as _futures
+import csv as _csv
+import importlib as _importlib
+import json as _json
+import multiprocessing as _multiprocessing
+import os as _os
+import sys as _sys
+import time as _time
+from typing import Any, Iterator
+
+from lib import agents as _agents
+from lib.configs import MAX_CONCURRENCY as _MAX_CONCURRENCY
+from lib.configs import REQUESTS_PER_MINUTE as _REQUESTS_PER_MINUTE
+from lib.configs import TOKENS_PER_MINUTE as _TOKENS_PER_MINUTE
+from lib.limits import scheduling as _scheduling
+from lib.limits import set_limits as _set_limits
+from lib.session import describe as _describe
+from lib.types import BatchStats, UserData
+
+__all__ = ["read_rows", "arguments", "run", "main"]
+
+# The `run` arguments of each kind of agent, by class name suffix
+ARGUMENTS = {
+    "QuestionGeneratorAgent": ("description",),
+    "ResponseEvaluationAgent": ("question", "response"),
+    "ConversationSummaryAgent": ("summary", "transcript"),
+}
+
+# The agent of a pool process, built once by `_init_process`
+_process_agent = None
+
+
+def _extension(path: str) -> str:
+    # Checked before anything is opened, `read_rows` only runs on the first row
+    extension = _os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".jsonl", ".ndjson", ".parquet"):
+        raise ValueError(f"Unsupported input format {extension}, use CSV, JSONL or Parquet")
+
+    return extension
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """
+    Read the rows of a CSV, JSONL or Parquet file one at a time.
+
+    Args:
+        path (str): The file, its extension picks the format.
+
+    Yields:
+        dict: The rows, as column → value.
+
+    Raises:
+        ValueError: If the format is not supported.
+        ImportError: If a Parquet file is given and `pyarrow` is not installed.
+    """
+
+    extension = _extension(path)
+
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8") as file:
+            yield from _csv.DictReader(file)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield _json.loads(line)
+    elif extension == ".parquet":
+        parquet = _importlib.import_module("pyarrow.parquet")
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=1024):
+            yield from batch.to_pylist()
+
+
+def arguments(agent_name: str, row: dict) -> tuple:
+    """
+    Get the `run` arguments of an agent from an input row.
+
+    Args:
+        agent_name (str): The agent class name.
+        row (dict): The row.
+
+    Returns:
+        tuple: The positional arguments.
+
+    Raises:
+        KeyError: If the row misses a column the agent needs.
+    """
+
+    names = next(names for suffix, names in ARGUMENTS.items() if agent_name.endswith(suffix))
+
+    if names == ("description",) and not row.get("description"):
+        return (
+            _describe(
+                UserData(
+                    fullname=row.get("fullname", ""),
+                    role=row["role"],
+                    experience=row.get("experience", 0),
+                    about=row.get("about", ""),
+                    resume=None,
+                )
+            ),
+        )
+
+    return tuple(row[name] for name in names)
+
+
+class _Checkpoint:
+    def __init__(self, path: str, input_path: str, agent_name: str, restart: bool):
+        # Rows below `done_below` are done, and those in `done_above`. Rows are submitted in
+        # order and only a few are in flight, so `done_above` stays small.
+        self.path = path
+        self.state = {
+            "input": _os.path.abspath(input_path),
+            "agent": agent_name,
+            "done_below": 0,
+            "done_above": [],
+            "output_bytes": 0,
+        }
+
+        if not restart and _os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                state = _json.load(file)
+            if (state["input"], state["agent"]) != (self.state["input"], agent_name):
+                raise ValueError(
+                    f"{path} checkpoints {state['agent']} on {state['input']}, pass --restart to "
+                    "start this job over"
+                )
+            self.state = state
+
+        self._done_above = set(self.state["done_above"])
+
+    @property
+    def output_bytes(self) -> int:
+        return self.state["output_bytes"]
+
+    def done(self, index: int) -> bool:
+        return index < self.state["done_below"] or index in self._done_above
+
+    def add(self, index: int) -> None:
+        self._done_above.add(index)
+        while self.state["done_below"] in self._done_above:
+            self._done_above.remove(self.state["done_below"])
+            self.state["done_below"] += 1
+
+    def save(self, output) -> None:
+        # The output reaches the disk before the checkpoint that covers it
+        output.flush()
+        _os.fsync(output.fileno())
+        self.state["done_above"] = sorted(self._done_above)
+        self.state["output_bytes"] = output.tell()
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            _json.dump(self.state, file)
+        _os.replace(temporary, self.path)
+
+
+def _init_process(agent_name: str, limits: dict) -> None:
+    global _process_agent
+
+    # Each process gets its share of the provider limits, see `run`
+    agent_cls = getattr(_agents, agent_name)
+    _set_limits(agent_cls.provider, **limits)
+    _process_agent = agent_cls()
+
+
+def _run_in_process(agent_name: str, row: dict) -> Any:
+    with _scheduling("batch", "batch"):
+        return _process_agent.run(*arguments(agent_name, row))
+
+
+def _run_in_thread(agent, agent_name: str, row: dict) -> Any:
+    # Behind the interactive calls when the batch shares a process with them
+    with _scheduling("batch", "batch"):
+        return agent.run(*arguments(agent_name, row))
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    agent_name: str,
+    workers: int = 8,
+    pool: str = "thread",
+    max_concurrency: int | None = None,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+    checkpoint_path: str | None = None,
+    checkpoint_every: int = 100,
+    restart: bool = False,
+    progress_every: float = 5.0,
+) -> BatchStats:
+    """
+    Run the rows of a file through an agent, appending the results to a JSONL file.
+
+    Each output line holds the row index, the input row and the agent's output, None if the
+    agent failed. Lines are in completion order, the index gives the input order.
+
+    Args:
+        input_path (str): The CSV, JSONL or Parquet input.
+        output_path (str): The JSONL output.
+        agent_name (str): The agent class name in lib.agents, e.g. OpenAIQuestionGeneratorAgent.
+        workers (int, optional): The threads or processes. Defaults to 8.
+        pool (str, optional): "thread", or "process" for CPU-heavy parsing. Defaults to "thread".
+        max_concurrency (int | None, optional): The provider calls in flight over all workers.
+            Defaults to the configured limit.
+        requests_per_minute (float | None, optional): The provider request rate over all
+            workers. Defaults to the configured limit.
+        tokens_per_minute (float | None, optional): The provider token rate over all workers.
+            Defaults to the configured limit.
+        checkpoint_path (str | None, optional): The checkpoint. Defaults to the output path
+            with a `.checkpoint.json` suffix.
+        checkpoint_every (int, optional): The rows between checkpoints. Defaults to 100.
+        restart (bool, optional): Ignore the checkpoint and start over. Defaults to False.
+        progress_every (float, optional): Seconds between progress lines on stderr, 0 disables
+            them. Defaults to 5.
+
+    Returns:
+        BatchStats: The rows processed by this run, skipped as already done, and failed.
+
+    Raises:
+        ValueError: If the agent or the input format is unknown, the checkpoint belongs to
+            another job, or the output it covers is missing or shorter.
+    """
+
+    if agent_name not in _agents.__all__:
+        raise ValueError(f"Unknown agent {agent_name}, use one of {', '.join(_agents.__all__)}")
+    _extension(input_path)
+
+    checkpoint = _Checkpoint(
+        checkpoint_path or f"{output_path}.checkpoint.json", input_path, agent_name, restart
+    )
+    # Resuming would pad the output with NULs up to the checkpointed size
+    size = _os.path.getsize(output_path) if _os.path.exists(output_path) else 0
+    if size < checkpoint.output_bytes:
+        raise ValueError(
+            f"{checkpoint.path} covers {checkpoint.output_bytes} bytes of {output_path} but it has "
+            f"{size}, pass --restart to start this job over"
+        )
+
+    agent_cls = getattr(_agents, agent_name)
+    if max_concurrency is None:
+        max_concurrency = _MAX_CONCURRENCY.get(agent_cls.provider, 8)
+    if requests_per_minute is None:
+        requests_per_minute = _REQUESTS_PER_MINUTE.get(agent_cls.provider, 0)
+    if tokens_per_minute is None:
+        tokens_per_minute = _TOKENS_PER_MINUTE.get(agent_cls.provider, 0)
+
+    # The job has the limiters of its processes to itself, no interactive call to leave room for
+    if pool == "process":
+        # The limiters are per process, each one gets its share of the provider limits
+        limits = {
+            "max_concurrency": max(1, max_concurrency // workers),
+            "requests_per_minute": requests_per_minute / workers,
+            "tokens_per_minute": tokens_per_minute / workers,
+            "interactive_reserve": 0,
+        }
+        executor = _futures.ProcessPoolExecutor(
+            workers,
+            mp_context=_multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=(agent_name, limits),
+        )
+
+        def submit(row: dict) -> _futures.Future:
+            return executor.submit(_run_in_process, agent_name, row)
+
+    else:
+        _set_limits(
+            agent_cls.provider,
+            max_concurrency,
+            requests_per_minute,
+            tokens_per_minute,
+            interactive_reserve=0,
+        )
+        agent = agent_cls()
+        executor = _futures.ThreadPoolExecutor(workers, thread_name_prefix="batch")
+
+        def submit(row: dict) -> _futures.Future:
+            return executor.submit(_run_in_thread, agent, agent_name, row)
+
+    # Drop the lines written after the last checkpoint, their rows run again
+    mode = "r+b" if _os.path.exists(output_path) and not restart else "wb"
+    with open(output_path, mode) as output, executor:
+        output.truncate(checkpoint.output_bytes)
+        output.seek(checkpoint.output_bytes)
+        stats = _process(
+            read_rows(input_path),
+            submit,
+            output,
+            checkpoint,
+            max_pending=workers * 2,
+            checkpoint_every=checkpoint_every,
+            progress_every=progress_every,
+        )
+
+    return stats
+
+
+def _process(
+    rows: Iterator[dict],
+    submit,
+    output,
+    checkpoint: _Checkpoint,
+    max_pending: int,
+    checkpoint_every: int,
+    progress_every: float,
+) -> BatchStats:
+    stats = BatchStats(rows=0, skipped=0, failed=0, seconds=0.0)
+    pending: dict[_futures.Future, tuple[int, dict]] = {}
+    start = reported = _time.perf_counter()
+    since_checkpoint = 0
+
+    try:
+        for index, row in enumerate(rows):
+            if checkpoint.done(index):
+                stats["skipped"] += 1
+                continue
+
+            # Only a few rows are in flight, the input is read as the workers free up
+            if len(pending) >= max_pending:
+                since_checkpoint += _collect(pending, output, checkpoint, stats, block=True)
+            pending[submit(row)] = (index, row)
+
+            if since_checkpoint >= checkpoint_every:
+                checkpoint.save(output)
+                since_checkpoint = 0
+
+            if progress_every and _time.perf_counter() - reported >= progress_every:
+                reported = _time.perf_counter()
+                rate = stats["rows"] / (reported - start)
+                print(
+                    f"{stats['rows']} rows, {stats['failed']} failed, {rate:.1f} rows/s",
+                    file=_sys.stderr,
+                )
+
+        while pending:
+            _collect(pending, output, checkpoint, stats, block=True)
+    finally:
+        # Interrupted or not, the finished rows are kept
+        while pending:
+            done = [future for future in pending if future.done()]
+            if not done:
+                for future in pending:
+                    future.cancel()
+                break
+            _collect(pending, output, checkpoint, stats, block=False)
+        checkpoint.save(output)
+
+    stats["seconds"] = _time.perf_counter() - start
+
+    return stats
+
+
+def _collect(pending: dict, output, checkpoint: _Checkpoint, stats: BatchStats, block: bool) -> int:
+    # Write the results of the finished rows, returns their number
+    done, _ = _futures.wait(
+        pending, timeout=None if block else 0, return_when=_futures.FIRST_COMPLETED
+    )
+
+    for future in done:
+        index, row = pending.pop(future)
+        try:
+            result = future.result()
+        except Exception:
+            result = None
+
+        output.write(
+            (_json.dumps({"index": index, "input": row, "output": result}) + "\n").encode()
+        )
+        checkpoint.add(index)
+        stats["rows"] += 1
+        stats["failed"] += result is None
+
+    return len(done)
+
+
+def main():
+    parser = _argparse.ArgumentParser(
+        prog="python -m lib.batch",
+        description=__doc__,
+        formatter_class=_argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("input", help="CSV, JSONL or Parquet file of rows")
+    parser.add_argument("output", help="JSONL file of results, appended to")
+    parser.add_argument("--agent", required=True, choices=_agents.__all__, help="agent class")
+    parser.add_argument("--workers", type=int, default=8, help="threads or processes")
+    parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+    parser.add_argument("--max-concurrency", type=int, help="provider calls in flight")
+    parser.add_argument("--requests-per-minute", type=float, help="provider request rate")
+    parser.add_argument("--tokens-per-minute", type=float, help="provider token rate")
+    parser.add_argument("--checkpoint", help="checkpoint file, next to the output by default")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="rows per checkpoint")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    args = parser.parse_args()
+
+    try:
+        stats = run(
+            args.input,
+            args.output,
+            args.agent,
+            workers=args.workers,
+            pool=args.pool,
+            max_concurrency=args.max_concurrency,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            checkpoint_path=args.checkpoint,
+            checkpoint_every=args.checkpoint_every,
+            restart=args.restart,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    except KeyboardInterrupt:
+        print("Interrupted, run the same command again to resume", file=_sys.stderr)
+        _sys.exit(130)
+
+    print(
+        f"{stats['rows']} rows in {stats['seconds']:.1f}s, {stats['failed']} failed, "
+        f"{stats['skipped']} already done"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import hashlib as _hashlib
+import importlib as _importlib
+import json as _json
+import os as _os
+import re as _re
+import sqlite3 as _sqlite3
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+from typing import TYPE_CHECKING
+
+from lib.types import CacheStats, Evaluation
+
+if TYPE_CHECKING:
+    import numpy
+
+__all__ = ["AudioCache", "BaseCache", "MemoryCache", "SQLiteCache", "SemanticCache", "make_key"]
+
+
+def make_key(provider: str, model: str, prompt: str, system: str | None, params: dict) -> str:
+    """
+    Build a content-addressed cache key for a provider call.
+
+    Args:
+        provider (str): The provider name.
+        model (str): The model name.
+        prompt (str): The rendered prompt.
+        system (str | None): The rendered system prompt, if any.
+        params (dict): The sampling parameters.
+
+    Returns:
+        str: The SHA-256 hex digest of the request.
+    """
+
+    request = {
+        "provider": provider,
+        "model": model,
+        "prompt": prompt,
+        "system": system,
+        "params": params,
+    }
+    data = _json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+
+    return _hashlib.sha256(data.encode()).hexdigest()
+
+
+class BaseCache:
+    def __init__(self, max_size: int = 1024, ttl: float | None = None):
+        """
+        Key-value cache for provider completions with LRU and TTL eviction.
+
+        Args:
+            max_size (int, optional): The maximum number of entries. Defaults to 1024.
+            ttl (float | None, optional): Seconds an entry stays valid, None keeps it forever. Defaults to None.
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = _threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        value = self._get(key)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        evicted = self._set(key, value)
+
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            total = self.hits + self.misses
+
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self),
+                hit_rate=self.hits / total if total else 0.0,
+            )
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: str) -> int:
+        raise NotImplementedError
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and _time.time() - created > self.ttl
+
+
+class MemoryCache(BaseCache):
+    def __init__(self, max_size: int = 1024, ttl: float | None = None):
+        """
+        In-process LRU cache.
+
+        Args:
+            max_size (int, optional): The maximum number of entries. Defaults to 1024.
+            ttl (float | None, optional): Seconds an entry stays valid, None keeps it forever. Defaults to None.
+        """
+
+        super().__init__(max_size=max_size, ttl=ttl)
+
+        self._entries: _OrderedDict[str, tuple[float, str]] = _OrderedDict()
+        self._entries_lock = _threading.Lock()
+
+    def clear(self) -> None:
+        with self._entries_lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> str | None:
+        with self._entries_lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            created, value = entry
+            if self._expired(created):
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def _set(self, key: str, value: str) -> int:
+        with self._entries_lock:
+            self._entries[key] = (_time.time(), value)
+            self._entries.move_to_end(key)
+
+            evicted = 0
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+
+            return evicted
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, path: str, max_size: int = 100_000, ttl: float | None = None):
+        """
+        On-disk LRU cache shared by the processes of one machine.
+
+        Expired and least recently used entries are evicted every `max_size / 100` writes rather
+        than on each one, so the cache may briefly hold up to that many entries over its size.
+
+        Args:
+            path (str): The SQLite database file.
+            max_size (int, optional): The maximum number of entries. Defaults to 100,000.
+            ttl (float | None, optional): Seconds an entry stays valid, None keeps it forever. Defaults to None.
+        """
+
+        super().__init__(max_size=max_size, ttl=ttl)
+
+        self.path = path
+        self._evict_every = max(1, max_size // 100)
+        self._writes = 0
+        self._connection = _sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection_lock = _threading.Lock()
+
+        with self._connection_lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+            # For the TTL deletes of the eviction passes
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_created ON entries (created)"
+            )
+
+    def clear(self) -> None:
+        with self._connection_lock:
+            self._connection.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._connection_lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _get(self, key: str) -> str | None:
+        with self._connection_lock:
+            row = self._connection.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created = row
+            if self._expired(created):
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+
+            self._connection.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (_time.time(), key)
+            )
+
+            return value
+
+    def _set(self, key: str, value: str) -> int:
+        now = _time.time()
+
+        with self._connection_lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+
+            # The eviction scans the table, it only runs every few writes
+            self._writes += 1
+            if self._writes < self._evict_every:
+                return 0
+            self._writes = 0
+
+            # Drop expired entries first, then the least recently used ones over the size cap
+            evicted = 0
+            if self.ttl is not None:
+                evicted += self._connection.execute(
+                    "DELETE FROM entries WHERE created < ?", (now - self.ttl,)
+                ).rowcount
+
+            (size,) = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if size > self.max_size:
+                evicted += self._connection.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                    (size - self.max_size,),
+                ).rowcount
+
+            return evicted
+
+
+class SemanticCache:
+    def __init__(self, max_size: int = 1024, threshold: float = 0.95, n_features: int = 2**12):
+        """
+        Evaluation cache that also matches near-identical responses to the same question.
+
+        Responses are embedded locally with hashed TF-IDF into a preallocated NumPy matrix,
+        and a lookup compares the response with the stored responses of the same question.
+
+        Args:
+            max_size (int, optional): The maximum number of entries. Defaults to 1024.
+            threshold (float, optional): The cosine similarity of a hit. Defaults to 0.95.
+            n_features (int, optional): The embedding size. Defaults to 2**12.
+        """
+
+        self.max_size = max_size
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # NumPy and the vectorizer are only loaded by the processes using a semantic cache
+        self._np = _importlib.import_module("numpy")
+        self._vectorizer = _importlib.import_module("lib.retrieval").HashingVectorizer(
+            n_features=n_features
+        )
+        self._vectors = self._np.zeros((max_size, n_features), dtype=self._np.float32)
+        # Slot -> (question, evaluation), in least recently used order
+        self._entries: _OrderedDict[int, tuple[str, Evaluation]] = _OrderedDict()
+        self._slots: dict[str, set[int]] = {}
+        self._free = list(range(max_size - 1, -1, -1))
+        self._lock = _threading.Lock()
+
+    def get(self, question: str, response: str) -> Evaluation | None:
+        """
+        Find the evaluation of a response similar enough to the given one.
+
+        Args:
+            question (str): The interview question.
+            response (str): The candidate's response.
+
+        Returns:
+            Evaluation | None: The stored evaluation, or None on a miss.
+        """
+
+        question = self._normalize(question)
+        vector = self._vectorizer.transform(response)
+
+        with self._lock:
+            best = self._match(question, vector)
+            if best is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best)
+
+            return self._entries[best][1]
+
+    def set(self, question: str, response: str, evaluation: Evaluation) -> None:
+        question = self._normalize(question)
+        vector = self._vectorizer.transform(response)
+        if not vector.any():
+            # Nothing to compare later responses with, e.g. empty or stopword-only responses
+            return
+
+        with self._lock:
+            # A response matching a stored one replaces its evaluation instead of adding a duplicate
+            match = self._match(question, vector)
+            if match is not None:
+                self._entries[match] = (question, evaluation)
+                self._entries.move_to_end(match)
+                return
+
+            if not self._free:
+                slot, (evicted, _) = self._entries.popitem(last=False)
+                self._slots[evicted].discard(slot)
+                if not self._slots[evicted]:
+                    del self._slots[evicted]
+                self._free.append(slot)
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = (question, evaluation)
+            self._slots.setdefault(question, set()).add(slot)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            total = self.hits + self.misses
+
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._entries),
+                hit_rate=self.hits / total if total else 0.0,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._slots.clear()
+            self._free = list(range(self.max_size - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _match(self, question: str, vector: "numpy.ndarray") -> int | None:
+        # The slot of the most similar response to the question, if similar enough
+        slots = list(self._slots.get(question, ()))
+        if not slots or not vector.any():
+            return None
+
+        # Only the non-zero features of the response contribute to the dot products
+        features = self._np.flatnonzero(vector)
+        scores = self._vectors[self._np.ix_(slots, features)] @ vector[features]
+        i = int(self._np.argmax(scores))
+
+        return slots[i] if scores[i] >= self.threshold else None
+
+    def _normalize(self, question: str) -> str:
+        return _re.sub(r"\s+", " ", question).strip().lower()
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20):
+        """
+        On-disk cache of synthesized speech keyed by (voice, text), with LRU eviction by size.
+
+        Each entry is one file named after the hash of its key. Files found in the directory
+        are reused, least recently used first, so the cache survives restarts.
+
+        Args:
+            directory (str): The cache directory, created if missing.
+            max_bytes (int, optional): The maximum total size of the audio. Defaults to 256 MiB.
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        _os.makedirs(directory, exist_ok=True)
+
+        # File name -> size, in least recently used order
+        entries = []
+        for entry in _os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".audio"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        self._files: _OrderedDict[str, int] = _OrderedDict(
+            (name, size) for _, name, size in sorted(entries)
+        )
+        self._bytes = sum(self._files.values())
+        self._lock = _threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def get(self, voice: str, text: str) -> bytes | None:
+        name = self._name(voice, text)
+        path = _os.path.join(self.directory, name)
+
+        with self._lock:
+            try:
+                with open(path, "rb") as file:
+                    audio = file.read()
+                # The modification time orders the files by last use across restarts
+                _os.utime(path)
+            except FileNotFoundError:
+                # Never cached, or evicted by another process sharing the directory
+                self._forget(name)
+                self.misses += 1
+                return None
+
+            if name not in self._files:
+                self._files[name] = len(audio)
+                self._bytes += len(audio)
+            self._files.move_to_end(name)
+            self.hits += 1
+
+            return audio
+
+    def set(self, voice: str, text: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+
+        name = self._name(voice, text)
+        path = _os.path.join(self.directory, name)
+        temporary = f"{path}.{_threading.get_ident()}.tmp"
+
+        with self._lock:
+            # Written aside and renamed, readers never see a partial file
+            with open(temporary, "wb") as file:
+                file.write(audio)
+            _os.replace(temporary, path)
+
+            self._forget(name)
+            self._files[name] = len(audio)
+            self._bytes += len(audio)
+
+            while self._bytes > self.max_bytes:
+                evicted, size = self._files.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    _os.remove(_os.path.join(self.directory, evicted))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            total = self.hits + self.misses
+
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._files),
+                hit_rate=self.hits / total if total else 0.0,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in self._files:
+                try:
+                    _os.remove(_os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+            self._files.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def _name(self, voice: str, text: str) -> str:
+        return _hashlib.sha256(f"{voice}\0{text}".encode()).hexdigest() + ".audio"
+
+    def _forget(self, name: str) -> None:
+        size = self._files.pop(name, None)
+        if size is not None:
+            self._bytes -= size
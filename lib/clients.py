@@ -0,0 +1,255 @@
+import asyncio as _asyncio
+import collections as _collections
+import importlib as _importlib
+import importlib.util as _importlib_util
+import threading as _threading
+import weakref as _weakref
+from typing import TYPE_CHECKING
+
+from lib.configs import COHERE_API_KEY as _COHERE_API_KEY
+from lib.configs import HTTP_KEEPALIVE_EXPIRY as _HTTP_KEEPALIVE_EXPIRY
+from lib.configs import HTTP_MAX_CONNECTIONS as _HTTP_MAX_CONNECTIONS
+from lib.configs import HTTP_MAX_KEEPALIVE as _HTTP_MAX_KEEPALIVE
+from lib.configs import HTTP_TIMEOUT as _HTTP_TIMEOUT
+from lib.configs import OPENAI_API_KEY as _OPENAI_API_KEY
+from lib.providers import load as _load
+from lib.types import PoolStats
+
+# The SDKs and httpx are imported on first use, only for the providers in use
+if TYPE_CHECKING:
+    import cohere
+    import httpx
+    import openai
+
+    from lib.cache import SemanticCache
+
+__all__ = [
+    "get_agent",
+    "get_semantic_cache",
+    "get_http_client",
+    "get_async_http_client",
+    "get_openai_client",
+    "get_async_openai_client",
+    "get_cohere_client",
+    "get_async_cohere_client",
+    "pool_stats",
+    "aclose",
+]
+
+_lock = _threading.RLock()
+_singletons: dict = {}
+# Async clients hold connections bound to the event loop that opened them
+_loop_singletons: _weakref.WeakKeyDictionary = _weakref.WeakKeyDictionary()
+_requests = {"sync": 0, "async": 0}
+
+
+def _http2() -> bool:
+    # HTTP/2 needs the optional `h2` package
+    return _importlib_util.find_spec("h2") is not None
+
+
+def _httpx():
+    return _importlib.import_module("httpx")
+
+
+def _limits() -> "httpx.Limits":
+    return _httpx().Limits(
+        max_connections=_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _singleton(key, factory):
+    with _lock:
+        if key not in _singletons:
+            _singletons[key] = factory()
+
+        return _singletons[key]
+
+
+def _loop_singleton(key, factory):
+    loop = _asyncio.get_running_loop()
+
+    with _lock:
+        clients = _loop_singletons.setdefault(loop, {})
+        if key not in clients:
+            clients[key] = factory()
+
+        return clients[key]
+
+
+def _count(kind: str):
+    def hook(request):
+        _requests[kind] += 1
+
+    return hook
+
+
+def _acount(kind: str):
+    async def hook(request):
+        _requests[kind] += 1
+
+    return hook
+
+
+def get_agent(agent_cls: type, **kwargs):
+    """
+    Get the process-wide instance of an agent class, creating it on first use.
+
+    Args:
+        agent_cls (type): The agent class, e.g. OpenAIQuestionGeneratorAgent.
+        **kwargs: The constructor arguments. Each distinct set of arguments gets its own instance,
+            arguments that are not hashable, e.g. a dict, get a new instance on every call.
+
+    Returns:
+        Any: The shared agent instance.
+    """
+
+    # The key holds the arguments themselves, so equal ones share an instance and none is
+    # collected while its instance is cached
+    key = (agent_cls, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return agent_cls(**kwargs)
+
+    return _singleton(key, lambda: agent_cls(**kwargs))
+
+
+def get_semantic_cache() -> "SemanticCache":
+    """
+    Get the process-wide evaluation cache, shared by the app's agent and the job workers.
+
+    Returns:
+        SemanticCache: The shared cache.
+    """
+
+    return _singleton(
+        "semantic_cache", lambda: _importlib.import_module("lib.cache").SemanticCache()
+    )
+
+
+def get_http_client() -> "httpx.Client":
+    """
+    Get the process-wide httpx client with a tuned keep-alive connection pool.
+
+    Returns:
+        httpx.Client: The shared client.
+    """
+
+    return _singleton(
+        "http",
+        lambda: _httpx().Client(
+            http2=_http2(),
+            limits=_limits(),
+            timeout=_HTTP_TIMEOUT,
+            event_hooks={"request": [_count("sync")]},
+        ),
+    )
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """
+    Get the httpx async client of the running event loop.
+
+    Returns:
+        httpx.AsyncClient: The client shared by every coroutine of the loop.
+    """
+
+    return _loop_singleton(
+        "http",
+        lambda: _httpx().AsyncClient(
+            http2=_http2(),
+            limits=_limits(),
+            timeout=_HTTP_TIMEOUT,
+            event_hooks={"request": [_acount("async")]},
+        ),
+    )
+
+
+def get_openai_client() -> "openai.OpenAI":
+    # The SDK retries are disabled, lib.retry retries the calls of every provider alike
+    return _singleton(
+        "openai",
+        lambda: _load("openai").OpenAI(
+            api_key=_OPENAI_API_KEY, http_client=get_http_client(), max_retries=0
+        ),
+    )
+
+
+def get_async_openai_client() -> "openai.AsyncOpenAI":
+    return _loop_singleton(
+        "openai",
+        lambda: _load("openai").AsyncOpenAI(
+            api_key=_OPENAI_API_KEY, http_client=get_async_http_client(), max_retries=0
+        ),
+    )
+
+
+def get_cohere_client() -> "cohere.Client":
+    # The Cohere client checks the API key and starts a thread pool on construction
+    return _singleton(
+        "cohere",
+        lambda: _load("cohere").Client(_COHERE_API_KEY, max_retries=0, timeout=int(_HTTP_TIMEOUT)),
+    )
+
+
+def _async_cohere_client() -> "cohere.AsyncClient":
+    client = _load("cohere").AsyncClient(_COHERE_API_KEY, max_retries=0, timeout=int(_HTTP_TIMEOUT))
+
+    # The aiohttp backend sleeps after a failed request even without retries, 5s after a 429,
+    # on top of the lib.retry backoff
+    backend = getattr(client, "_backend", None)
+    if hasattr(backend, "SLEEP_AFTER_FAILURE"):
+        backend.SLEEP_AFTER_FAILURE = _collections.defaultdict(float)
+
+    return client
+
+
+def get_async_cohere_client() -> "cohere.AsyncClient":
+    return _loop_singleton("cohere", _async_cohere_client)
+
+
+async def aclose() -> None:
+    """
+    Close the async clients of the running event loop, e.g. before the loop shuts down.
+    """
+
+    with _lock:
+        clients = _loop_singletons.pop(_asyncio.get_running_loop(), {})
+
+    # The SDK clients first, the httpx client they share last
+    for key in ("openai", "cohere", "http"):
+        client = clients.get(key)
+        if client is not None:
+            await (client.aclose() if key == "http" else client.close())
+
+
+def pool_stats() -> PoolStats:
+    """
+    Get statistics of the shared connection pools.
+
+    Returns:
+        PoolStats: The request count and the open, idle and active connections of the pools.
+    """
+
+    with _lock:
+        clients = [_singletons.get("http")]
+        clients += [loop_clients.get("http") for loop_clients in _loop_singletons.values()]
+
+    connections = []
+    for client in filter(None, clients):
+        # httpx does not expose its pool, read it from the httpcore transport when available
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections += list(getattr(pool, "connections", []))
+
+    idle = sum(1 for connection in connections if connection.is_idle())
+
+    return PoolStats(
+        requests=_requests["sync"] + _requests["async"],
+        connections=len(connections),
+        idle_connections=idle,
+        active_connections=len(connections) - idle,
+        http2=_http2(),
+    )
@@ -1,10 +1,112 @@
 import os
 
-from dotenv import find_dotenv, load_dotenv
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-load_dotenv(find_dotenv())
+# The .env file of the project root, found without walking the filesystem
+_DOTENV_PATH = os.getenv("DOTENV_PATH", os.path.join(_ROOT_DIR, ".env"))
+if os.path.isfile(_DOTENV_PATH):
+    from dotenv import load_dotenv
+
+    load_dotenv(_DOTENV_PATH)
 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 PALM_API_KEY = os.getenv("PALM_API_KEY")
 COHERE_API_KEY = os.getenv("COHERE_API_KEY")
+
+# Providers whose SDKs may be imported, by default the ones with an API key
+_KEYS = {"openai": OPENAI_API_KEY, "palm": PALM_API_KEY, "cohere": COHERE_API_KEY}
+PROVIDERS = [
+    provider.strip()
+    for provider in (
+        os.getenv("PROVIDERS") or ",".join(provider for provider, key in _KEYS.items() if key)
+    ).split(",")
+    if provider.strip()
+]
+
+# Process-wide provider limits, shared by every agent of a provider
+MAX_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+    "palm": int(os.getenv("PALM_MAX_CONCURRENCY", "8")),
+    "cohere": int(os.getenv("COHERE_MAX_CONCURRENCY", "8")),
+}
+REQUESTS_PER_MINUTE = {
+    "openai": float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "3500")),
+    "palm": float(os.getenv("PALM_REQUESTS_PER_MINUTE", "90")),
+    "cohere": float(os.getenv("COHERE_REQUESTS_PER_MINUTE", "100")),
+}
+# Tokens per minute of each provider, prompts and maximum completions, non-positive disables it
+TOKENS_PER_MINUTE = {
+    "openai": float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "160000")),
+    "palm": float(os.getenv("PALM_TOKENS_PER_MINUTE", "0")),
+    "cohere": float(os.getenv("COHERE_TOKENS_PER_MINUTE", "0")),
+}
+# Share of the provider slots and tokens that batch calls leave to the interactive ones
+INTERACTIVE_RESERVE = float(os.getenv("INTERACTIVE_RESERVE", "0.25"))
+
+# Shared HTTP connection pool
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+# Retries of failed model calls, the deadline covers a call and all of its retries
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "20"))
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "120"))
+
+# Identical model calls in flight at the same time share one request
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+# Tracing of agent calls, kept in an in-process ring buffer and optionally sent to OpenTelemetry
+TRACING = os.getenv("TRACING", "false").lower() in ("1", "true", "yes")
+TRACING_BUFFER_SIZE = int(os.getenv("TRACING_BUFFER_SIZE", "2048"))
+TRACING_OTEL = os.getenv("TRACING_OTEL", "false").lower() in ("1", "true", "yes")
+# Estimated USD prices per 1K prompt and completion tokens, PaLM bills characters, about 4 per token
+PRICES = {
+    "gpt-3.5-turbo-1106": (0.001, 0.002),
+    "models/text-bison-001": (0.001, 0.001),
+    "command": (0.001, 0.002),
+}
+
+# Local question bank, versioned with DVC, and the embedding index built from it
+_DATA_DIR = os.path.join(_ROOT_DIR, "data")
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join(_DATA_DIR, "question_bank.jsonl"))
+QUESTION_INDEX_DIR = os.getenv(
+    "QUESTION_INDEX_DIR", os.path.join(_DATA_DIR, "processed", "question_index")
+)
+
+# Text-to-speech of the questions and feedback, and the on-disk cache of the synthesized audio
+TTS_BACKEND = os.getenv("TTS_BACKEND", "openai")
+TTS_MODEL = os.getenv("TTS_MODEL", "tts-1")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(_DATA_DIR, "processed", "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 2**20)))
+
+# Local speech-to-text of spoken answers, "vosk" or empty to keep the app text-only
+STT_BACKEND = os.getenv("STT_BACKEND", "")
+STT_MODEL_PATH = os.getenv("STT_MODEL_PATH", os.path.join(_DATA_DIR, "models", "vosk"))
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+STT_SILENCE_MS = int(os.getenv("STT_SILENCE_MS", "600"))
+
+# Conversation memory: recent messages kept verbatim, how many older ones are summarized at once,
+# and the tokens of the history sent to the models
+MEMORY_WINDOW = int(os.getenv("MEMORY_WINDOW", "8"))
+MEMORY_SUMMARY_EVERY = int(os.getenv("MEMORY_SUMMARY_EVERY", "4"))
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1500"))
+
+# Background worker pool of each priority class for agent calls started by the app, raised to
+# the largest provider concurrency
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+
+# Durable job queue of the evaluations, "sqlite" or empty to evaluate in the app process.
+# The app starts JOBS_APP_WORKERS workers itself, 0 leaves the jobs to `python -m lib.jobs`.
+# The lease outlasts REQUEST_DEADLINE, so a slow evaluation is not run twice.
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "").lower()
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(_DATA_DIR, "processed", "jobs.sqlite3"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+JOBS_APP_WORKERS = int(os.getenv("JOBS_APP_WORKERS", "2"))
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "180"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "0.2"))
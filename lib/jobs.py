@@ -0,0 +1,560 @@
+"""
+Durable job queue backed by SQLite, for evaluations that must survive the app process.
+
+The app submits jobs and polls their status, workers claim them with a lease and run them
+with the existing agents. A job whose worker died becomes claimable again once its lease
+expires, failed jobs are retried with a backoff, and idempotency keys make resubmitting the
+same work return the existing job, or queue it again if it was cancelled or failed.
+
+Usage:
+    python -m lib.jobs [--workers 4] [--db data/processed/jobs.sqlite3]
+"""
+
+import argparse as _argparse
+import importlib as _importlib
+import json as _json
+import os as _os
+import socket as _socket
+import sqlite3 as _sqlite3
+import sys as _sys
+import threading as _threading
+import time as _time
+from typing import Any, Callable
+
+from lib.clients import get_agent as _get_agent
+from lib.clients import get_semantic_cache as _get_semantic_cache
+from lib.configs import JOBS_DB_PATH as _JOBS_DB_PATH
+from lib.configs import JOBS_LEASE_SECONDS as _JOBS_LEASE_SECONDS
+from lib.configs import JOBS_MAX_ATTEMPTS as _JOBS_MAX_ATTEMPTS
+from lib.configs import JOBS_POLL_INTERVAL as _JOBS_POLL_INTERVAL
+from lib.configs import JOBS_WORKERS as _JOBS_WORKERS
+from lib.limits import scheduling as _scheduling
+from lib.types import Evaluation, Job, JobStats
+
+__all__ = ["JobQueue", "JobWorker", "evaluate", "get_job_queue", "HANDLERS"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+"""
+_COLUMNS = "id, key, kind, payload, status, attempts, result, error, created_at, updated_at"
+# Workers beat this often, and are presumed dead after missing three beats
+_HEARTBEAT_SECONDS = 5.0
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str = _JOBS_DB_PATH,
+        lease_seconds: float = _JOBS_LEASE_SECONDS,
+        max_attempts: int = _JOBS_MAX_ATTEMPTS,
+        retry_delay: float = 1.0,
+    ):
+        """
+        Job queue in a SQLite database in WAL mode, shared by the threads and processes using it.
+
+        Jobs go from "queued" to "running" when a worker claims them, then to "done", back to
+        "queued" to be retried, or to "failed" after `max_attempts`. A running job whose lease
+        expired is claimable again, its worker is presumed dead.
+
+        Args:
+            path (str, optional): The database file. Defaults to JOBS_DB_PATH.
+            lease_seconds (float, optional): How long a claimed job stays invisible to the other
+                workers. Defaults to JOBS_LEASE_SECONDS.
+            max_attempts (int, optional): The runs of a job before it fails. Defaults to JOBS_MAX_ATTEMPTS.
+            retry_delay (float, optional): Seconds before the first retry, doubled on each attempt.
+                Defaults to 1.
+        """
+
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = _threading.local()
+        # Wakes the idle workers of this process as soon as a job is submitted
+        self._submitted = _threading.Condition()
+
+        if _os.path.dirname(path):
+            _os.makedirs(_os.path.dirname(path), exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def submit(self, kind: str, payload: dict, key: str | None = None) -> int:
+        """
+        Queue a job, or find the job already submitted with the same key.
+
+        A cancelled or failed job submitted again with its key is queued again, with all its
+        attempts.
+
+        Args:
+            kind (str): The job kind, which picks the worker handler, e.g. "evaluate".
+            payload (dict): The JSON-serializable handler input.
+            key (str | None, optional): The idempotency key. Defaults to None.
+
+        Returns:
+            int: The job id.
+        """
+
+        now = _time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "INSERT INTO jobs (key, kind, payload, status, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET status = 'queued', attempts = 0, available_at = ?, "
+            "error = NULL, updated_at = ? WHERE jobs.status IN ('cancelled', 'failed') "
+            "RETURNING id",
+            (key, kind, _json.dumps(payload), now, now, now, now, now),
+        ).fetchone()
+        if row is None:
+            row = connection.execute("SELECT id FROM jobs WHERE key = ?", (key,)).fetchone()
+
+        with self._submitted:
+            self._submitted.notify()
+
+        return row[0]
+
+    def claim(self, worker: str, job_ids: list[int] | None = None) -> Job | None:
+        """
+        Take the next job that is due, with a lease.
+
+        Args:
+            worker (str): The id of the claiming worker, needed to complete the job.
+            job_ids (list[int] | None, optional): Only claim one of these jobs. Defaults to None.
+
+        Returns:
+            Job | None: The job, or None if no job is due.
+        """
+
+        now = _time.time()
+        connection = self._connection()
+        due = "status IN ('queued', 'running') AND available_at <= ? AND attempts < ?"
+        parameters = [now, self.max_attempts]
+        if job_ids is not None:
+            due += f" AND id IN ({', '.join('?' * len(job_ids))})"
+            parameters += job_ids
+
+        # An idle poll only reads, it does not take the database write lock
+        if (
+            connection.execute(f"SELECT 1 FROM jobs WHERE {due} LIMIT 1", parameters).fetchone()
+            is None
+        ):
+            return None
+
+        # One statement, so two workers never claim the same job
+        row = connection.execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, available_at = ?, "
+            f"worker = ?, updated_at = ? WHERE id = (SELECT id FROM jobs WHERE {due} "
+            f"ORDER BY available_at LIMIT 1) RETURNING {_COLUMNS}",
+            (now + self.lease_seconds, worker, now, *parameters),
+        ).fetchone()
+
+        return None if row is None else self._job(row)
+
+    def complete(self, job_id: int, worker: str, result: Any) -> bool:
+        """
+        Store the result of a claimed job.
+
+        Args:
+            job_id (int): The job id.
+            worker (str): The worker that claimed it.
+            result (Any): The JSON-serializable result.
+
+        Returns:
+            bool: False if the lease was lost, e.g. expired and claimed by another worker.
+        """
+
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (_json.dumps(result), _time.time(), job_id, worker),
+        )
+
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> bool:
+        """
+        Record a failed run of a claimed job, which is retried later if it has attempts left.
+
+        Args:
+            job_id (int): The job id.
+            worker (str): The worker that claimed it.
+            error (str): The error.
+
+        Returns:
+            bool: False if the lease was lost.
+        """
+
+        now = _time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "available_at = ? + ? * (1 << (attempts - 1)), error = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (self.max_attempts, now, self.retry_delay, error, now, job_id, worker),
+        )
+
+        return cursor.rowcount == 1
+
+    def cancel(self, job_ids: list[int]) -> None:
+        # Running jobs finish, but nobody waits for their result anymore
+        self._connection().execute(
+            f"UPDATE jobs SET status = 'cancelled', updated_at = ? "
+            f"WHERE id IN ({', '.join('?' * len(job_ids))}) AND status = 'queued'",
+            (_time.time(), *job_ids),
+        )
+
+    def get(self, job_ids: list[int]) -> dict[int, Job]:
+        """
+        Read jobs, e.g. to poll their status.
+
+        Args:
+            job_ids (list[int]): The job ids.
+
+        Returns:
+            dict[int, Job]: The jobs found, by id.
+        """
+
+        if not job_ids:
+            return {}
+
+        rows = self._connection().execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE id IN ({', '.join('?' * len(job_ids))})",
+            job_ids,
+        )
+
+        return {row[0]: self._job(row) for row in rows}
+
+    def stats(self) -> JobStats:
+        counts = dict(
+            self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        )
+
+        return JobStats(
+            queued=counts.get("queued", 0),
+            running=counts.get("running", 0),
+            done=counts.get("done", 0),
+            failed=counts.get("failed", 0),
+            cancelled=counts.get("cancelled", 0),
+        )
+
+    def prune(self, older_than: float) -> int:
+        """
+        Delete the finished jobs last updated more than `older_than` seconds ago.
+
+        Args:
+            older_than (float): The age in seconds.
+
+        Returns:
+            int: The number of jobs deleted.
+        """
+
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND updated_at < ?",
+            (_time.time() - older_than,),
+        )
+
+        return cursor.rowcount
+
+    def sweep(self) -> int:
+        """
+        Fail the running jobs whose last lease expired, they have used all their attempts.
+
+        Returns:
+            int: The number of jobs failed.
+        """
+
+        now = _time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'failed', error = 'Lease expired', updated_at = ? "
+            "WHERE status = 'running' AND available_at <= ? AND attempts >= ?",
+            (now, now, self.max_attempts),
+        )
+
+        return cursor.rowcount
+
+    def heartbeat(self, worker: str) -> None:
+        # Tells the app that a worker is alive to run its jobs
+        self._connection().execute(
+            "INSERT INTO workers (name, seen_at) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET seen_at = excluded.seen_at",
+            (worker, _time.time()),
+        )
+
+    def forget(self, worker: str) -> None:
+        self._connection().execute("DELETE FROM workers WHERE name = ?", (worker,))
+
+    def alive(self) -> int:
+        """
+        Count the workers, in any process, that beat recently.
+
+        Returns:
+            int: The number of live workers.
+        """
+
+        (count,) = (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM workers WHERE seen_at > ?",
+                (_time.time() - 3 * _HEARTBEAT_SECONDS,),
+            )
+            .fetchone()
+        )
+
+        return count
+
+    def wait(self, timeout: float) -> None:
+        # Sleep until a job is submitted by this process, or the timeout for other processes' jobs
+        with self._submitted:
+            self._submitted.wait(timeout)
+
+    def wake(self) -> None:
+        # Wakes all the idle workers of this process, e.g. to stop them
+        with self._submitted:
+            self._submitted.notify_all()
+
+    def _connection(self) -> _sqlite3.Connection:
+        # SQLite connections must not be shared between threads, one per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Durable at each checkpoint of the WAL rather than at each commit, the lease and
+            # retries cover a job lost by a power failure
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+
+        return connection
+
+    def _job(self, row: tuple) -> Job:
+        id, key, kind, payload, status, attempts, result, error, created_at, updated_at = row
+
+        return Job(
+            id=id,
+            key=key,
+            kind=kind,
+            payload=_json.loads(payload),
+            status=status,
+            attempts=attempts,
+            result=None if result is None else _json.loads(result),
+            error=error,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+
+
+def evaluate(payload: dict) -> Evaluation:
+    """
+    Evaluate an answer with one of the response evaluation agents.
+
+    Args:
+        payload (dict): The `agent` class name in lib.agents, the `question`, the `response`
+            and the `session` that shares the provider limits fairly with the others.
+
+    Returns:
+        Evaluation: The evaluation.
+
+    Raises:
+        RuntimeError: If the evaluation failed, for the job to be retried.
+    """
+
+    # Imported on the first job, the app only submits and polls
+    agents = _importlib.import_module("lib.agents")
+    # The same instance and semantic cache as the app's agent when run in the app process
+    agent = _get_agent(getattr(agents, payload["agent"]), semantic_cache=_get_semantic_cache())
+
+    with _scheduling(payload.get("session"), "evaluation"):
+        evaluation = agent.run(payload["question"], payload["response"])
+    if evaluation is None:
+        raise RuntimeError(f"{payload['agent']} could not evaluate the response")
+
+    return evaluation
+
+
+# The handler of each job kind
+HANDLERS: dict[str, Callable[[dict], Any]] = {"evaluate": evaluate}
+
+
+class JobWorker:
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: dict[str, Callable[[dict], Any]] | None = None,
+        workers: int = _JOBS_WORKERS,
+        poll_interval: float = _JOBS_POLL_INTERVAL,
+        max_poll_interval: float = 2.0,
+    ):
+        """
+        Threads running the jobs of a queue.
+
+        Idle threads poll the queue with a backoff from `poll_interval` up to
+        `max_poll_interval`, and wake up at once for jobs submitted in the same process. Another
+        thread beats for the app to know a worker is alive, and fails the expired jobs that
+        used all their attempts.
+
+        Args:
+            queue (JobQueue): The queue.
+            handlers (dict[str, Callable[[dict], Any]] | None, optional): The handler of each job
+                kind, returning its result or raising to retry. Defaults to HANDLERS.
+            workers (int, optional): The threads. Defaults to JOBS_WORKERS.
+            poll_interval (float, optional): Seconds between polls of an idle thread at first.
+                Defaults to JOBS_POLL_INTERVAL.
+            max_poll_interval (float, optional): Seconds between polls of a long idle thread.
+                Defaults to 2.
+        """
+
+        self.queue = queue
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.name = f"{_socket.gethostname()}:{_os.getpid()}:{id(self):x}"
+        self._stopped = _threading.Event()
+        self._threads: list[_threading.Thread] = []
+
+    def start(self) -> "JobWorker":
+        self._stopped.clear()
+        self._threads = [
+            _threading.Thread(
+                target=self._loop, args=(f"{self.name}:{i}",), name=f"job-worker-{i}", daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        if self.workers:
+            # Alive as soon as started, not after the first beat
+            self.queue.heartbeat(self.name)
+            self._threads.append(
+                _threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+            )
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        # The jobs in progress finish first
+        self._stopped.set()
+        self.queue.wake()
+        for thread in self._threads:
+            thread.join(timeout)
+        self.queue.forget(self.name)
+
+    def run_pending(self, job_ids: list[int]) -> int:
+        """
+        Run due jobs among `job_ids` in the calling thread, e.g. when no worker is alive.
+
+        Args:
+            job_ids (list[int]): The jobs to run.
+
+        Returns:
+            int: The number of jobs run.
+        """
+
+        worker = f"{self.name}:{_threading.get_ident():x}"
+        count = 0
+
+        while (job := self.queue.claim(worker, job_ids)) is not None:
+            self._run(worker, job)
+            count += 1
+
+        return count
+
+    def _loop(self, worker: str) -> None:
+        idle = self.poll_interval
+
+        while not self._stopped.is_set():
+            try:
+                job = self.queue.claim(worker)
+                if job is None:
+                    self.queue.wait(idle)
+                    idle = min(idle * 2, self.max_poll_interval)
+                    continue
+
+                idle = self.poll_interval
+                self._run(worker, job)
+            except Exception as error:
+                # e.g. the database stayed locked past its timeout. The thread keeps running, as
+                # long as it heartbeats it must take jobs, and a job it held is freed by its lease
+                print(f"{worker}: {type(error).__name__}: {error}", file=_sys.stderr)
+                self._stopped.wait(idle)
+
+    def _maintain(self) -> None:
+        # Periodic rather than on each idle poll, which would all take the database write lock
+        while not self._stopped.wait(_HEARTBEAT_SECONDS):
+            self.queue.heartbeat(self.name)
+            self.queue.sweep()
+
+    def _run(self, worker: str, job: Job) -> None:
+        handler = self.handlers.get(job["kind"])
+
+        try:
+            if handler is None:
+                raise KeyError(f"No handler for {job['kind']} jobs")
+            result = handler(job["payload"])
+            # Inside the try, a result that is not JSON fails the job instead of the worker
+            self.queue.complete(job["id"], worker, result)
+        except Exception as error:
+            self.queue.fail(job["id"], worker, f"{type(error).__name__}: {error}")
+
+
+_queues: dict[str, JobQueue] = {}
+_queues_lock = _threading.Lock()
+
+
+def get_job_queue(path: str = _JOBS_DB_PATH) -> JobQueue:
+    """
+    Get the process-wide queue of a database, creating it on first use.
+
+    Args:
+        path (str, optional): The database file. Defaults to JOBS_DB_PATH.
+
+    Returns:
+        JobQueue: The shared queue.
+    """
+
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = JobQueue(path)
+
+        return _queues[path]
+
+
+def main():
+    parser = _argparse.ArgumentParser(
+        prog="python -m lib.jobs",
+        description=__doc__,
+        formatter_class=_argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--workers", type=int, default=_JOBS_WORKERS, help="worker threads")
+    parser.add_argument("--db", default=_JOBS_DB_PATH, help="queue database")
+    args = parser.parse_args()
+
+    queue = get_job_queue(args.db)
+    worker = JobWorker(queue, workers=args.workers).start()
+    print(f"{args.workers} workers on {args.db}, Ctrl-C to stop")
+
+    try:
+        while True:
+            _time.sleep(60)
+            print(queue.stats())
+    except KeyboardInterrupt:
+        print("Stopping, the jobs in progress finish first")
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,533 @@
+import asyncio as _asyncio
+import bisect as _bisect
+import contextlib as _contextlib
+import contextvars as _contextvars
+import heapq as _heapq
+import itertools as _itertools
+import math as _math
+import threading as _threading
+import time as _time
+from typing import Iterator
+
+from lib.configs import INTERACTIVE_RESERVE as _INTERACTIVE_RESERVE
+from lib.configs import MAX_CONCURRENCY as _MAX_CONCURRENCY
+from lib.configs import REQUESTS_PER_MINUTE as _REQUESTS_PER_MINUTE
+from lib.configs import TOKENS_PER_MINUTE as _TOKENS_PER_MINUTE
+from lib.retry import DeadlineExceeded as _DeadlineExceeded
+from lib.retry import request_timeout as _request_timeout
+from lib.tracing import record_wait as _record_wait
+from lib.types import HistogramStats, Priority, SchedulerStats
+
+__all__ = [
+    "TokenBucket",
+    "Histogram",
+    "ProviderLimiter",
+    "get_limiter",
+    "set_limits",
+    "scheduling",
+    "current_priority",
+]
+
+# Rank of each priority class, the lower first
+_PRIORITIES: dict[Priority, int] = {"question": 0, "evaluation": 1, "batch": 2}
+_BATCH = _PRIORITIES["batch"]
+_WAIT_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_DEPTH_BOUNDS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# Tenant, priority class and weight of the provider calls started in the current context
+_scheduling: _contextvars.ContextVar[tuple[str, Priority, float]] = _contextvars.ContextVar(
+    "scheduling", default=("default", "evaluation", 1.0)
+)
+
+
+@_contextlib.contextmanager
+def scheduling(
+    tenant: str | None = None, priority: Priority | None = None, weight: float | None = None
+) -> Iterator[None]:
+    """
+    Schedule the provider calls started in the block for a tenant and a priority class.
+
+    Calls started in background threads or tasks from the block inherit it, like tracing.session.
+
+    Args:
+        tenant (str | None, optional): The tenant that shares the provider limits fairly with the
+            others of its class, e.g. the session id. Defaults to the current one.
+        priority (Priority | None, optional): "question" for the interactive questions,
+            "evaluation" for the interactive evaluations, "batch" for bulk jobs. Defaults to the
+            current one, "evaluation" outside of any block.
+        weight (float | None, optional): The share of the tenant relative to the others.
+            Defaults to the current one, 1.
+    """
+
+    current = _scheduling.get()
+    token = _scheduling.set(
+        (
+            tenant if tenant is not None else current[0],
+            priority if priority is not None else current[1],
+            weight if weight is not None else current[2],
+        )
+    )
+    try:
+        yield
+    finally:
+        _scheduling.reset(token)
+
+
+def current_priority() -> Priority:
+    # The priority class the calls started here are scheduled in
+    return _scheduling.get()[1]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        """
+        Token bucket that hands out reservations instead of blocking.
+
+        Args:
+            rate (float): Tokens added per second. A non-positive rate disables the bucket.
+            capacity (float | None, optional): Maximum burst size. Defaults to one second of tokens.
+        """
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = _time.monotonic()
+        self._lock = _threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket, going into debt if it is empty.
+
+        Args:
+            tokens (float, optional): The number of tokens to take. Defaults to 1.
+
+        Returns:
+            float: The number of seconds the caller has to wait before using the tokens.
+        """
+
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = _time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+
+            return max(0.0, -self._tokens / self.rate)
+
+    def level(self) -> float:
+        # The tokens that can be taken without waiting, negative while in debt
+        if self.rate <= 0:
+            return _math.inf
+
+        with self._lock:
+            elapsed = _time.monotonic() - self._updated
+            return min(self.capacity, self._tokens + elapsed * self.rate)
+
+
+class Histogram:
+    def __init__(self, bounds: tuple[float, ...]):
+        """
+        Histogram with fixed buckets, cheap enough to observe every provider call.
+
+        Not thread-safe, the owner observes it under its own lock.
+
+        Args:
+            bounds (tuple[float, ...]): The increasing upper bounds of the buckets.
+        """
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[_bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile as the upper bound of its bucket.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, 0 without observations and inf beyond the last bound.
+        """
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+
+        return _math.inf if self.counts[-1] else 0.0
+
+    def snapshot(self) -> HistogramStats:
+        return HistogramStats(
+            bounds=list(self.bounds),
+            counts=list(self.counts),
+            count=self.count,
+            sum=self.sum,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+        )
+
+
+class _Waiter:
+    # One call waiting for a slot, woken by an event or, from a coroutine, a future
+    __slots__ = ("priority", "tokens", "handle", "enqueued", "granted", "delay")
+
+    def __init__(self, priority: Priority, tokens: float, handle):
+        self.priority = priority
+        self.tokens = tokens
+        self.handle = handle
+        self.enqueued = _time.perf_counter()
+        self.granted = False
+        self.delay = 0.0
+
+
+class _Slot:
+    # `with limiter.slot(tokens):` and `async with limiter.slot(tokens):`
+    __slots__ = ("limiter", "tokens")
+
+    def __init__(self, limiter: "ProviderLimiter", tokens: float):
+        self.limiter = limiter
+        self.tokens = tokens
+
+    def __enter__(self):
+        self.limiter.acquire(self.tokens)
+        return self.limiter
+
+    def __exit__(self, *exc_info):
+        self.limiter.release()
+
+    async def __aenter__(self):
+        await self.limiter.aacquire(self.tokens)
+        return self.limiter
+
+    async def __aexit__(self, *exc_info):
+        self.limiter.release()
+
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        interactive_reserve: float = _INTERACTIVE_RESERVE,
+    ):
+        """
+        Concurrency and rate limiter shared by threads and event loops of one process, and the
+        scheduler of the calls waiting for it.
+
+        Use it as `with limiter.slot(tokens):` from synchronous code and
+        `async with limiter.slot(tokens):` from coroutines, or `with limiter:` for calls that
+        spend no tokens. Both forms draw from the same pool of slots, so a Streamlit thread and a
+        batch of coroutines never exceed the provider limits together.
+
+        Freed slots go to the waiting calls by priority class, see `scheduling`, then by weighted
+        fair queueing among the tenants of a class: each call is tagged with the tokens its tenant
+        requested so far over its weight, and the lowest tag goes first, so a tenant with many
+        calls queued cannot starve the others.
+
+        Only the calls of the first class may spend tokens ahead of the per-minute budget and wait
+        for it holding their slot, the others wait in the queue until the budget has their tokens.
+        Batch calls also leave `interactive_reserve` of the slots and of the budget to the
+        interactive ones, so an interactive call never waits behind what a bulk job used up.
+
+        Args:
+            max_concurrency (int): The maximum number of calls in flight.
+            requests_per_minute (float): The sustained request rate. Non-positive disables it.
+            tokens_per_minute (float, optional): The sustained token rate, of the prompts and
+                maximum completions. Non-positive disables it. Defaults to 0.
+            interactive_reserve (float, optional): The share of the slots and tokens batch calls
+                cannot use. Defaults to INTERACTIVE_RESERVE.
+        """
+
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate=requests_per_minute / 60)
+        # Ten seconds of tokens in a burst, a minute would let a bulk job take it at once
+        self.tokens = TokenBucket(rate=tokens_per_minute / 60, capacity=tokens_per_minute / 6)
+        self.reserved_slots = int(self.max_concurrency * interactive_reserve)
+        self.reserved_tokens = self.tokens.capacity * interactive_reserve
+        self.waits = {priority: Histogram(_WAIT_BOUNDS) for priority in _PRIORITIES}
+        self.depth = Histogram(_DEPTH_BOUNDS)
+        self._available = self.max_concurrency
+        self._waiters: list[tuple[int, float, int, _Waiter]] = []
+        self._sequence = _itertools.count()
+        # Virtual time of each class and the last tag of each of its tenants
+        self._virtual = [0.0] * len(_PRIORITIES)
+        self._finish: dict[tuple[int, str], float] = {}
+        self._timer: _threading.Timer | None = None
+        self._lock = _threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self.max_concurrency - self._available
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def slot(self, tokens: float = 0) -> _Slot:
+        """
+        Reserve a slot for a call, e.g. `with limiter.slot(tokens):`.
+
+        Args:
+            tokens (float, optional): The tokens of the call, counted against the tokens per
+                minute and the tenant's fair share. Defaults to 0.
+
+        Returns:
+            _Slot: The context manager holding the slot.
+        """
+
+        return _Slot(self, tokens)
+
+    def acquire(self, tokens: float = 0) -> None:
+        start = _time.perf_counter()
+
+        with self._lock:
+            waiter = self._enqueue(tokens, _threading.Event())
+
+        # Wait for a slot to be handed over by `release`, within the deadline of the retrying call
+        timeout = _request_timeout(_math.inf)
+        if not waiter.handle.wait(None if timeout == _math.inf else timeout):
+            if self._dequeue(waiter):
+                raise _DeadlineExceeded("No provider slot freed before the deadline")
+
+        if waiter.delay:
+            try:
+                _time.sleep(waiter.delay)
+            except BaseException:
+                # e.g. KeyboardInterrupt, `__exit__` never runs for a failed `__enter__`
+                self.release()
+                raise
+
+        _record_wait(_time.perf_counter() - start)
+
+    async def aacquire(self, tokens: float = 0) -> None:
+        start = _time.perf_counter()
+
+        with self._lock:
+            waiter = self._enqueue(tokens, _asyncio.get_running_loop().create_future())
+
+        # Wait for a slot to be handed over by `release`
+        future = waiter.handle
+        try:
+            await future
+        except _asyncio.CancelledError:
+            if self._dequeue(waiter):
+                future = None
+            # The slot was already handed over, pass it on
+            if future is not None and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+        if waiter.delay:
+            try:
+                await _asyncio.sleep(waiter.delay)
+            except _asyncio.CancelledError:
+                # The slot is held but `__aexit__` never runs for a cancelled `__aenter__`
+                self.release()
+                raise
+
+        _record_wait(_time.perf_counter() - start)
+
+    def release(self) -> None:
+        with self._lock:
+            self._available += 1
+            self._dispatch()
+
+    def stats(self) -> SchedulerStats:
+        with self._lock:
+            waiting = {priority: 0 for priority in _PRIORITIES}
+            for _, _, _, waiter in self._waiters:
+                waiting[waiter.priority] += 1
+
+            return SchedulerStats(
+                in_flight=self.in_flight,
+                waiting=waiting,
+                tokens_available=self.tokens.level() if self.tokens.rate > 0 else None,
+                wait={priority: self.waits[priority].snapshot() for priority in _PRIORITIES},
+                depth=self.depth.snapshot(),
+            )
+
+    def _enqueue(self, tokens: float, handle) -> _Waiter:
+        # Called with the lock held
+        tenant, priority, weight = _scheduling.get()
+        rank = _PRIORITIES[priority]
+        waiter = _Waiter(priority, tokens, handle)
+
+        # A tenant's calls are spaced by their cost over its weight, from the virtual time of its
+        # class when it was idle, so it gets no credit for the time it did not use
+        key = (rank, tenant)
+        finish = max(self._virtual[rank], self._finish.get(key, 0.0)) + max(1.0, tokens) / weight
+        self._finish[key] = finish
+
+        self.depth.observe(len(self._waiters))
+        _heapq.heappush(self._waiters, (rank, finish, next(self._sequence), waiter))
+        self._dispatch()
+
+        return waiter
+
+    def _dequeue(self, waiter: _Waiter) -> bool:
+        # Give up waiting, False if the slot was handed over meanwhile and is now held
+        with self._lock:
+            if waiter.granted:
+                return False
+
+            self._waiters = [entry for entry in self._waiters if entry[3] is not waiter]
+            _heapq.heapify(self._waiters)
+            # It may have held back the waiters behind it
+            self._dispatch()
+
+            return True
+
+    def _dispatch(self) -> None:
+        # Called with the lock held, hands the free slots over to the first waiters
+        while self._available > 0 and self._waiters:
+            rank, finish, _, waiter = self._waiters[0]
+            if rank and not self._admit(rank, waiter.tokens):
+                break
+
+            _heapq.heappop(self._waiters)
+            self._available -= 1
+            self._virtual[rank] = finish
+            waiter.granted = True
+            waiter.delay = max(self.bucket.reserve(), self.tokens.reserve(waiter.tokens))
+            self.waits[waiter.priority].observe(
+                _time.perf_counter() - waiter.enqueued + waiter.delay
+            )
+
+            if isinstance(waiter.handle, _threading.Event):
+                waiter.handle.set()
+            else:
+                waiter.handle.get_loop().call_soon_threadsafe(self._wake, waiter.handle)
+
+        # The tags of the idle tenants are behind the virtual time, they are not needed anymore
+        if len(self._finish) > 1024:
+            self._finish = {
+                key: finish
+                for key, finish in self._finish.items()
+                if finish > self._virtual[key[0]]
+            }
+
+    def _admit(self, rank: int, tokens: float) -> bool:
+        # Called with the lock held, batch calls leave the reserve to the interactive ones
+        if rank == _BATCH and self._available <= self.reserved_slots:
+            return False
+
+        reserve = self.reserved_tokens if rank == _BATCH else 0.0
+        needed = min(tokens, self.tokens.capacity - reserve) + reserve
+        shortfall = needed - self.tokens.level()
+        if shortfall <= 0:
+            return True
+
+        # Nothing is released when the tokens refill, check again then
+        if self._timer is None:
+            self._timer = _threading.Timer(shortfall / self.tokens.rate, self._refilled)
+            self._timer.daemon = True
+            self._timer.start()
+
+        return False
+
+    def _refilled(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _wake(self, future: _asyncio.Future) -> None:
+        if future.done():
+            # The waiter has been cancelled in the meantime
+            self.release()
+        else:
+            future.set_result(None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = _threading.Lock()
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """
+    Get the process-wide limiter of a provider, creating it on first use.
+
+    Args:
+        provider (str): The provider name ("openai", "palm" or "cohere").
+
+    Returns:
+        ProviderLimiter: The limiter shared by every agent of the provider.
+    """
+
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(
+                max_concurrency=_MAX_CONCURRENCY.get(provider, 8),
+                requests_per_minute=_REQUESTS_PER_MINUTE.get(provider, 0),
+                tokens_per_minute=_TOKENS_PER_MINUTE.get(provider, 0),
+            )
+
+        return _limiters[provider]
+
+
+def set_limits(
+    provider: str,
+    max_concurrency: int | None = None,
+    requests_per_minute: float | None = None,
+    tokens_per_minute: float | None = None,
+    interactive_reserve: float = _INTERACTIVE_RESERVE,
+) -> ProviderLimiter:
+    """
+    Replace the process-wide limiter of a provider, e.g. to share the provider limits between
+    the processes of a pool.
+
+    Set it before the provider's first calls, the calls in flight keep the previous limiter.
+
+    Args:
+        provider (str): The provider name ("openai", "palm" or "cohere").
+        max_concurrency (int | None, optional): The maximum number of calls in flight.
+            Defaults to the configured one.
+        requests_per_minute (float | None, optional): The sustained request rate. Defaults to the
+            configured one.
+        tokens_per_minute (float | None, optional): The sustained token rate. Defaults to the
+            configured one.
+        interactive_reserve (float, optional): The share of the slots and tokens batch calls
+            cannot use, 0 for a process without interactive calls. Defaults to INTERACTIVE_RESERVE.
+
+    Returns:
+        ProviderLimiter: The new limiter.
+    """
+
+    if max_concurrency is None:
+        max_concurrency = _MAX_CONCURRENCY.get(provider, 8)
+    if requests_per_minute is None:
+        requests_per_minute = _REQUESTS_PER_MINUTE.get(provider, 0)
+    if tokens_per_minute is None:
+        tokens_per_minute = _TOKENS_PER_MINUTE.get(provider, 0)
+
+    with _limiters_lock:
+        _limiters[provider] = ProviderLimiter(
+            max_concurrency, requests_per_minute, tokens_per_minute, interactive_reserve
+        )
+
+        return _limiters[provider]
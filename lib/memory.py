@@ -0,0 +1,189 @@
+import re as _re
+import threading as _threading
+
+from lib.configs import MEMORY_MAX_TOKENS as _MEMORY_MAX_TOKENS
+from lib.configs import MEMORY_SUMMARY_EVERY as _MEMORY_SUMMARY_EVERY
+from lib.configs import MEMORY_WINDOW as _MEMORY_WINDOW
+from lib.prompts import count_tokens as _count_tokens
+from lib.prompts import truncate as _truncate
+from lib.types import MemoryState, Message
+
+__all__ = ["ConversationMemory", "transcript"]
+
+_SPEAKERS = {"assistant": "Interviewer", "user": "Candidate", "system": "Summary"}
+_FIRST_SENTENCE = _re.compile(r"(?<=[.!?])\s")
+# Tokens of the role and separators of each chat message
+_TOKENS_PER_MESSAGE = 4
+
+
+def transcript(messages: list[Message]) -> str:
+    """
+    Render messages as a plain transcript, one "Speaker: content" line each.
+
+    Args:
+        messages (list[Message]): The messages.
+
+    Returns:
+        str: The transcript.
+    """
+
+    return "\n".join(
+        f"{_SPEAKERS.get(message['role'], message['role'])}: {' '.join(message['content'].split())}"
+        for message in messages
+    )
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        messages: list[Message],
+        state: MemoryState | None = None,
+        summarizer=None,
+        window: int = _MEMORY_WINDOW,
+        summary_every: int = _MEMORY_SUMMARY_EVERY,
+        max_summary_tokens: int = 256,
+        model: str | None = None,
+    ):
+        """
+        Bounded memory of a conversation, for prompts that include its history.
+
+        The last `window` messages are kept verbatim. Once `summary_every` more have piled up
+        before them, the oldest ones are folded into a running summary, so each message is
+        summarized once and the summary grows by small steps instead of being rebuilt.
+
+        The memory reads the message list it is given and keeps its own state in `state`, a
+        small JSON-serializable dict, e.g. a part of the interview session state.
+
+        Args:
+            messages (list[Message]): The whole conversation, appended to by its owner.
+            state (MemoryState | None, optional): The state to resume. Defaults to None.
+            summarizer (optional): An agent whose `run(summary, transcript)` and `arun` return the
+                updated summary, e.g. OpenAIConversationSummaryAgent. Defaults to None, which
+                keeps the first sentence of each message instead.
+            window (int, optional): The recent messages kept verbatim. Defaults to MEMORY_WINDOW.
+            summary_every (int, optional): The messages folded into the summary at once.
+                Defaults to MEMORY_SUMMARY_EVERY.
+            max_summary_tokens (int, optional): The size of the extractive summary. Defaults to 256.
+            model (str | None, optional): The model name, for token counts. Defaults to None.
+        """
+
+        self.messages = messages
+        self.state = state if state is not None else MemoryState(summary="", summarized=0)
+        self.summarizer = summarizer
+        self.window = window
+        self.summary_every = max(1, summary_every)
+        self.max_summary_tokens = max_summary_tokens
+        self.model = model
+        # One update at a time, the others have nothing left to fold
+        self._lock = _threading.Lock()
+
+    @property
+    def summary(self) -> str:
+        return self.state["summary"]
+
+    @property
+    def summarized(self) -> int:
+        return self.state["summarized"]
+
+    def recent(self) -> list[Message]:
+        # The messages not folded into the summary yet, at least the last `window` ones
+        return self.messages[self.summarized :]
+
+    def due(self) -> bool:
+        return len(self.messages) - self.summarized >= self.window + self.summary_every
+
+    def update(self) -> None:
+        """
+        Fold the messages that left the window into the summary, if enough have.
+
+        Summarizer errors fall back to the extractive summary, the memory stays bounded.
+        """
+
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            while self.due():
+                start = self.summarized
+                batch = self.messages[start : start + self.summary_every]
+                summary = None
+                if self.summarizer is not None:
+                    summary = self.summarizer.run(self.summary, transcript(batch))
+
+                self._fold(summary, batch)
+        finally:
+            self._lock.release()
+
+    async def aupdate(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            while self.due():
+                start = self.summarized
+                batch = self.messages[start : start + self.summary_every]
+                summary = None
+                if self.summarizer is not None:
+                    summary = await self.summarizer.arun(self.summary, transcript(batch))
+
+                self._fold(summary, batch)
+        finally:
+            self._lock.release()
+
+    def view(self, max_tokens: int = _MEMORY_MAX_TOKENS) -> list[Message]:
+        """
+        Get the history to send to a model, within a token budget.
+
+        Args:
+            max_tokens (int, optional): The tokens of the history. Defaults to MEMORY_MAX_TOKENS.
+
+        Returns:
+            list[Message]: The summary as a system message, if any, then the most recent
+                messages that fit, the oldest of them trimmed if needed.
+        """
+
+        head: list[Message] = []
+        if self.summary:
+            # The summary takes at most half of the budget, the recent messages come first
+            summary = _truncate(self.summary, max_tokens // 2 - _TOKENS_PER_MESSAGE, self.model)
+            if summary:
+                head.append(
+                    Message(role="system", content=f"Summary of the conversation so far: {summary}")
+                )
+                max_tokens -= _count_tokens(head[0]["content"], self.model) + _TOKENS_PER_MESSAGE
+
+        tail: list[Message] = []
+        for message in reversed(self.recent()):
+            tokens = _count_tokens(message["content"], self.model) + _TOKENS_PER_MESSAGE
+            if tokens <= max_tokens:
+                tail.append(message)
+                max_tokens -= tokens
+                continue
+
+            content = _truncate(message["content"], max_tokens - _TOKENS_PER_MESSAGE, self.model)
+            if content:
+                tail.append(Message(role=message["role"], content=content))
+            break
+
+        return head + tail[::-1]
+
+    def _fold(self, summary: str | None, batch: list[Message]) -> None:
+        if summary is None:
+            summary = self._extract(batch)
+
+        self.state.update(summary=summary, summarized=self.summarized + len(batch))
+
+    def _extract(self, batch: list[Message]) -> str:
+        # The first sentence of each message, dropping the oldest lines beyond the size limit
+        lines = self.summary.splitlines()
+        for message in batch:
+            # The first sentence is in the beginning of the message, long reports are not scanned
+            first = _FIRST_SENTENCE.split(" ".join(message["content"][:400].split()), 1)[0]
+            lines.append(transcript([Message(role=message["role"], content=_truncate(first, 32))]))
+
+        while (
+            len(lines) > 1 and _count_tokens("\n".join(lines), self.model) > self.max_summary_tokens
+        ):
+            lines.pop(0)
+
+        return "\n".join(lines)
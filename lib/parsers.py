@@ -0,0 +1,396 @@
+import json as _json
+import re as _re
+import types as _types
+import typing as _typing
+from typing import Any, Iterable, Iterator
+
+from lib.types import Evaluation, Question
+
+__all__ = [
+    "IncrementalJSONParser",
+    "iter_json_members",
+    "iter_items",
+    "iter_fields",
+    "loads",
+    "validate",
+    "parse_questions",
+    "parse_evaluation",
+]
+
+# Characters that can change the parser state, everything else is skipped in bulk
+_STRUCTURAL = _re.compile(r'[\[\]{},"\\]')
+_STRING = _re.compile(r'["\\]')
+# Other spellings of the Literal values, normalized to the ones of the schemas
+_ALIASES = {"behavioral": "behavioural", "role specific": "role-specific"}
+
+
+class IncrementalJSONParser:
+    def __init__(self, schema: type | None = None):
+        """
+        Incremental parser for a streamed top-level JSON array or object.
+
+        Text is fed in arbitrary chunks. Every element of a top-level array, and every
+        `(key, value)` member of a top-level object, is returned as soon as it is closed,
+        without waiting for the rest of the document.
+
+        Model outputs are handled leniently: prose and markdown code fences around the JSON
+        are ignored, trailing commas are accepted, and a member that fails to decode is
+        skipped (and counted in `errors`) instead of failing the whole document. A bracketed
+        aside in the prose, a container closed without any member decoded, is skipped too and
+        the document is looked for after its opening bracket.
+
+        With a `schema`, the elements of an array are validated and normalized against it, and
+        those that do not match are skipped. A top-level object is validated as a whole, so its
+        members are only returned once it is closed. A container without any matching member is
+        skipped like an aside, e.g. the "[1]" of "Step [1]: ..." before a list of objects.
+
+        Args:
+            schema (type | None, optional): The TypedDict of the array elements, or of the
+                top-level object. Defaults to None.
+        """
+
+        self.schema = schema
+        self.done = False
+        self.container: str | None = None
+        self.errors = 0
+        self._buffer = ""
+        self._position = 0
+        self._start = 0
+        self._opened = 0
+        self._found = 0
+        self._skipped = 0
+        self._rejected = 0
+        self._pending: list[tuple[str, Any]] = []
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, text: str) -> list[Any]:
+        """
+        Consume a chunk of text.
+
+        Args:
+            text (str): The next chunk of the document.
+
+        Returns:
+            list[Any]: The array elements or `(key, value)` object members completed by this chunk.
+        """
+
+        if self.done:
+            return []
+
+        self._buffer += text
+        members = []
+
+        while not self.done:
+            if self.container is None:
+                # Skip everything before the top-level container
+                match = _re.search(r"[\[{]", self._buffer[self._position :])
+                if match is None:
+                    self._position = len(self._buffer)
+                    break
+
+                self._position += match.start()
+                self.container = self._buffer[self._position]
+                self._opened = self._position
+                self._found = 0
+                self._skipped = self.errors
+                self._rejected = 0
+                self._pending = []
+                self._depth = 1
+                self._position += 1
+                self._start = self._position
+                continue
+
+            pattern = _STRING if self._in_string else _STRUCTURAL
+            match = pattern.search(self._buffer, self._position)
+            if match is None:
+                self._position = len(self._buffer)
+                break
+
+            char = match.group()
+            position = match.start()
+
+            if char == "\\":
+                # Escapes only appear inside strings, skip the escaped character
+                if position + 1 >= len(self._buffer):
+                    self._position = position
+                    break
+                self._position = position + 2
+                continue
+
+            if char == '"':
+                self._in_string = not self._in_string
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(position))
+                    members.extend(self._object())
+                    if not self._found and (self.errors > self._skipped or self._rejected):
+                        # Not the document, e.g. "[see below]": scan again after its opening
+                        self.errors = self._skipped
+                        self.container = None
+                        self._position = self._opened + 1
+                        continue
+                    self.done = True
+            elif self._depth == 1:
+                members.extend(self._member(position))
+                self._start = position + 1
+
+            self._position = position + 1
+
+        # Drop the text that has been fully consumed, a container without any member yet may
+        # still be scanned again from its opening
+        end = self._start if self._found else self._opened
+        if self.container is None:
+            self._buffer = ""
+            self._position = 0
+        elif end > 0:
+            self._buffer = self._buffer[end:]
+            self._position -= end
+            self._start -= end
+            self._opened -= end
+
+        return members
+
+    def _member(self, end: int) -> list[Any]:
+        text = self._buffer[self._start : end].strip()
+        if not text:
+            return []
+
+        try:
+            if self.container == "[":
+                members = [_json.loads(text)]
+            else:
+                members = list(_json.loads("{" + text + "}").items())
+        except ValueError:
+            self.errors += 1
+            return []
+
+        if self.schema is not None and self.container == "{":
+            # Validated as a whole once the object is closed
+            self._pending.extend(members)
+            return []
+
+        if self.schema is not None:
+            decoded = len(members)
+            members = [
+                item for item in (validate(m, self.schema) for m in members) if item is not None
+            ]
+            self._rejected += decoded - len(members)
+
+        self._found += len(members)
+
+        return members
+
+    def _object(self) -> list[Any]:
+        if self.schema is None or self.container != "{" or not self._pending:
+            return []
+
+        item = validate(dict(self._pending), self.schema)
+        self._pending = []
+        if item is None:
+            self._rejected += 1
+            return []
+
+        self._found += len(item)
+
+        return list(item.items())
+
+
+def iter_json_members(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield the members of a streamed JSON document as soon as they are complete.
+
+    Args:
+        chunks (Iterable[str]): The text chunks of the document.
+
+    Yields:
+        Any: The array elements or `(key, value)` object members.
+    """
+
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def iter_items(chunks: Iterable[str], schema: type) -> Iterator[Any]:
+    """
+    Yield the valid elements of a streamed JSON array as soon as they are complete.
+
+    Args:
+        chunks (Iterable[str]): The text chunks of the document.
+        schema (type): The TypedDict every element is validated against.
+
+    Yields:
+        Any: The normalized elements that match the schema.
+    """
+
+    parser = IncrementalJSONParser(schema)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def iter_fields(chunks: Iterable[str], schema: type) -> Iterator[tuple[str, Any]]:
+    """
+    Yield the valid fields of a streamed JSON object as soon as they are complete.
+
+    Each field is normalized like `validate` does, unknown keys and values that do not match
+    their type are skipped, so the fields are those `validate` keeps from the whole object.
+
+    Args:
+        chunks (Iterable[str]): The text chunks of the document.
+        schema (type): The TypedDict of the object.
+
+    Yields:
+        tuple[str, Any]: The `(key, value)` pairs of the matching fields.
+    """
+
+    hints = _typing.get_type_hints(schema)
+    parser = IncrementalJSONParser()
+    for chunk in chunks:
+        for member in parser.feed(chunk):
+            # The elements of an array are not fields
+            if parser.container != "{" or member[0] not in hints:
+                continue
+
+            key, value = member
+            ok, value = _check(value, hints[key])
+            if ok:
+                yield key, value
+
+
+def loads(text: str, partial: bool = False, schema: type | None = None) -> Any:
+    """
+    Leniently decode the JSON array or object in a model output.
+
+    Args:
+        text (str): The model output, possibly wrapped in prose or code fences.
+        partial (bool, optional): Return the complete members of a truncated document. Defaults to False.
+        schema (type | None, optional): The TypedDict of the array elements, the first array with
+            matching elements is decoded and only those are kept, or of the object, the first
+            matching object is decoded. Defaults to None.
+
+    Raises:
+        ValueError: If the output holds no JSON container, or a truncated one and `partial` is False.
+
+    Returns:
+        Any: The decoded list or dict.
+    """
+
+    parser = IncrementalJSONParser(schema)
+    members = parser.feed(text)
+
+    if parser.container is None:
+        raise ValueError("No JSON array or object found")
+    if not parser.done and not partial:
+        raise ValueError("Truncated JSON document")
+
+    if parser.container == "[":
+        return members
+
+    return dict(members)
+
+
+def validate(item: Any, schema: type) -> Any:
+    """
+    Validate and normalize a decoded item against a TypedDict.
+
+    Literal string fields are matched case-insensitively, with their other spellings such as
+    "behavioral", and normalized, optional fields that are missing are filled with None, and
+    unknown keys are dropped.
+
+    Args:
+        item (Any): The decoded item.
+        schema (type): The TypedDict to validate against.
+
+    Returns:
+        Any: The normalized item, or None if it does not match the schema.
+    """
+
+    if not isinstance(item, dict):
+        return None
+
+    normalized = {}
+    for key, hint in _typing.get_type_hints(schema).items():
+        ok, value = _check(item.get(key), hint)
+        if not ok:
+            return None
+
+        normalized[key] = value
+
+    return normalized
+
+
+def _check(value: Any, hint: Any) -> tuple[bool, Any]:
+    origin = _typing.get_origin(hint)
+    args = _typing.get_args(hint)
+
+    if hint is type(None):
+        return value is None, value
+    if hint is str:
+        return isinstance(value, str), value
+    if origin is _typing.Literal:
+        if isinstance(value, str):
+            key = value.strip().lower()
+            key = _ALIASES.get(key, key)
+            for arg in args:
+                if key == arg:
+                    return True, arg
+        return value in args, value
+    if origin is list:
+        if not isinstance(value, list):
+            return False, value
+        checked = [_check(element, args[0]) for element in value]
+        return all(ok for ok, _ in checked), [element for _, element in checked]
+    if origin in (_typing.Union, _types.UnionType):
+        for arg in args:
+            ok, normalized = _check(value, arg)
+            if ok:
+                return True, normalized
+        return False, value
+
+    return isinstance(value, hint), value
+
+
+def parse_questions(text: str) -> list[Question] | None:
+    """
+    Parse the output of a question generator.
+
+    Args:
+        text (str): The model output.
+
+    Returns:
+        list[Question] | None: The valid questions, or None if there are none.
+    """
+
+    try:
+        questions = loads(text, partial=True, schema=Question)
+    except ValueError:
+        return None
+
+    return questions or None
+
+
+def parse_evaluation(text: str) -> Evaluation | None:
+    """
+    Parse the output of a response evaluator.
+
+    Args:
+        text (str): The model output.
+
+    Returns:
+        Evaluation | None: The valid evaluation, or None if the output does not hold one.
+    """
+
+    try:
+        evaluation = loads(text, schema=Evaluation)
+    except ValueError:
+        return None
+
+    if isinstance(evaluation, list):
+        # An evaluation wrapped in an array
+        return evaluation[0] if evaluation else None
+
+    return evaluation or None
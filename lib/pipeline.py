@@ -0,0 +1,306 @@
+import hashlib as _hashlib
+import threading as _threading
+import time as _time
+
+from lib.configs import JOBS_POLL_INTERVAL as _JOBS_POLL_INTERVAL
+from lib.jobs import JobQueue as _JobQueue
+from lib.jobs import JobWorker as _JobWorker
+from lib.types import Evaluation, EvaluationProgress, Job
+from lib.workers import BackgroundTask as _BackgroundTask
+
+__all__ = ["EvaluationPipeline", "QueuedEvaluationPipeline"]
+
+# Job statuses after which a job never runs again
+_FINISHED = ("done", "failed", "cancelled")
+
+
+class EvaluationPipeline:
+    def __init__(self, agent):
+        """
+        Evaluate answers in the background as soon as they are submitted.
+
+        Each answer is queued in the shared worker pool while the candidate moves on to the
+        next question, so the final report only waits for the evaluations still in flight.
+
+        Args:
+            agent: The response evaluation agent, e.g. OpenAIResponseEvaluationAgent.
+        """
+
+        self.agent = agent
+        self._tasks: dict[int, _BackgroundTask] = {}
+        self._lock = _threading.Lock()
+
+    def submit(self, index: int, question: str, response: str) -> None:
+        """
+        Queue the evaluation of an answer, replacing an earlier one for the same question.
+
+        Args:
+            index (int): The position of the question in the interview.
+            question (str): The interview question.
+            response (str): The candidate's response.
+        """
+
+        with self._lock:
+            if index in self._tasks:
+                self._tasks[index].cancel()
+
+            self._tasks[index] = _BackgroundTask(self.agent.run, question, response)
+
+    def get(self, index: int) -> Evaluation | None:
+        """
+        Get the evaluation of a question without waiting for it.
+
+        Args:
+            index (int): The position of the question in the interview.
+
+        Returns:
+            Evaluation | None: The evaluation, or None if it is unknown, in flight or failed.
+        """
+
+        with self._lock:
+            task = self._tasks.get(index)
+
+        if task is None or not task.done():
+            return None
+
+        return task.result()
+
+    def wait(self, index: int, timeout: float | None = None) -> Evaluation | None:
+        """
+        Wait for the evaluation of a question.
+
+        Args:
+            index (int): The position of the question in the interview.
+            timeout (float | None, optional): Seconds to wait, None waits forever. Defaults to None.
+
+        Returns:
+            Evaluation | None: The evaluation, or None if it is unknown, failed or timed out.
+        """
+
+        with self._lock:
+            task = self._tasks.get(index)
+
+        return task.result(timeout=timeout) if task is not None else None
+
+    def progress(self) -> EvaluationProgress:
+        with self._lock:
+            tasks = list(self._tasks.values())
+
+        finished = [task for task in tasks if task.done()]
+        failed = sum(1 for task in finished if task.result() is None)
+
+        return EvaluationProgress(
+            total=len(tasks),
+            pending=len(tasks) - len(finished),
+            finished=len(finished),
+            failed=failed,
+        )
+
+    def results(self, timeout: float | None = None) -> dict[int, Evaluation | None]:
+        """
+        Wait for the evaluations still in flight.
+
+        Args:
+            timeout (float | None, optional): Seconds to wait for each evaluation, None waits forever.
+                Defaults to None.
+
+        Returns:
+            dict[int, Evaluation | None]: The evaluations by question index, None where one failed or timed out.
+        """
+
+        with self._lock:
+            tasks = dict(self._tasks)
+
+        return {index: tasks[index].result(timeout=timeout) for index in sorted(tasks)}
+
+    def cancel(self) -> None:
+        with self._lock:
+            for task in self._tasks.values():
+                task.cancel()
+
+            self._tasks.clear()
+
+
+class QueuedEvaluationPipeline:
+    def __init__(
+        self,
+        agent,
+        queue: _JobQueue,
+        key: str,
+        poll_interval: float = _JOBS_POLL_INTERVAL,
+    ):
+        """
+        Evaluate answers as jobs of a durable queue, run by workers outside the app if need be.
+
+        Same interface as EvaluationPipeline. The jobs are keyed by `key`, the question index and
+        the answer, so the same answer submitted again, e.g. by a restored session, returns the
+        job already queued or done instead of evaluating it twice. When no worker is alive, the
+        evaluations waited for are run in the background of the app process.
+
+        Args:
+            agent: The response evaluation agent, whose class the workers use, e.g.
+                OpenAIResponseEvaluationAgent.
+            queue (JobQueue): The job queue.
+            key (str): The prefix of the idempotency keys, e.g. the session id.
+            poll_interval (float, optional): Seconds between polls while waiting for results.
+                Defaults to JOBS_POLL_INTERVAL.
+        """
+
+        self.agent = agent
+        self.queue = queue
+        self.key = key
+        self.poll_interval = poll_interval
+        # Runs the jobs in this process when no worker is alive, it has no threads of its own
+        self._worker = _JobWorker(queue, workers=0)
+        self._jobs: dict[int, int] = {}
+        # The jobs run in this process, by job id
+        self._running: dict[int, _BackgroundTask] = {}
+        self._lock = _threading.Lock()
+
+    def submit(self, index: int, question: str, response: str) -> None:
+        """
+        Queue the evaluation of an answer, replacing an earlier one for the same question.
+
+        Args:
+            index (int): The position of the question in the interview.
+            question (str): The interview question.
+            response (str): The candidate's response.
+        """
+
+        digest = _hashlib.sha256(f"{question}\0{response}".encode()).hexdigest()[:16]
+        job_id = self.queue.submit(
+            "evaluate",
+            {
+                "agent": type(self.agent).__name__,
+                "question": question,
+                "response": response,
+                "session": self.key,
+            },
+            key=f"{self.key}:{index}:{digest}",
+        )
+
+        with self._lock:
+            previous = self._jobs.get(index)
+            self._jobs[index] = job_id
+
+        if previous is not None and previous != job_id:
+            self.queue.cancel([previous])
+
+    def get(self, index: int) -> Evaluation | None:
+        """
+        Get the evaluation of a question without waiting for it.
+
+        Args:
+            index (int): The position of the question in the interview.
+
+        Returns:
+            Evaluation | None: The evaluation, or None if it is unknown, in flight or failed.
+        """
+
+        with self._lock:
+            job_id = self._jobs.get(index)
+
+        job = self.queue.get([job_id]).get(job_id) if job_id is not None else None
+
+        return job["result"] if job is not None and job["status"] == "done" else None
+
+    def progress(self) -> EvaluationProgress:
+        # One indexed read of the jobs, cheap enough to poll on every rerun of the app
+        with self._lock:
+            job_ids = list(self._jobs.values())
+
+        jobs = self.queue.get(job_ids).values()
+        finished = [job for job in jobs if job["status"] in _FINISHED]
+        failed = sum(1 for job in finished if job["status"] != "done")
+
+        return EvaluationProgress(
+            total=len(job_ids),
+            pending=len(job_ids) - len(finished),
+            finished=len(finished),
+            failed=failed,
+        )
+
+    def results(self, timeout: float | None = None) -> dict[int, Evaluation | None]:
+        """
+        Wait for the evaluations still queued or running, and run them here if no worker is alive.
+
+        Args:
+            timeout (float | None, optional): Seconds to wait for all evaluations, None waits as long
+                as the queue lets a job run, its lease seconds times its attempts. Defaults to None.
+
+        Returns:
+            dict[int, Evaluation | None]: The evaluations by question index, None where one failed or timed out.
+        """
+
+        with self._lock:
+            job_ids = dict(self._jobs)
+
+        jobs = self._wait(list(job_ids.values()), timeout)
+
+        return {
+            index: jobs[job_id]["result"]
+            if job_id in jobs and jobs[job_id]["status"] == "done"
+            else None
+            for index, job_id in sorted(job_ids.items())
+        }
+
+    def wait(self, index: int, timeout: float | None = None) -> Evaluation | None:
+        """
+        Wait for the evaluation of a question, and run it here if no worker is alive.
+
+        Args:
+            index (int): The position of the question in the interview.
+            timeout (float | None, optional): Seconds to wait, None waits as long as the queue lets
+                a job run. Defaults to None.
+
+        Returns:
+            Evaluation | None: The evaluation, or None if it is unknown, failed or timed out.
+        """
+
+        with self._lock:
+            job_id = self._jobs.get(index)
+
+        if job_id is None:
+            return None
+
+        job = self._wait([job_id], timeout).get(job_id)
+
+        return job["result"] if job is not None and job["status"] == "done" else None
+
+    def cancel(self) -> None:
+        with self._lock:
+            job_ids = list(self._jobs.values())
+            self._jobs.clear()
+            for task in self._running.values():
+                task.cancel()
+            self._running.clear()
+
+        if job_ids:
+            self.queue.cancel(job_ids)
+
+    def _wait(self, job_ids: list[int], timeout: float | None) -> dict[int, Job]:
+        if timeout is None:
+            timeout = self.queue.lease_seconds * self.queue.max_attempts
+        deadline = _time.monotonic() + timeout
+        while True:
+            jobs = self.queue.get(job_ids)
+            pending = [job_id for job_id, job in jobs.items() if job["status"] not in _FINISHED]
+            if not pending or _time.monotonic() >= deadline:
+                return jobs
+            if not self.queue.alive():
+                # Nobody else fails the jobs whose last lease expired, they would never finish
+                if self.queue.sweep():
+                    continue
+                self._run_here(pending)
+            _time.sleep(min(self.poll_interval, max(0.0, deadline - _time.monotonic())))
+
+    def _run_here(self, job_ids: list[int]) -> None:
+        # In the background, so the caller keeps polling, and in parallel like the in-process
+        # pipeline, a task per job not already run here
+        with self._lock:
+            self._running = {
+                job_id: task for job_id, task in self._running.items() if not task.done()
+            }
+            for job_id in job_ids:
+                if job_id not in self._running:
+                    self._running[job_id] = _BackgroundTask(self._worker.run_pending, [job_id])
@@ -0,0 +1,170 @@
+import functools as _functools
+import importlib as _importlib
+import math as _math
+from string import Formatter as _Formatter
+
+__all__ = ["PromptTemplate", "PromptBudget", "count_tokens", "truncate"]
+
+# Rough characters per token of English text, used when tiktoken is not installed
+_CHARS_PER_TOKEN = 4
+
+
+@_functools.lru_cache(maxsize=None)
+def _encoding(model: str | None):
+    try:
+        tiktoken = _importlib.import_module("tiktoken")
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        # Non-OpenAI models, the count is an estimate either way
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """
+    Count the tokens of a text with tiktoken, or estimate them when it is not installed.
+
+    Args:
+        text (str): The text.
+        model (str | None, optional): The model name, picks the tiktoken encoding. Defaults to None.
+
+    Returns:
+        int: The number of tokens.
+    """
+
+    encoding = _encoding(model)
+    if encoding is None:
+        return _math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate(text: str, max_tokens: int, model: str | None = None) -> str:
+    """
+    Trim a text to a number of tokens, keeping its beginning.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The maximum number of tokens.
+        model (str | None, optional): The model name, picks the tiktoken encoding. Defaults to None.
+
+    Returns:
+        str: The text, with " ..." appended if it has been trimmed.
+    """
+
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _encoding(model)
+    if encoding is None:
+        trimmed = text[: max_tokens * _CHARS_PER_TOKEN]
+    else:
+        trimmed = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+    # Cut at a word boundary so no half word reaches the model
+    return trimmed.rsplit(" ", 1)[0].rstrip() + " ..."
+
+
+class PromptTemplate:
+    def __init__(self, template: str):
+        """
+        A `str.format` template parsed once.
+
+        The literal segments are parsed on construction and their token counts are cached per
+        model, so rendering and budgeting only deal with the substituted values.
+
+        Args:
+            template (str): The template, in `str.format` syntax.
+        """
+
+        self.template = template
+        self._segments = [(literal, field) for literal, field, _, _ in _Formatter().parse(template)]
+        self.fields = {field for _, field in self._segments if field is not None}
+        # The static text, its token count is computed once per model
+        self.literal = "".join(literal for literal, _ in self._segments)
+        self._literal_tokens: dict[str | None, int] = {}
+
+    def format(self, **values) -> str:
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+
+        return "".join(parts)
+
+    def count_tokens(self, model: str | None = None, **values) -> int:
+        """
+        Count the tokens of the rendered template.
+
+        Args:
+            model (str | None, optional): The model name. Defaults to None.
+            **values: The field values.
+
+        Returns:
+            int: The number of tokens, counted separately for the literal text and each value.
+        """
+
+        if model not in self._literal_tokens:
+            self._literal_tokens[model] = count_tokens(self.literal, model)
+
+        return self._literal_tokens[model] + sum(
+            count_tokens(str(values.get(field, "")), model) for field in self.fields
+        )
+
+    def __str__(self) -> str:
+        return self.template
+
+
+class PromptBudget:
+    def __init__(self, model: str, context_window: int, max_output_tokens: int):
+        """
+        Token budget of one model call.
+
+        Args:
+            model (str): The model name.
+            context_window (int): The tokens shared by the prompt and the completion.
+            max_output_tokens (int): The most tokens the model can generate.
+        """
+
+        self.model = model
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+
+    def fit(self, text: str, used_tokens: int, reserved_tokens: int) -> str:
+        """
+        Trim a variable part of the prompt so the prompt and the reserved output fit the window.
+
+        Args:
+            text (str): The variable text, e.g. the candidate description.
+            used_tokens (int): The tokens of the rest of the prompt.
+            reserved_tokens (int): The tokens kept free for the completion.
+
+        Returns:
+            str: The text, trimmed if needed.
+        """
+
+        reserved_tokens = min(reserved_tokens, self.max_output_tokens)
+
+        return truncate(text, self.context_window - used_tokens - reserved_tokens, self.model)
+
+    def output_tokens(self, prompt_tokens: int, wanted_tokens: int) -> int:
+        """
+        Get the completion size that fits next to a prompt.
+
+        Args:
+            prompt_tokens (int): The tokens of the prompt.
+            wanted_tokens (int): The tokens the completion needs.
+
+        Returns:
+            int: The `max_tokens` to request.
+        """
+
+        available = min(self.max_output_tokens, self.context_window - prompt_tokens)
+
+        return max(1, min(wanted_tokens, available))
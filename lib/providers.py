@@ -0,0 +1,39 @@
+import importlib as _importlib
+from types import ModuleType
+
+from lib.configs import PROVIDERS as _PROVIDERS
+
+__all__ = ["SDKS", "enabled", "load"]
+
+# The SDK module of each provider, imported on first use only
+SDKS = {
+    "openai": "openai",
+    "cohere": "cohere",
+    "palm": "google.generativeai",
+}
+
+
+def enabled(provider: str) -> bool:
+    return provider in _PROVIDERS
+
+
+def load(provider: str) -> ModuleType:
+    """
+    Import the SDK of a provider enabled in the config.
+
+    Args:
+        provider (str): The provider name ("openai", "palm" or "cohere").
+
+    Returns:
+        ModuleType: The SDK module.
+
+    Raises:
+        RuntimeError: If the provider is not enabled.
+    """
+
+    if provider not in _PROVIDERS:
+        raise RuntimeError(
+            f"The {provider} provider is not enabled, set its API key or add it to PROVIDERS"
+        )
+
+    return _importlib.import_module(SDKS[provider])
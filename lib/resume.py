@@ -0,0 +1,212 @@
+import hashlib as _hashlib
+import importlib as _importlib
+import importlib.util as _importlib_util
+import io as _io
+import json as _json
+import re as _re
+import zipfile as _zipfile
+from typing import Iterator
+from xml.etree import ElementTree as _ElementTree
+
+from lib.cache import BaseCache as _BaseCache
+from lib.cache import MemoryCache as _MemoryCache
+from lib.types import ResumeSummary
+
+__all__ = ["iter_pages", "extract_text", "summarize", "ingest_resume", "resume_types"]
+
+_WORD = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SECTIONS = _re.compile(
+    r"^(summary|profile|objective|experience|work experience|employment|skills|education|projects|"
+    r"certifications|achievements)\b",
+    flags=_re.I,
+)
+
+# Extracted resumes keyed by content hash, shared by every session of the process
+_cache: _BaseCache = _MemoryCache(max_size=256)
+
+
+def resume_types() -> list[str]:
+    """
+    Get the resume file types that can be read, PDF only with the optional `pypdf` package.
+
+    Returns:
+        list[str]: The file extensions, e.g. for an uploader.
+    """
+
+    if _importlib_util.find_spec("pypdf") is None:
+        return ["docx"]
+
+    return ["pdf", "docx"]
+
+
+def iter_pages(data: bytes, filename: str) -> Iterator[str]:
+    """
+    Lazily yield the text of a resume page by page.
+
+    DOCX files are read straight from the document XML, with explicit and rendered page
+    breaks as page boundaries. PDF files need the optional `pypdf` package.
+
+    Args:
+        data (bytes): The file content.
+        filename (str): The file name, used to tell PDF and DOCX files apart.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        ImportError: If a PDF is given and `pypdf` is not installed.
+
+    Yields:
+        str: The text of each page.
+    """
+
+    extension = filename.rsplit(".", 1)[-1].lower()
+
+    if extension == "pdf":
+        pypdf = _importlib.import_module("pypdf")
+        for page in pypdf.PdfReader(_io.BytesIO(data)).pages:
+            yield page.extract_text() or ""
+    elif extension == "docx":
+        yield from _iter_docx_pages(data)
+    else:
+        raise ValueError(f"Unsupported resume type: {filename}")
+
+
+def _iter_docx_pages(data: bytes) -> Iterator[str]:
+    with _zipfile.ZipFile(_io.BytesIO(data)) as archive:
+        with archive.open("word/document.xml") as document:
+            paragraphs: list[str] = []
+
+            for _, element in _ElementTree.iterparse(document, events=("end",)):
+                if element.tag != f"{_WORD}p":
+                    continue
+
+                paragraphs.append("".join(node.text or "" for node in element.iter(f"{_WORD}t")))
+                page_break = any(
+                    node.tag == f"{_WORD}lastRenderedPageBreak"
+                    or (node.tag == f"{_WORD}br" and node.get(f"{_WORD}type") == "page")
+                    for node in element.iter()
+                )
+                # Free the parsed paragraph, only the running page is kept in memory
+                element.clear()
+
+                if page_break:
+                    yield "\n".join(paragraphs)
+                    paragraphs = []
+
+            if paragraphs:
+                yield "\n".join(paragraphs)
+
+
+def extract_text(data: bytes, filename: str, max_pages: int = 5, max_chars: int = 8000) -> str:
+    """
+    Extract the text of a resume within a page and character budget.
+
+    Pages past the budget are never parsed.
+
+    Args:
+        data (bytes): The file content.
+        filename (str): The file name.
+        max_pages (int, optional): The maximum number of pages read. Defaults to 5.
+        max_chars (int, optional): The maximum number of characters kept. Defaults to 8000.
+
+    Returns:
+        str: The extracted text.
+    """
+
+    text = ""
+    for i, page in enumerate(iter_pages(data, filename)):
+        text += page.strip() + "\n"
+
+        if i + 1 >= max_pages or len(text) >= max_chars:
+            break
+
+    return text[:max_chars].strip()
+
+
+def summarize(text: str, max_chars: int = 1200) -> str:
+    """
+    Build a compact extractive summary of a resume for the prompts.
+
+    Lines under the usual resume sections (summary, experience, skills, education, ...) are
+    kept first, then the remaining lines, until the budget is used up.
+
+    Args:
+        text (str): The extracted resume text.
+        max_chars (int, optional): The maximum summary length. Defaults to 1200.
+
+    Returns:
+        str: The summary.
+    """
+
+    lines = [_re.sub(r"\s+", " ", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if len(line) > 2]
+
+    preferred, remaining = [], []
+    in_section = False
+    for line in lines:
+        if _SECTIONS.match(line):
+            in_section = True
+        (preferred if in_section else remaining).append(line)
+
+    summary = ""
+    for line in preferred + remaining:
+        if len(summary) + len(line) + 1 > max_chars:
+            break
+        summary += line + "\n"
+
+    return summary.strip()
+
+
+def ingest_resume(
+    data: bytes,
+    filename: str,
+    max_pages: int = 5,
+    max_chars: int = 8000,
+    max_summary_chars: int = 1200,
+    cache: _BaseCache | None = None,
+) -> ResumeSummary | None:
+    """
+    Extract and summarize a resume, caching the result by content hash.
+
+    Only the returned summary needs to be kept per session; the upload buffer can be dropped.
+
+    Args:
+        data (bytes): The file content.
+        filename (str): The file name.
+        max_pages (int, optional): The maximum number of pages read. Defaults to 5.
+        max_chars (int, optional): The maximum number of characters extracted. Defaults to 8000.
+        max_summary_chars (int, optional): The maximum summary length. Defaults to 1200.
+        cache (BaseCache | None, optional): The cache to use, defaults to a process-wide LRU.
+
+    Returns:
+        ResumeSummary | None: The resume summary, or None if the file could not be read.
+    """
+
+    cache = cache if cache is not None else _cache
+    sha256 = _hashlib.sha256(data).hexdigest()
+    key = f"resume:{sha256}:{max_pages}:{max_chars}:{max_summary_chars}"
+
+    cached = cache.get(key)
+    if cached is not None:
+        entry = _json.loads(cached)
+
+        return ResumeSummary(
+            sha256=sha256,
+            filename=filename,
+            characters=len(entry["text"]),
+            summary=entry["summary"],
+        )
+
+    try:
+        text = extract_text(data, filename, max_pages=max_pages, max_chars=max_chars)
+    except Exception:
+        return None
+
+    summary = ResumeSummary(
+        sha256=sha256,
+        filename=filename,
+        characters=len(text),
+        summary=summarize(text, max_chars=max_summary_chars),
+    )
+    cache.set(key, _json.dumps({"text": text, "summary": summary["summary"]}))
+
+    return summary
@@ -0,0 +1,414 @@
+import contextlib as _contextlib
+import functools as _functools
+import json as _json
+import math as _math
+import os as _os
+import re as _re
+import shutil as _shutil
+import tempfile as _tempfile
+import threading as _threading
+import zlib as _zlib
+from typing import Iterator
+
+import numpy as _np
+
+try:
+    import fcntl as _fcntl
+except ImportError:
+    # Windows, concurrent builds of different processes are not serialized there
+    _fcntl = None
+
+from lib.configs import QUESTION_BANK_PATH as _QUESTION_BANK_PATH
+from lib.configs import QUESTION_INDEX_DIR as _QUESTION_INDEX_DIR
+from lib.types import Question, RetrievalStats
+
+__all__ = [
+    "HashingVectorizer",
+    "QuestionIndex",
+    "build_index",
+    "load_index",
+    "RetrievalQuestionGeneratorAgent",
+]
+
+_CATEGORIES = ["personal", "role-specific", "behavioural", "situational"]
+# The file in the index directory naming the version directory in use
+_CURRENT = "CURRENT"
+# Serializes the builds of this process, where the file lock is not available
+_build_thread_lock = _threading.Lock()
+
+_TOKEN = _re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do for from how i in is it me my of on or that the this to was "
+    "we what when where which who why will with you your".split()
+)
+
+
+class HashingVectorizer:
+    def __init__(self, n_features: int = 2**14, idf: _np.ndarray | None = None):
+        """
+        TF-IDF vectorizer over hashed word unigrams and bigrams.
+
+        Hashing needs no vocabulary, so a description can be embedded without loading more
+        than the IDF weights, and the same text always lands on the same features in every
+        process.
+
+        Args:
+            n_features (int, optional): The vector size. Defaults to 2**14.
+            idf (np.ndarray | None, optional): The IDF weights, all ones if not given.
+        """
+
+        self.n_features = n_features
+        self.idf = idf if idf is not None else _np.ones(n_features, dtype=_np.float32)
+
+    def features(self, text: str) -> list[int]:
+        words = [word for word in _TOKEN.findall(text.lower()) if word not in _STOPWORDS]
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        return [_zlib.crc32(term.encode()) % self.n_features for term in terms]
+
+    def transform(self, text: str) -> _np.ndarray:
+        """
+        Embed a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            np.ndarray: The L2-normalized TF-IDF vector, zero for texts without known words.
+        """
+
+        vector = _np.zeros(self.n_features, dtype=_np.float32)
+        features = _np.array(self.features(text), dtype=_np.int64)
+        features, counts = _np.unique(features, return_counts=True)
+        vector[features] = (1 + _np.log(counts)) * self.idf[features]
+
+        norm = _np.linalg.norm(vector)
+
+        return vector / norm if norm else vector
+
+
+class QuestionIndex:
+    def __init__(self, questions: list[Question], vectors: _np.ndarray, idf: _np.ndarray):
+        """
+        Embedding index of the question bank.
+
+        Args:
+            questions (list[Question]): The questions, in the order of the vectors.
+            vectors (np.ndarray): The normalized question vectors, usually memory-mapped.
+            idf (np.ndarray): The IDF weights of the vectorizer.
+        """
+
+        self.questions = questions
+        self.vectors = vectors
+        self.vectorizer = HashingVectorizer(n_features=len(idf), idf=idf)
+        self._categories = {
+            category: _np.array(
+                [i for i, question in enumerate(questions) if question["type"] == category],
+                dtype=_np.int64,
+            )
+            for category in _CATEGORIES
+        }
+
+    def search(self, text: str, k: int = 10) -> dict[str, list[tuple[float, Question]]]:
+        """
+        Find the questions closest to a text in every category.
+
+        Args:
+            text (str): The query, e.g. a candidate description.
+            k (int, optional): The number of questions per category. Defaults to 10.
+
+        Returns:
+            dict[str, list[tuple[float, Question]]]: The `(cosine similarity, question)` pairs
+                of each category, best first.
+        """
+
+        scores = self.vectors @ self.vectorizer.transform(text)
+
+        results = {}
+        for category, indices in self._categories.items():
+            top = indices[_np.argsort(-scores[indices], kind="stable")[:k]]
+            results[category] = [(float(scores[i]), self.questions[i]) for i in top]
+
+        return results
+
+
+def build_index(
+    bank_path: str = _QUESTION_BANK_PATH,
+    index_dir: str = _QUESTION_INDEX_DIR,
+    n_features: int = 2**14,
+) -> None:
+    """
+    Embed the question bank and write the index files.
+
+    The bank is a JSON Lines file of `{"question", "type", "tags"}` objects, the tags are
+    extra words that describe the roles a question fits. Each build is written to a new
+    version directory inside `index_dir`, then the `CURRENT` file naming the version in use is
+    replaced atomically, so processes loading the index never see a partial or missing one.
+    Concurrent builds are serialized with a file lock.
+
+    Args:
+        bank_path (str, optional): The question bank. Defaults to QUESTION_BANK_PATH.
+        index_dir (str, optional): The index directory. Defaults to QUESTION_INDEX_DIR.
+        n_features (int, optional): The vector size. Defaults to 2**14.
+    """
+
+    with open(bank_path, encoding="utf-8") as file:
+        rows = [_json.loads(line) for line in file if line.strip()]
+
+    vectorizer = HashingVectorizer(n_features=n_features)
+    texts = [f"{row['question']} {row.get('tags', '')}" for row in rows]
+
+    document_frequency = _np.zeros(n_features, dtype=_np.float32)
+    for text in texts:
+        document_frequency[_np.unique(vectorizer.features(text))] += 1
+
+    vectorizer.idf = (_np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(_np.float32)
+    vectors = _np.stack([vectorizer.transform(text) for text in texts]).astype(_np.float32)
+
+    _os.makedirs(index_dir, exist_ok=True)
+    with _build_lock(index_dir):
+        previous = _current_version(index_dir)
+        version = _tempfile.mkdtemp(dir=index_dir, prefix="v")
+
+        _np.save(_os.path.join(version, "vectors.npy"), vectors)
+        _np.save(_os.path.join(version, "idf.npy"), vectorizer.idf)
+        with open(_os.path.join(version, "questions.jsonl"), "w", encoding="utf-8") as file:
+            for row in rows:
+                file.write(_json.dumps({"question": row["question"], "type": row["type"]}) + "\n")
+
+        # Publish the version, a rename over the old pointer is atomic
+        descriptor, pointer = _tempfile.mkstemp(dir=index_dir, prefix=".CURRENT")
+        with _os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            file.write(_os.path.basename(version))
+        _os.replace(pointer, _os.path.join(index_dir, _CURRENT))
+
+        # The version just replaced may still be opened by a loader that read the old pointer
+        keep = {_os.path.basename(version), previous and _os.path.basename(previous)}
+        for name in _os.listdir(index_dir):
+            path = _os.path.join(index_dir, name)
+            if name not in keep and _os.path.isdir(path):
+                _shutil.rmtree(path, ignore_errors=True)
+
+
+@_contextlib.contextmanager
+def _build_lock(index_dir: str) -> Iterator[None]:
+    # One build at a time, in this process and the others, so none removes another's version
+    with _build_thread_lock:
+        if _fcntl is None:
+            yield
+            return
+
+        with open(_os.path.join(index_dir, ".lock"), "w") as file:
+            _fcntl.flock(file, _fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                _fcntl.flock(file, _fcntl.LOCK_UN)
+
+
+def _current_version(index_dir: str) -> str | None:
+    # The directory of the version in use, None before the first build
+    try:
+        with open(_os.path.join(index_dir, _CURRENT), encoding="utf-8") as file:
+            version = _os.path.join(index_dir, file.read().strip())
+    except FileNotFoundError:
+        return None
+
+    return version if _os.path.isdir(version) else None
+
+
+_index_lock = _threading.Lock()
+
+
+@_functools.lru_cache(maxsize=4)
+def _load_index(version: str) -> QuestionIndex:
+    # A version is never modified, only replaced by a new one
+    with open(_os.path.join(version, "questions.jsonl"), encoding="utf-8") as file:
+        questions = [_json.loads(line) for line in file]
+
+    # Memory-mapped, every process reading the index shares the page cache copy
+    vectors = _np.load(_os.path.join(version, "vectors.npy"), mmap_mode="r")
+    idf = _np.load(_os.path.join(version, "idf.npy"))
+
+    return QuestionIndex(questions, vectors, idf)
+
+
+def load_index(
+    bank_path: str = _QUESTION_BANK_PATH, index_dir: str = _QUESTION_INDEX_DIR
+) -> QuestionIndex | None:
+    """
+    Load the question index, rebuilding it first when the bank is newer.
+
+    Args:
+        bank_path (str, optional): The question bank. Defaults to QUESTION_BANK_PATH.
+        index_dir (str, optional): The index directory. Defaults to QUESTION_INDEX_DIR.
+
+    Returns:
+        QuestionIndex | None: The index, or None if there is no question bank, e.g. before `dvc pull`.
+    """
+
+    with _index_lock:
+        version = _current_version(index_dir)
+        if not _os.path.exists(bank_path):
+            if version is None:
+                return None
+        elif version is None or _os.path.getmtime(version) < _os.path.getmtime(bank_path):
+            build_index(bank_path, index_dir)
+            version = _current_version(index_dir)
+
+        return _load_index(version)
+
+
+class RetrievalQuestionGeneratorAgent:
+    def __init__(
+        self,
+        fallback=None,
+        min_score: float = 0.1,
+        bank_path: str = _QUESTION_BANK_PATH,
+        index_dir: str = _QUESTION_INDEX_DIR,
+    ):
+        """
+        Pick interview questions from the local question bank, without a model call.
+
+        The questions are balanced across the four categories. When the bank has too few
+        role-specific questions similar enough to the description, the fallback agent
+        generates the questions instead.
+
+        Args:
+            fallback (optional): The question generator agent used when the bank does not cover
+                the description, e.g. OpenAIQuestionGeneratorAgent. Defaults to None.
+            min_score (float, optional): The cosine similarity a role-specific question needs. Defaults to 0.1.
+            bank_path (str, optional): The question bank. Defaults to QUESTION_BANK_PATH.
+            index_dir (str, optional): The index directory. Defaults to QUESTION_INDEX_DIR.
+        """
+
+        self.fallback = fallback
+        self.min_score = min_score
+        self.bank_path = bank_path
+        self.index_dir = index_dir
+        self._stats = {"retrieved": 0, "fallbacks": 0}
+
+    def __call__(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        return self.run(description, n_questions)
+
+    def run(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        questions = self.retrieve(description, n_questions)
+        if questions is not None or self.fallback is None:
+            return questions
+
+        return self.fallback.run(description, n_questions)
+
+    async def arun(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Generate interview questions based on the given description.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Returns:
+            list[Question] | None: A list of generated interview questions or None if an error occurs.
+        """
+
+        questions = self.retrieve(description, n_questions)
+        if questions is not None or self.fallback is None:
+            return questions
+
+        return await self.fallback.arun(description, n_questions)
+
+    def stream(self, description: str, n_questions: int = 4) -> Iterator[Question]:
+        """
+        Generate interview questions, yielding each question as soon as it is complete.
+
+        Args:
+            description (str): The description used as input for question generation.
+            n_questions (int, optional): The number of questions to generate. Defaults to 4.
+
+        Yields:
+            Question: The generated interview questions. The stream ends early if an error occurs.
+        """
+
+        questions = self.retrieve(description, n_questions)
+        if questions is not None:
+            yield from questions
+        elif self.fallback is not None:
+            yield from self.fallback.stream(description, n_questions)
+
+    def retrieve(self, description: str, n_questions: int = 4) -> list[Question] | None:
+        """
+        Pick questions from the question bank only.
+
+        Args:
+            description (str): The candidate description.
+            n_questions (int, optional): The number of questions. Defaults to 4.
+
+        Returns:
+            list[Question] | None: The questions, in category order, or None if the bank does
+                not cover the description.
+        """
+
+        # Ensure that there are at least 4 questions
+        n_questions = max(4, n_questions)
+        per_category = _math.ceil(n_questions / len(_CATEGORIES))
+
+        try:
+            index = load_index(self.bank_path, self.index_dir)
+        except (OSError, ValueError, KeyError):
+            index = None
+
+        results = index.search(description, k=n_questions) if index is not None else {}
+        results["role-specific"] = [
+            (score, question)
+            for score, question in results.get("role-specific", [])
+            if score >= self.min_score
+        ]
+
+        if any(len(results.get(category, [])) < per_category for category in _CATEGORIES):
+            self._stats["fallbacks"] += 1
+            return None
+
+        # Take the best remaining question of each category in turn
+        questions = []
+        for rank in range(n_questions):
+            for category in _CATEGORIES:
+                if len(questions) < n_questions and rank < len(results[category]):
+                    questions.append(results[category][rank][1])
+
+        self._stats["retrieved"] += 1
+
+        return questions
+
+    def stats(self) -> RetrievalStats:
+        calls = self._stats["retrieved"] + self._stats["fallbacks"]
+
+        return RetrievalStats(
+            retrieved=self._stats["retrieved"],
+            fallbacks=self._stats["fallbacks"],
+            coverage=self._stats["retrieved"] / calls if calls else 0.0,
+        )
+
+
+if __name__ == "__main__":
+    build_index()
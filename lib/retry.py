@@ -0,0 +1,412 @@
+import asyncio as _asyncio
+import contextvars as _contextvars
+import email.utils as _email_utils
+import random as _random
+import sys as _sys
+import threading as _threading
+import time as _time
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+from lib.configs import HTTP_TIMEOUT as _HTTP_TIMEOUT
+from lib.configs import REQUEST_DEADLINE as _REQUEST_DEADLINE
+from lib.configs import RETRY_BASE_DELAY as _RETRY_BASE_DELAY
+from lib.configs import RETRY_MAX_ATTEMPTS as _RETRY_MAX_ATTEMPTS
+from lib.configs import RETRY_MAX_DELAY as _RETRY_MAX_DELAY
+from lib.types import FailureStats
+
+__all__ = [
+    "TRANSPORT",
+    "RATE_LIMIT",
+    "PARSE",
+    "DeadlineExceeded",
+    "RetryPolicy",
+    "classify",
+    "retry_after",
+    "call",
+    "acall",
+    "request_timeout",
+    "iterate",
+    "record",
+    "failure_stats",
+]
+
+TRANSPORT = "transport"
+RATE_LIMIT = "rate_limit"
+PARSE = "parse"
+
+_T = TypeVar("_T")
+
+_lock = _threading.Lock()
+_counters: dict[str, FailureStats] = {}
+# Monotonic deadline of the `call` in progress, which bounds the timeout of its requests
+_deadline: _contextvars.ContextVar[float | None] = _contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call and its retries do not finish within the deadline."""
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = _RETRY_MAX_ATTEMPTS,
+        base_delay: float = _RETRY_BASE_DELAY,
+        max_delay: float = _RETRY_MAX_DELAY,
+        deadline: float = _REQUEST_DEADLINE,
+    ):
+        """
+        Retry policy of the model calls.
+
+        Args:
+            max_attempts (int, optional): The attempts per call, 1 disables retries.
+            base_delay (float, optional): The backoff of the first retry, in seconds.
+            max_delay (float, optional): The longest backoff, in seconds.
+            deadline (float, optional): The seconds a call may take, retries included.
+        """
+
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """
+        Get the delay before the next attempt.
+
+        Args:
+            attempt (int): The number of the failed attempt, from 0.
+            error (BaseException): The error of the failed attempt.
+
+        Returns:
+            float: Seconds to wait, with full jitter, and at least the `Retry-After` of the error.
+        """
+
+        delay = _random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+        after = retry_after(error)
+        if after is not None:
+            # Spread the clients the provider told to come back at the same time
+            delay = after + _random.uniform(0, self.base_delay)
+
+        return delay
+
+
+def _status(error: BaseException) -> int | None:
+    # openai and httpx errors expose `status_code`, Cohere `http_status`, google-api-core `code`
+    for owner in (error, getattr(error, "response", None)):
+        for name in ("status_code", "http_status", "code"):
+            value = getattr(owner, name, None)
+            if isinstance(value, int):
+                return value
+
+    return None
+
+
+def classify(error: BaseException) -> str | None:
+    """
+    Classify the error of a model call.
+
+    Args:
+        error (BaseException): The error.
+
+    Returns:
+        str | None: TRANSPORT or RATE_LIMIT for retryable errors, None for the others,
+            e.g. invalid requests or authentication errors.
+    """
+
+    if isinstance(error, DeadlineExceeded):
+        return None
+
+    status = _status(error)
+    if status == 429:
+        return RATE_LIMIT
+    if status is not None and (status >= 500 or status == 408):
+        return TRANSPORT
+    if status is not None and status >= 400:
+        return None
+
+    # httpx is only loaded by the providers that use it, an error can't come from it otherwise
+    httpx = _sys.modules.get("httpx")
+    if isinstance(error, (TimeoutError, ConnectionError)) or (
+        httpx is not None and isinstance(error, httpx.TransportError)
+    ):
+        return TRANSPORT
+
+    # The SDKs wrap network failures in their own classes, e.g. openai.APIConnectionError
+    names = [cls.__name__ for cls in type(error).__mro__]
+    if any("Connection" in name or "Timeout" in name for name in names):
+        return TRANSPORT
+
+    return None
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Read the `Retry-After` header of a rate-limit error.
+
+    Args:
+        error (BaseException): The error.
+
+    Returns:
+        float | None: The seconds to wait, or None if the error has no such header.
+    """
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        headers = getattr(error, "headers", None)
+    if not headers:
+        return None
+
+    headers = {str(name).lower(): value for name, value in headers.items()}
+
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if "retry-after" in headers:
+            return max(0.0, float(headers["retry-after"]))
+    except ValueError:
+        # Retry-After may also be an HTTP date
+        try:
+            date = _email_utils.parsedate_to_datetime(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, date.timestamp() - _time.time())
+
+    return None
+
+
+def record(provider: str, kind: str, backoff: float = 0.0) -> None:
+    """
+    Count a failure of a provider.
+
+    Args:
+        provider (str): The provider name.
+        kind (str): The counter, a failure class or "repaired", "retries", "deadline_exceeded".
+        backoff (float, optional): Seconds spent waiting because of the failure. Defaults to 0.
+    """
+
+    with _lock:
+        counters = _counters.setdefault(
+            provider,
+            FailureStats(
+                transport=0,
+                rate_limit=0,
+                parse=0,
+                repaired=0,
+                retries=0,
+                deadline_exceeded=0,
+                backoff_seconds=0.0,
+            ),
+        )
+        counters[kind] += 1
+        counters["backoff_seconds"] += backoff
+
+
+def failure_stats(provider: str | None = None) -> FailureStats:
+    """
+    Get the failure counters.
+
+    Args:
+        provider (str | None, optional): The provider name, None sums every provider. Defaults to None.
+
+    Returns:
+        FailureStats: The failures by class, the repaired outputs, the retries, the calls that
+            ran out of time and the seconds spent in backoff.
+    """
+
+    with _lock:
+        counters = [
+            stats for name, stats in _counters.items() if provider is None or name == provider
+        ]
+
+        return FailureStats(
+            transport=sum(stats["transport"] for stats in counters),
+            rate_limit=sum(stats["rate_limit"] for stats in counters),
+            parse=sum(stats["parse"] for stats in counters),
+            repaired=sum(stats["repaired"] for stats in counters),
+            retries=sum(stats["retries"] for stats in counters),
+            deadline_exceeded=sum(stats["deadline_exceeded"] for stats in counters),
+            backoff_seconds=sum(stats["backoff_seconds"] for stats in counters),
+        )
+
+
+def _check_deadline(error: Exception, provider: str, deadline: float) -> None:
+    # A retryable error past the deadline is the deadline's doing, the others, e.g. a 401, are
+    # raised as they are by `_next_delay`
+    if isinstance(error, DeadlineExceeded):
+        # e.g. the wait for a limiter slot ran out of time
+        record(provider, "deadline_exceeded")
+        raise error
+    if _time.monotonic() >= deadline and classify(error) is not None:
+        record(provider, "deadline_exceeded")
+        raise DeadlineExceeded(f"The {provider} call did not finish in time") from error
+
+
+def _next_delay(
+    error: Exception, attempt: int, policy: RetryPolicy, provider: str, deadline: float
+) -> float:
+    # Raise the error when the call must not be retried, otherwise return the backoff
+    kind = classify(error)
+    if kind is None:
+        raise error
+
+    record(provider, kind)
+    if attempt + 1 >= policy.max_attempts:
+        raise error
+
+    delay = policy.backoff(attempt, error)
+    if _time.monotonic() + delay >= deadline:
+        record(provider, "deadline_exceeded")
+        raise DeadlineExceeded(f"No time left to retry the {provider} call") from error
+
+    record(provider, "retries", backoff=delay)
+
+    return delay
+
+
+def call(fn: Callable[[], _T], policy: RetryPolicy, provider: str) -> _T:
+    """
+    Call a function, retrying transport and rate-limit errors.
+
+    The requests of the function are given the time left before the deadline as their timeout,
+    see `request_timeout`, so an attempt in flight ends with the deadline.
+
+    Args:
+        fn (Callable[[], T]): The model call.
+        policy (RetryPolicy): The retry policy.
+        provider (str): The provider name, for the counters.
+
+    Raises:
+        DeadlineExceeded: If the call and its retries do not finish within the deadline.
+
+    Returns:
+        T: The result of the function.
+    """
+
+    deadline = _time.monotonic() + policy.deadline
+    token = _deadline.set(deadline)
+
+    try:
+        for attempt in range(policy.max_attempts):
+            try:
+                return fn()
+            except Exception as error:
+                _check_deadline(error, provider, deadline)
+                _time.sleep(_next_delay(error, attempt, policy, provider, deadline))
+    finally:
+        _deadline.reset(token)
+
+    raise AssertionError("unreachable")
+
+
+def request_timeout(timeout: float = _HTTP_TIMEOUT) -> float:
+    """
+    Get the timeout of a provider request, shortened to the deadline of the `call` making it.
+
+    Args:
+        timeout (float, optional): The timeout outside of `call`, or if longer than the time left.
+            Defaults to HTTP_TIMEOUT.
+
+    Returns:
+        float: The timeout in seconds, 0 once the deadline has passed.
+    """
+
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+
+    return max(0.0, min(timeout, deadline - _time.monotonic()))
+
+
+async def acall(fn: Callable[[], Awaitable[_T]], policy: RetryPolicy, provider: str) -> _T:
+    """
+    Await a coroutine function, retrying transport and rate-limit errors.
+
+    Attempts in flight are cancelled when the deadline passes.
+
+    Args:
+        fn (Callable[[], Awaitable[T]]): The model call.
+        policy (RetryPolicy): The retry policy.
+        provider (str): The provider name, for the counters.
+
+    Raises:
+        DeadlineExceeded: If the call and its retries do not finish within the deadline.
+
+    Returns:
+        T: The result of the coroutine.
+    """
+
+    deadline = _time.monotonic() + policy.deadline
+
+    for attempt in range(policy.max_attempts):
+        try:
+            return await _asyncio.wait_for(fn(), deadline - _time.monotonic())
+        except Exception as error:
+            _check_deadline(error, provider, deadline)
+            await _asyncio.sleep(_next_delay(error, attempt, policy, provider, deadline))
+
+    raise AssertionError("unreachable")
+
+
+def iterate(fn: Callable[[], Iterator[_T]], policy: RetryPolicy, provider: str) -> Iterator[_T]:
+    """
+    Iterate a streamed model call, retrying errors raised before the first item.
+
+    Once an item has been yielded, errors are raised to the consumer, since the stream cannot
+    be replayed without duplicating output. As in `call`, the requests of the stream are given
+    the time left before the deadline as their timeout.
+
+    Args:
+        fn (Callable[[], Iterator[T]]): The streamed model call.
+        policy (RetryPolicy): The retry policy.
+        provider (str): The provider name, for the counters.
+
+    Yields:
+        T: The items of the stream.
+    """
+
+    deadline = _time.monotonic() + policy.deadline
+
+    for attempt in range(policy.max_attempts):
+        items = None
+        try:
+            items = _bounded(fn, deadline)
+            first = _bounded(lambda: next(items), deadline)
+        except StopIteration:
+            return
+        except Exception as error:
+            # Release the connection of the failed stream before the retry opens another
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            _check_deadline(error, provider, deadline)
+            _time.sleep(_next_delay(error, attempt, policy, provider, deadline))
+            continue
+
+        # Closed with this generator, like `yield from` would, when the consumer stops early
+        try:
+            yield first
+            while True:
+                try:
+                    item = _bounded(lambda: next(items), deadline)
+                except StopIteration:
+                    return
+
+                yield item
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    raise AssertionError("unreachable")
+
+
+def _bounded(fn: Callable[[], _T], deadline: float) -> _T:
+    # Set the deadline of `request_timeout` only while the stream is pulled, a generator runs in
+    # the context of whoever resumes it, so it must not stay set across the yields
+    token = _deadline.set(deadline)
+    try:
+        return fn()
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,293 @@
+import asyncio as _asyncio
+import contextvars as _contextvars
+import threading as _threading
+import time as _time
+from collections import deque as _deque
+from concurrent.futures import FIRST_COMPLETED as _FIRST_COMPLETED
+from concurrent.futures import Future as _Future
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from concurrent.futures import wait as _wait
+from typing import Any
+
+from lib.types import ProviderStats
+
+__all__ = ["LatencyTracker", "RouterAgent"]
+
+_executor: _ThreadPoolExecutor | None = None
+_executor_lock = _threading.Lock()
+
+
+def _get_executor() -> _ThreadPoolExecutor:
+    # One pool for the hedged calls of every router. Not the shared agent pool, whose threads
+    # may be the ones waiting for the hedges.
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = _ThreadPoolExecutor(max_workers=32, thread_name_prefix="router-hedge")
+
+        return _executor
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 100):
+        """
+        Rolling latency and error statistics of one provider.
+
+        Args:
+            window (int, optional): The number of most recent calls kept. Defaults to 100.
+        """
+
+        self.calls = 0
+        self.last_call = 0.0
+        self._samples: _deque[tuple[float, bool]] = _deque(maxlen=window)
+        self._lock = _threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((latency, ok))
+            self.calls += 1
+            self.last_call = _time.monotonic()
+
+    def quantile(self, q: float) -> float | None:
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self._samples if ok)
+
+        if not latencies:
+            return None
+
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._samples)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+
+            return sum(not ok for _, ok in self._samples) / len(self._samples)
+
+
+class RouterAgent:
+    def __init__(
+        self,
+        agents: list,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_delay: float = 2.0,
+        window: int = 100,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        cooldown: float = 30.0,
+    ):
+        """
+        Route calls across interchangeable agents by observed latency and health.
+
+        Every call goes to the healthy agent with the lowest rolling p50 latency; agents
+        without enough samples are tried first so every provider gets measured. An agent
+        that returns None or raises counts as an error and the call fails over to the next
+        one. With hedging, a duplicate call is sent to the second-ranked agent once the
+        first has been running longer than its rolling p95, and the first answer wins.
+
+        Args:
+            agents (list): Agents doing the same task, e.g. the three question generators.
+            hedge (bool, optional): Send a hedged duplicate to a second agent. Defaults to False.
+            hedge_quantile (float, optional): The latency quantile that triggers the hedge. Defaults to 0.95.
+            hedge_delay (float, optional): The hedge delay in seconds until there are enough samples. Defaults to 2.
+            window (int, optional): The number of recent calls kept per agent. Defaults to 100.
+            min_samples (int, optional): The samples needed before statistics are trusted. Defaults to 5.
+            max_error_rate (float, optional): The error rate above which an agent is unhealthy. Defaults to 0.5.
+            cooldown (float, optional): Seconds after which an unhealthy agent is probed again. Defaults to 30.
+        """
+
+        if not agents:
+            raise ValueError("RouterAgent needs at least one agent")
+
+        self.agents = list(agents)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.names = self._names(self.agents)
+        self.trackers = {name: LatencyTracker(window=window) for name in self.names}
+        self._executor = _get_executor()
+        # The losing hedges of `arun`, referenced until they finish
+        self._background: set[_asyncio.Task] = set()
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.run(*args, **kwargs)
+
+    def run(self, *args, **kwargs) -> Any:
+        """
+        Run the call on the best agent, hedging and failing over as configured.
+
+        Returns:
+            Any: The first successful result, or None if every agent failed.
+        """
+
+        ranked = self._ranked()
+
+        if self.hedge and len(ranked) > 1:
+            result = self._hedged(ranked[0], ranked[1], args, kwargs)
+            if result is not None:
+                return result
+
+            ranked = ranked[2:]
+
+        for i in ranked:
+            result = self._call(i, args, kwargs)
+            if result is not None:
+                return result
+
+        return None
+
+    async def arun(self, *args, **kwargs) -> Any:
+        """
+        Run the call on the best agent, hedging and failing over as configured.
+
+        Returns:
+            Any: The first successful result, or None if every agent failed.
+        """
+
+        ranked = self._ranked()
+
+        if self.hedge and len(ranked) > 1:
+            result = await self._ahedged(ranked[0], ranked[1], args, kwargs)
+            if result is not None:
+                return result
+
+            ranked = ranked[2:]
+
+        for i in ranked:
+            result = await self._acall(i, args, kwargs)
+            if result is not None:
+                return result
+
+        return None
+
+    def stats(self) -> dict[str, ProviderStats]:
+        return {
+            name: ProviderStats(
+                calls=tracker.calls,
+                p50=tracker.quantile(0.5),
+                p95=tracker.quantile(0.95),
+                error_rate=tracker.error_rate,
+                healthy=self._healthy(tracker),
+            )
+            for name, tracker in self.trackers.items()
+        }
+
+    def _names(self, agents: list) -> list[str]:
+        names = [getattr(agent, "provider", "") or type(agent).__name__ for agent in agents]
+
+        # Keep names unique when several agents share a provider
+        return [name if names.count(name) == 1 else f"{name}-{i}" for i, name in enumerate(names)]
+
+    def _healthy(self, tracker: LatencyTracker) -> bool:
+        if tracker.samples < self.min_samples or tracker.error_rate <= self.max_error_rate:
+            return True
+
+        # Probe an unhealthy agent again once it has rested
+        return _time.monotonic() - tracker.last_call > self.cooldown
+
+    def _ranked(self) -> list[int]:
+        def key(i: int) -> tuple:
+            tracker = self.trackers[self.names[i]]
+            measured = tracker.samples >= self.min_samples
+
+            return (not self._healthy(tracker), measured, tracker.quantile(0.5) or 0.0)
+
+        return sorted(range(len(self.agents)), key=key)
+
+    def _delay(self, i: int) -> float:
+        tracker = self.trackers[self.names[i]]
+        if tracker.samples < self.min_samples:
+            return self.hedge_delay
+
+        return tracker.quantile(self.hedge_quantile) or self.hedge_delay
+
+    def _call(self, i: int, args: tuple, kwargs: dict) -> Any:
+        start = _time.perf_counter()
+        try:
+            result = self.agents[i](*args, **kwargs)
+        except Exception:
+            result = None
+
+        self.trackers[self.names[i]].record(_time.perf_counter() - start, result is not None)
+
+        return result
+
+    async def _acall(self, i: int, args: tuple, kwargs: dict) -> Any:
+        start = _time.perf_counter()
+        try:
+            result = await self.agents[i].arun(*args, **kwargs)
+        except Exception:
+            result = None
+
+        self.trackers[self.names[i]].record(_time.perf_counter() - start, result is not None)
+
+        return result
+
+    def _submit(self, i: int, args: tuple, kwargs: dict) -> _Future:
+        # Each attempt runs in its own copy of the caller's context, e.g. its tracing session and
+        # scheduling class, like BackgroundTask
+        context = _contextvars.copy_context()
+
+        return self._executor.submit(context.run, self._call, i, args, kwargs)
+
+    def _hedged(self, primary: int, secondary: int, args: tuple, kwargs: dict) -> Any:
+        futures = {self._submit(primary, args, kwargs)}
+
+        done, _ = _wait(futures, timeout=self._delay(primary))
+        if not done:
+            futures.add(self._submit(secondary, args, kwargs))
+            secondary = None
+
+        # The losing call keeps running in the background so its latency is still recorded
+        while futures:
+            done, futures = _wait(futures, return_when=_FIRST_COMPLETED)
+            for future in done:
+                if future.result() is not None:
+                    return future.result()
+
+            # The primary failed before the hedge was sent, fail over right away
+            if not futures and len(done) == 1 and secondary is not None:
+                futures = {self._submit(secondary, args, kwargs)}
+                secondary = None
+
+        return None
+
+    async def _ahedged(self, primary: int, secondary: int, args: tuple, kwargs: dict) -> Any:
+        tasks = {_asyncio.ensure_future(self._acall(primary, args, kwargs))}
+
+        done, _ = await _asyncio.wait(tasks, timeout=self._delay(primary))
+        if not done:
+            tasks.add(_asyncio.ensure_future(self._acall(secondary, args, kwargs)))
+            secondary = None
+
+        # The losing call keeps running in the background so its latency is still recorded, as in
+        # `_hedged`, cancelling it would leave the slow calls out of the hedge trigger
+        while tasks:
+            done, tasks = await _asyncio.wait(tasks, return_when=_asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is not None:
+                    self._detach(tasks)
+                    return task.result()
+
+            # The primary failed before the hedge was sent, fail over right away
+            if not tasks and len(done) == 1 and secondary is not None:
+                tasks = {_asyncio.ensure_future(self._acall(secondary, args, kwargs))}
+                secondary = None
+
+        return None
+
+    def _detach(self, tasks: set[_asyncio.Task]) -> None:
+        # The event loop only keeps weak references to tasks
+        for task in tasks:
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
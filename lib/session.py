@@ -0,0 +1,531 @@
+import asyncio as _asyncio
+import json as _json
+import uuid as _uuid
+from typing import Awaitable, Callable, Iterator
+
+from lib import tracing as _tracing
+from lib.configs import JOBS_BACKEND as _JOBS_BACKEND
+from lib.jobs import get_job_queue as _get_job_queue
+from lib.limits import scheduling as _scheduling
+from lib.memory import ConversationMemory as _ConversationMemory
+from lib.pipeline import EvaluationPipeline as _EvaluationPipeline
+from lib.pipeline import QueuedEvaluationPipeline as _QueuedEvaluationPipeline
+from lib.types import (
+    Evaluation,
+    EvaluationProgress,
+    MemoryState,
+    Message,
+    Question,
+    SessionState,
+    UserData,
+)
+from lib.workers import BackgroundTask as _BackgroundTask
+
+__all__ = ["InterviewSession", "describe"]
+
+WELCOME_MESSAGE = (
+    "Hi there! Before we start, please fill out the form so I can better assist you. 📝"
+)
+START_MESSAGE = (
+    "Let's get started with the interview questions. "
+    "I'll ask a series of questions, and you can respond when you're ready. 😊"
+)
+FAILURE_MESSAGE = (
+    "Sorry, I couldn't prepare your interview questions. Please submit the form again."
+)
+CLOSING_MESSAGE = "That was the last question. Thank you for your time! 🙏"
+REPORT_TITLE = "**Overall Evaluation and Feedback**"
+REPORT_SEPARATOR = "\n\n---\n\n"
+
+
+def describe(user_data: UserData) -> str:
+    """
+    Build the candidate description used as input for question generation.
+
+    Args:
+        user_data (UserData): The candidate's form data.
+
+    Returns:
+        str: The description.
+    """
+
+    description = (
+        f"Role: {user_data['role']}\n"
+        f"Years of Experience: {user_data['experience']}\n"
+        f"About: {user_data['about']}"
+    )
+
+    if user_data["resume"]:
+        description += f"\nResume:\n{user_data['resume']['summary']}"
+
+    return description
+
+
+class InterviewSession:
+    def __init__(
+        self,
+        question_agent,
+        evaluation_agent,
+        state: SessionState | None = None,
+        summary_agent=None,
+    ):
+        """
+        Interview flow independent of any UI: greet → generate → ask → collect → evaluate → close.
+
+        The whole conversation lives in `state`, a small JSON-serializable dict. Background
+        work, the question generation and the evaluations, is kept next to it and restarted
+        from the state when a session is restored.
+
+        The synchronous methods run the agents in the shared worker pool, for the Streamlit
+        app. The `a`-prefixed methods await the agents' `arun`, for many sessions on one event
+        loop.
+
+        The messages are remembered by a ConversationMemory, which keeps a bounded view of the
+        conversation for the models, the older messages summarized in the background.
+
+        Args:
+            question_agent: The question generator agent, e.g. OpenAIQuestionGeneratorAgent.
+            evaluation_agent: The response evaluation agent, e.g. OpenAIResponseEvaluationAgent.
+            state (SessionState | None, optional): A state from `to_dict()` to resume. Defaults to None.
+            summary_agent (optional): The agent summarizing older messages, e.g.
+                OpenAIConversationSummaryAgent. Defaults to None, for an extractive summary.
+        """
+
+        self.question_agent = question_agent
+        self.evaluation_agent = evaluation_agent
+        self.state = state or SessionState(
+            id=_uuid.uuid4().hex,
+            phase="greet",
+            user_data=None,
+            questions=[],
+            generated=False,
+            answers=[],
+            evaluations=[],
+            messages=[],
+            memory=MemoryState(summary="", summarized=0),
+        )
+        # States saved before the conversation memory existed
+        self.state.setdefault("memory", MemoryState(summary="", summarized=0))
+        self.state.setdefault("generated", bool(self.state["questions"]))
+        self.memory = _ConversationMemory(
+            self.state["messages"], self.state["memory"], summarizer=summary_agent
+        )
+
+        self._questions_task: _BackgroundTask | None = None
+        self._pipeline: _EvaluationPipeline | _QueuedEvaluationPipeline | None = None
+        self._evaluation_tasks: dict[int, _asyncio.Task] = {}
+        self._memory_task: _BackgroundTask | _asyncio.Task | None = None
+
+    @property
+    def id(self) -> str:
+        return self.state["id"]
+
+    @property
+    def phase(self) -> str:
+        return self.state["phase"]
+
+    @property
+    def messages(self) -> list:
+        return self.state["messages"]
+
+    def context(self, max_tokens: int | None = None) -> list[Message]:
+        """
+        Get the conversation history to send to a model.
+
+        Args:
+            max_tokens (int | None, optional): The tokens of the history. Defaults to MEMORY_MAX_TOKENS.
+
+        Returns:
+            list[Message]: The summary of the older messages, if any, and the recent ones.
+        """
+
+        if max_tokens is None:
+            return self.memory.view()
+
+        return self.memory.view(max_tokens)
+
+    def to_dict(self) -> SessionState:
+        # A JSON round trip copies the state faster than deepcopy, and checks it stays serializable
+        return _json.loads(_json.dumps(self.state))
+
+    @classmethod
+    def from_dict(
+        cls, state: SessionState, question_agent, evaluation_agent, summary_agent=None
+    ) -> "InterviewSession":
+        return cls(
+            question_agent,
+            evaluation_agent,
+            state=_json.loads(_json.dumps(state)),
+            summary_agent=summary_agent,
+        )
+
+    def welcome(self) -> None:
+        # Ask for the form data once, before the interview starts
+        if self.state["user_data"] is None and not self.messages:
+            self._say("assistant", WELCOME_MESSAGE)
+
+    def start(self, user_data: UserData) -> None:
+        """
+        Start a new interview, dropping the previous one but keeping the chat history.
+
+        Args:
+            user_data (UserData): The candidate's form data.
+        """
+
+        self._cancel()
+        self._questions_task = None
+        self.state.update(
+            phase="greet",
+            user_data=user_data,
+            questions=[],
+            generated=False,
+            answers=[],
+            evaluations=[],
+        )
+
+    def greet(self) -> None:
+        self._expect("greet")
+
+        user_data = self.state["user_data"]
+        self._say(
+            "assistant",
+            f"Hi {user_data['fullname']}! Welcome to the interview for the "
+            f"{user_data['role']} position. 🌟",
+        )
+        self._say("assistant", START_MESSAGE)
+        self.state["phase"] = "generate"
+
+    def generate(self) -> None:
+        """
+        Start generating the questions in the background, if not started yet.
+
+        The generation can start before the greeting, e.g. as soon as the form is submitted.
+        """
+
+        self._expect("greet", "generate")
+        self._generate()
+
+    async def agenerate(self) -> None:
+        self._expect("greet", "generate")
+        await self._agenerate()
+
+    def ask(self) -> str:
+        """
+        Ask the next question, waiting for it if it is still being generated.
+
+        Returns:
+            str: The question, or an apology if there are no questions.
+        """
+
+        self._expect("generate", "ask")
+        if self.phase == "generate":
+            self.generate()
+
+        return self._ask(self._question(len(self.state["answers"])))
+
+    def stream_ask(self) -> Iterator[str]:
+        """
+        Ask the next question like `ask()`, e.g. for `st.write_stream`.
+
+        Yields:
+            str: The question, as soon as the background generation has produced it.
+        """
+
+        yield self.ask()
+
+    async def aask(self) -> str:
+        self._expect("generate", "ask")
+        if self.phase == "generate":
+            await self.agenerate()
+
+        index = len(self.state["answers"])
+        if index >= len(self.state["questions"]):
+            await self._agenerate()
+        questions = self.state["questions"]
+
+        return self._ask(questions[index] if index < len(questions) else None)
+
+    def collect(self, answer: str) -> None:
+        """
+        Record the answer to the current question and evaluate it in the background.
+
+        Args:
+            answer (str): The candidate's answer.
+        """
+
+        index = self._collect(answer)
+        if self._pipeline is None:
+            self._pipeline = self._new_pipeline()
+
+        with _tracing.session(self.id), _scheduling(self.id, "evaluation"):
+            self._pipeline.submit(index, self.state["questions"][index]["question"], answer)
+        self._next(self._question(index + 1) is not None)
+
+    async def acollect(self, answer: str) -> None:
+        index = self._collect(answer)
+        question = self.state["questions"][index]["question"]
+
+        with _tracing.session(self.id), _scheduling(self.id, "evaluation"):
+            self._evaluation_tasks[index] = _asyncio.create_task(
+                self.evaluation_agent.arun(question, answer)
+            )
+        if index + 1 >= len(self.state["questions"]):
+            await self._agenerate()
+        self._next(index + 1 < len(self.state["questions"]))
+
+    def progress(self) -> EvaluationProgress:
+        if self._pipeline is None:
+            total = len(self.state["answers"])
+            return EvaluationProgress(total=total, pending=0, finished=total, failed=0)
+
+        return self._pipeline.progress()
+
+    def wait(self, timeout: float) -> EvaluationProgress:
+        """
+        Wait a little for the evaluations in flight, e.g. between updates of a progress bar.
+
+        Queued evaluations are run in this process if no worker is alive to run them.
+
+        Args:
+            timeout (float): Seconds to wait for each evaluation.
+
+        Returns:
+            EvaluationProgress: The progress after waiting.
+        """
+
+        if self._pipeline is not None:
+            self._pipeline.results(timeout=timeout)
+
+        return self.progress()
+
+    def evaluate(self, timeout: float | None = None) -> str:
+        """
+        Wait for the evaluations still in flight and close the interview with a report.
+
+        Args:
+            timeout (float | None, optional): Seconds to wait for each evaluation, None waits forever.
+                Defaults to None.
+
+        Returns:
+            str: The evaluation report.
+        """
+
+        self._expect("evaluate")
+        self._submit_missing()
+
+        results = self._pipeline.results(timeout=timeout)
+
+        return self._close([results.get(i) for i in range(len(self.state["answers"]))])
+
+    def stream_evaluate(self, timeout: float | None = None) -> Iterator[str]:
+        """
+        Close the interview like `evaluate()`, yielding the report as the evaluations finish.
+
+        Args:
+            timeout (float | None, optional): Seconds to wait for each evaluation, None waits forever.
+                Defaults to None.
+
+        Yields:
+            str: The sections of the report, each one as soon as its evaluation is done.
+        """
+
+        self._expect("evaluate")
+        self._submit_missing()
+
+        evaluations = []
+        yield REPORT_TITLE
+        for index in range(len(self.state["answers"])):
+            evaluations.append(self._pipeline.wait(index, timeout=timeout))
+            yield REPORT_SEPARATOR + self._section(index, evaluations[index])
+
+        self._close(evaluations)
+
+    async def aevaluate(self) -> str:
+        self._expect("evaluate")
+
+        with _tracing.session(self.id), _scheduling(self.id, "evaluation"):
+            for index, answer in enumerate(self.state["answers"]):
+                if index not in self._evaluation_tasks:
+                    question = self.state["questions"][index]["question"]
+                    self._evaluation_tasks[index] = _asyncio.create_task(
+                        self.evaluation_agent.arun(question, answer)
+                    )
+
+        indices = sorted(self._evaluation_tasks)
+        results = await _asyncio.gather(*(self._evaluation_tasks[i] for i in indices))
+
+        return self._close(list(results))
+
+    async def arun(self, user_data: UserData, answer: Callable[[str], Awaitable[str]]) -> str:
+        """
+        Run a whole interview, e.g. for simulations.
+
+        Args:
+            user_data (UserData): The candidate's form data.
+            answer (Callable[[str], Awaitable[str]]): Returns the candidate's answer to a question.
+
+        Returns:
+            str: The evaluation report, or the last message if the interview ended early.
+        """
+
+        self.start(user_data)
+        self.greet()
+
+        while self.phase in ("generate", "ask"):
+            question = await self.aask()
+            if self.phase == "close":
+                return question
+
+            await self.acollect(await answer(question))
+
+        return await self.aevaluate()
+
+    def close(self) -> None:
+        self._cancel()
+        self.state["phase"] = "close"
+
+    def _expect(self, *phases: str) -> None:
+        if self.phase not in phases:
+            raise RuntimeError(f"Cannot do this in the {self.phase} phase of the interview")
+
+    def _say(self, role: str, content: str) -> None:
+        self.state["messages"].append({"role": role, "content": content})
+        self._remember()
+
+    def _remember(self) -> None:
+        # Fold older messages into the summary in the background, the interview never waits
+        if not self.memory.due():
+            return
+        if self._memory_task is not None and not self._memory_task.done():
+            return
+        if self.memory.summarizer is None:
+            # The extractive summary is cheap
+            self.memory.update()
+            return
+
+        with _tracing.session(self.id), _scheduling(self.id, "evaluation"):
+            try:
+                _asyncio.get_running_loop()
+            except RuntimeError:
+                self._memory_task = _BackgroundTask(self.memory.update)
+            else:
+                self._memory_task = _asyncio.create_task(self.memory.aupdate())
+
+    def _generate(self) -> None:
+        # Also continues the generation of a session restored while it was running, whose
+        # questions are only part of the interview
+        if self._questions_task is None and not self.state["generated"]:
+            with _tracing.session(self.id), _scheduling(self.id, "question"):
+                self._questions_task = _BackgroundTask(
+                    self.question_agent.stream, describe(self.state["user_data"])
+                )
+
+    async def _agenerate(self) -> None:
+        if not self.state["generated"]:
+            with _tracing.session(self.id), _scheduling(self.id, "question"):
+                questions = await self.question_agent.arun(describe(self.state["user_data"]))
+            # A restored session keeps the questions it already has
+            self.state["questions"] += (questions or [])[len(self.state["questions"]) :]
+            self.state["generated"] = True
+
+    def _question(self, index: int) -> Question | None:
+        # Read the questions produced so far by the background generation, waiting if needed
+        if index >= len(self.state["questions"]) and not self.state["generated"]:
+            self._generate()
+            for i, question in enumerate(self._questions_task.iter_items()):
+                if i >= len(self.state["questions"]):
+                    self.state["questions"].append(question)
+                if i >= index:
+                    break
+            else:
+                self.state["generated"] = True
+
+        questions = self.state["questions"]
+
+        return questions[index] if index < len(questions) else None
+
+    def _ask(self, question: Question | None) -> str:
+        if question is None:
+            self._say("assistant", FAILURE_MESSAGE)
+            self.close()
+            return FAILURE_MESSAGE
+
+        self._say("assistant", question["question"])
+        self.state["phase"] = "collect"
+
+        return question["question"]
+
+    def _collect(self, answer: str) -> int:
+        self._expect("collect")
+        self._say("user", answer)
+        self.state["answers"].append(answer)
+
+        return len(self.state["answers"]) - 1
+
+    def _next(self, more_questions: bool) -> None:
+        if more_questions:
+            self.state["phase"] = "ask"
+            return
+
+        self._say("assistant", CLOSING_MESSAGE)
+        self.state["phase"] = "evaluate"
+
+    def _submit_missing(self) -> None:
+        if self._pipeline is None:
+            self._pipeline = self._new_pipeline()
+
+        # Answers of a restored session were evaluated by a previous process, evaluate them again
+        submitted = self._pipeline.results(timeout=0)
+        with _tracing.session(self.id), _scheduling(self.id, "evaluation"):
+            for index, answer in enumerate(self.state["answers"]):
+                if index not in submitted:
+                    question = self.state["questions"][index]["question"]
+                    self._pipeline.submit(index, question, answer)
+
+    def _close(self, evaluations: list[Evaluation | None]) -> str:
+        self.state["evaluations"] = evaluations
+
+        report = self._report()
+        self._say("assistant", report)
+        self.state["phase"] = "close"
+
+        return report
+
+    def _report(self) -> str:
+        sections = [REPORT_TITLE]
+        for index, evaluation in enumerate(self.state["evaluations"]):
+            sections.append(self._section(index, evaluation))
+
+        return REPORT_SEPARATOR.join(sections)
+
+    def _section(self, index: int, evaluation: Evaluation | None) -> str:
+        question = self.state["questions"][index]["question"]
+        if evaluation is None:
+            return f"**Q{index + 1}. {question}**\n\nSorry, I couldn't evaluate this answer."
+
+        return (
+            f"**Q{index + 1}. {question}**\n\n"
+            f"Evaluation: *{evaluation['evaluation']}*\n\n"
+            f"{evaluation['reason'] or ''}\n\n"
+            f"Feedback: {evaluation['feedback'] or ''}"
+        )
+
+    def _new_pipeline(self) -> _EvaluationPipeline | _QueuedEvaluationPipeline:
+        # The job queue outlives the app process, its idempotency keys dedupe the evaluations of
+        # a restored session
+        if _JOBS_BACKEND == "sqlite":
+            return _QueuedEvaluationPipeline(self.evaluation_agent, _get_job_queue(), key=self.id)
+
+        return _EvaluationPipeline(self.evaluation_agent)
+
+    def _cancel(self) -> None:
+        if self._questions_task is not None:
+            self._questions_task.cancel()
+        if self._pipeline is not None:
+            self._pipeline.cancel()
+        for task in self._evaluation_tasks.values():
+            task.cancel()
+
+        self._questions_task = None
+        self._pipeline = None
+        self._evaluation_tasks = {}
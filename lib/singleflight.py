@@ -0,0 +1,234 @@
+import asyncio as _asyncio
+import threading as _threading
+from typing import Any, Awaitable, Callable, Hashable, Iterator, TypeVar
+
+from lib.types import FlightStats
+
+__all__ = ["SingleFlight", "get_single_flight"]
+
+_T = TypeVar("_T")
+
+
+class _Call:
+    # One call in flight and the callers waiting for it
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = _threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class _Stream:
+    # One streamed call, replayed to every caller, whichever needs the next item pulls it
+    def __init__(self, iterator: Iterator):
+        self.iterator = iterator
+        self.items: list = []
+        self.finished = False
+        self.error: BaseException | None = None
+        self.readers = 0
+        self._pulling = False
+        self._condition = _threading.Condition()
+
+    def read(self) -> Iterator:
+        i = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: i < len(self.items) or not self._pulling)
+                if i < len(self.items):
+                    item = self.items[i]
+                elif self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    self._pulling = True
+                    item = _PULL
+
+            if item is _PULL and not self._pull():
+                continue
+
+            item = self.items[i]
+            i += 1
+            yield item
+
+    def close(self) -> None:
+        close = getattr(self.iterator, "close", None)
+        if close is not None:
+            close()
+
+    def _pull(self) -> bool:
+        # Wait for the next item without holding the condition, the others replay meanwhile
+        error = None
+        try:
+            item = next(self.iterator)
+        except StopIteration:
+            item = _PULL
+        except BaseException as exception:
+            item, error = _PULL, exception
+
+        with self._condition:
+            self._pulling = False
+            if item is _PULL:
+                self.finished = True
+                self.error = error
+            else:
+                self.items.append(item)
+            self._condition.notify_all()
+
+        return item is not _PULL
+
+
+_PULL = object()
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Coalesce identical calls that are in flight at the same time.
+
+        The first caller of a key runs the call, the callers of the same key arriving before it
+        finishes wait for it and get the same result, or the same error. Once the call is done
+        the key is forgotten, a result cache is what serves later calls.
+
+        Threads share the calls of `do` and `iterate`, coroutines of one event loop those of `ado`.
+        """
+
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = _threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._streams: dict[Hashable, _Stream] = {}
+        self._tasks: dict[tuple[int, Hashable], _asyncio.Task] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._streams) + len(self._tasks)
+
+    def do(self, key: Hashable, fn: Callable[[], _T]) -> _T:
+        """
+        Call a function, or wait for the identical call in flight.
+
+        Args:
+            key (Hashable): The identity of the call, e.g. the rendered request.
+            fn (Callable[[], T]): The call.
+
+        Returns:
+            T: The result of the call.
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[_T]]) -> _T:
+        """
+        Await a coroutine function, or the identical call in flight on the same event loop.
+
+        The call runs as a task of its own, a caller cancelled while waiting does not cancel it
+        for the others.
+
+        Args:
+            key (Hashable): The identity of the call, e.g. the rendered request.
+            fn (Callable[[], Awaitable[T]]): The call.
+
+        Returns:
+            T: The result of the call.
+        """
+
+        loop_key = (id(_asyncio.get_running_loop()), key)
+
+        with self._lock:
+            task = self._tasks.get(loop_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[loop_key] = _asyncio.ensure_future(fn())
+                task.add_done_callback(lambda _: self._forget(loop_key))
+            self._count(leader)
+
+        return await _asyncio.shield(task)
+
+    def iterate(self, key: Hashable, fn: Callable[[], Iterator[_T]]) -> Iterator[_T]:
+        """
+        Iterate a streamed call, or join the identical stream in flight.
+
+        Every caller gets every item from the first one. The items are pulled from the call by
+        whichever caller needs the next one, so a caller that stops early never stalls the others.
+
+        Args:
+            key (Hashable): The identity of the call, e.g. the rendered request.
+            fn (Callable[[], Iterator[T]]): The streamed call.
+
+        Yields:
+            T: The items of the call.
+        """
+
+        with self._lock:
+            stream = self._streams.get(key)
+            leader = stream is None
+            if leader:
+                stream = self._streams[key] = _Stream(fn())
+            self._count(leader)
+            stream.readers += 1
+
+        try:
+            yield from stream.read()
+        finally:
+            with self._lock:
+                stream.readers -= 1
+                abandoned = not stream.readers
+                if abandoned and self._streams.get(key) is stream:
+                    del self._streams[key]
+
+            # The last caller stopped early, nobody needs the rest
+            if abandoned and not stream.finished:
+                stream.close()
+
+    def stats(self) -> FlightStats:
+        with self._lock:
+            return FlightStats(calls=self.calls, coalesced=self.coalesced, in_flight=self.in_flight)
+
+    def _count(self, leader: bool) -> None:
+        # Called with the lock held
+        self.calls += 1
+        if not leader:
+            self.coalesced += 1
+
+    def _forget(self, loop_key: tuple[int, Hashable]) -> None:
+        with self._lock:
+            self._tasks.pop(loop_key, None)
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide single-flight group of the agents.
+
+    Returns:
+        SingleFlight: The shared group.
+    """
+
+    return _single_flight
@@ -1,11 +1,51 @@
-from typing import Literal, Optional
+import array as _array
+import importlib as _importlib
+import io as _io
+import json as _json
+import math as _math
+import os as _os
+import re as _re
+import wave as _wave
+import zlib as _zlib
+from collections import deque as _deque
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
 
-from openai import OpenAI
-from openai._base_client import HttpxBinaryResponseContent
+from lib.cache import AudioCache as _AudioCache
+from lib.clients import get_openai_client as _get_openai_client
+from lib.configs import STT_BACKEND as _STT_BACKEND
+from lib.configs import STT_MODEL_PATH as _STT_MODEL_PATH
+from lib.configs import STT_SAMPLE_RATE as _STT_SAMPLE_RATE
+from lib.configs import STT_SILENCE_MS as _STT_SILENCE_MS
+from lib.configs import TTS_BACKEND as _TTS_BACKEND
+from lib.configs import TTS_CACHE_DIR as _TTS_CACHE_DIR
+from lib.configs import TTS_CACHE_MAX_BYTES as _TTS_CACHE_MAX_BYTES
+from lib.configs import TTS_MODEL as _TTS_MODEL
+from lib.configs import TTS_VOICE as _TTS_VOICE
+from lib.limits import get_limiter as _get_limiter
+from lib.retry import RetryPolicy as _RetryPolicy
+from lib.retry import call as _call
+from lib.retry import request_timeout as _request_timeout
+from lib.types import Transcript, Voice
 
-from lib.configs import OPENAI_API_KEY
+__all__ = [
+    "BaseTool",
+    "SpeechBackend",
+    "OpenAISpeechBackend",
+    "LocalSpeechBackend",
+    "TextToSpeechTool",
+    "split_sentences",
+    "VoiceActivityDetector",
+    "SpeechRecognizer",
+    "TranscriptionBackend",
+    "VoskBackend",
+    "BatchTranscriptionBackend",
+    "SpeechToTextTool",
+]
 
-__all__ = ["BaseTool"]
+_SENTENCE_END = _re.compile(r"(?<=[.!?])\s+")
+# Markdown markup and emojis are not read aloud
+_MARKUP = _re.compile(r"[*_`#>|]+|-{3,}|[\U0001F300-\U0001FAFF☀-➿]")
 
 
 class BaseTool:
@@ -17,3 +57,591 @@ class BaseTool:
 
     def run(self, *args, **kwargs):
         raise NotImplementedError
+
+
+def split_sentences(text: str, max_chars: int = 200) -> list[str]:
+    """
+    Split text into chunks to synthesize one by one.
+
+    The first sentence is a chunk of its own so that its audio is ready as early as possible,
+    the next sentences are grouped up to `max_chars`. Longer sentences are cut at a comma or a
+    space.
+
+    Args:
+        text (str): The text, markdown is stripped.
+        max_chars (int, optional): The maximum length of a chunk. Defaults to 200.
+
+    Returns:
+        list[str]: The chunks, in reading order.
+    """
+
+    text = _re.sub(r"\s+", " ", _MARKUP.sub(" ", text)).strip()
+
+    sentences = []
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(", ", 0, max_chars) + 1 or sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    chunks: list[str] = []
+    for sentence in sentences:
+        if len(chunks) > 1 and len(chunks[-1]) + 1 + len(sentence) <= max_chars:
+            chunks[-1] += " " + sentence
+        else:
+            chunks.append(sentence)
+
+    return chunks
+
+
+class SpeechBackend:
+    # Identifies the backend settings in the audio cache keys
+    name: str = ""
+    format: str = ""
+
+    def synthesize(self, text: str, voice: Voice) -> bytes:
+        raise NotImplementedError
+
+    def join(self, chunks: list[bytes]) -> bytes:
+        # Compressed frame formats like MP3 can be concatenated as they are
+        return b"".join(chunks)
+
+
+class OpenAISpeechBackend(SpeechBackend):
+    def __init__(self, model: str = _TTS_MODEL, format: str = "mp3"):
+        """
+        Speech synthesis with the OpenAI audio API.
+
+        Args:
+            model (str, optional): The speech model. Defaults to TTS_MODEL.
+            format (str, optional): The audio format. Defaults to "mp3".
+        """
+
+        self.model = model
+        self.format = format
+        self.name = f"openai-{model}-{format}"
+        self.client = _get_openai_client()
+        self.retry = _RetryPolicy()
+
+    def synthesize(self, text: str, voice: Voice) -> bytes:
+        def request() -> bytes:
+            with _get_limiter("openai"):
+                output = self.client.audio.speech.create(
+                    model=self.model,
+                    voice=voice,
+                    input=text,
+                    response_format=self.format,
+                    timeout=_request_timeout(),
+                )
+
+            return output.content
+
+        return _call(request, self.retry, "openai")
+
+
+class LocalSpeechBackend(SpeechBackend):
+    format = "wav"
+
+    def __init__(self, sample_rate: int = 8000, seconds_per_char: float = 0.03):
+        """
+        Offline stand-in for a speech engine, for tests, benchmarks and demos without network.
+
+        Each word becomes a short tone whose pitch depends on the word, so the same text always
+        gives the same WAV audio, as long as it would take to read it.
+
+        Args:
+            sample_rate (int, optional): Samples per second. Defaults to 8000.
+            seconds_per_char (float, optional): Audio length per character. Defaults to 0.03.
+        """
+
+        self.sample_rate = sample_rate
+        self.seconds_per_char = seconds_per_char
+        self.name = f"local-{sample_rate}-{seconds_per_char}"
+
+    def synthesize(self, text: str, voice: Voice) -> bytes:
+        samples = _array.array("h")
+        pause = [0] * int(self.sample_rate * self.seconds_per_char * 2)
+        base = 120 + 20 * (_zlib.crc32(voice.encode()) % 8)
+
+        for word in text.split():
+            frequency = base + _zlib.crc32(word.lower().encode()) % 200
+            step = 2 * _math.pi * frequency / self.sample_rate
+            length = int(self.sample_rate * self.seconds_per_char * len(word))
+            samples.extend(int(8000 * _math.sin(step * i)) for i in range(length))
+            samples.extend(pause)
+
+        return self._wav([samples.tobytes()])
+
+    def join(self, chunks: list[bytes]) -> bytes:
+        # WAV files have a header each, keep the samples only
+        frames = []
+        for chunk in chunks:
+            with _wave.open(_io.BytesIO(chunk), "rb") as file:
+                frames.append(file.readframes(file.getnframes()))
+
+        return self._wav(frames)
+
+    def _wav(self, frames: list[bytes]) -> bytes:
+        output = _io.BytesIO()
+        with _wave.open(output, "wb") as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(self.sample_rate)
+            for chunk in frames:
+                file.writeframes(chunk)
+
+        return output.getvalue()
+
+
+class TextToSpeechTool(BaseTool):
+    def __init__(
+        self,
+        backend: SpeechBackend | None = None,
+        voice: Voice = _TTS_VOICE,
+        cache: _AudioCache | None = None,
+        prefetch: int = 2,
+        max_chars: int = 200,
+        max_workers: int = 4,
+    ):
+        """
+        Read questions and feedback aloud, sentence by sentence.
+
+        The text is split into sentences synthesized concurrently a few chunks ahead, so the
+        first chunk can play while the next ones are being synthesized. Synthesized chunks are
+        cached on disk, the same question is never synthesized twice.
+
+        Args:
+            backend (SpeechBackend | None, optional): The speech engine. Defaults to TTS_BACKEND,
+                "openai" or "local".
+            voice (Voice, optional): The default voice. Defaults to TTS_VOICE.
+            cache (AudioCache | None, optional): The audio cache. Defaults to an AudioCache in
+                TTS_CACHE_DIR.
+            prefetch (int, optional): The chunks synthesized ahead of playback. Defaults to 2.
+            max_chars (int, optional): The maximum length of a chunk. Defaults to 200.
+            max_workers (int, optional): The synthesis threads, shared by all streams. Defaults to 4.
+        """
+
+        super().__init__()
+
+        if backend is None:
+            backend = LocalSpeechBackend() if _TTS_BACKEND == "local" else OpenAISpeechBackend()
+
+        self.backend = backend
+        self.voice = voice
+        self.cache = (
+            cache if cache is not None else _AudioCache(_TTS_CACHE_DIR, _TTS_CACHE_MAX_BYTES)
+        )
+        self.prefetch = max(1, prefetch)
+        self.max_chars = max_chars
+        self._executor = _ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+
+    @property
+    def format(self) -> str:
+        return self.backend.format
+
+    def run(self, text: str, voice: Voice | None = None) -> bytes | None:
+        """
+        Synthesize a whole text.
+
+        Args:
+            text (str): The text to read.
+            voice (Voice | None, optional): The voice. Defaults to the tool's voice.
+
+        Returns:
+            bytes | None: The audio in the backend format, or None if an error occurs.
+        """
+
+        voice = voice or self.voice
+        futures = [
+            self._executor.submit(self.synthesize, chunk, voice)
+            for chunk in split_sentences(text, self.max_chars)
+        ]
+
+        try:
+            return self.backend.join([future.result() for future in futures]) if futures else None
+        except Exception:
+            for future in futures:
+                future.cancel()
+
+            return None
+
+    def stream(self, text: str, voice: Voice | None = None) -> Iterator[bytes]:
+        """
+        Synthesize a text chunk by chunk, yielding each chunk's audio as soon as it is ready.
+
+        Args:
+            text (str): The text to read.
+            voice (Voice | None, optional): The voice. Defaults to the tool's voice.
+
+        Yields:
+            bytes: The audio of each chunk, in reading order. The stream ends early if an error occurs.
+        """
+
+        voice = voice or self.voice
+        chunks = iter(split_sentences(text, self.max_chars))
+        pending = _deque(
+            self._executor.submit(self.synthesize, chunk, voice)
+            for _, chunk in zip(range(self.prefetch), chunks)
+        )
+
+        try:
+            while pending:
+                audio = pending.popleft().result()
+
+                # Keep synthesizing ahead while the caller plays this chunk
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.append(self._executor.submit(self.synthesize, chunk, voice))
+
+                yield audio
+        except Exception:
+            return
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def synthesize(self, text: str, voice: Voice) -> bytes:
+        """
+        Synthesize one chunk, or read it from the cache.
+
+        Args:
+            text (str): The chunk.
+            voice (Voice): The voice.
+
+        Returns:
+            bytes: The audio in the backend format.
+        """
+
+        key = f"{self.backend.name}:{voice}"
+        audio = self.cache.get(key, text)
+        if audio is None:
+            audio = self.backend.synthesize(text, voice)
+            self.cache.set(key, text, audio)
+
+        return audio
+
+
+class VoiceActivityDetector:
+    def __init__(
+        self,
+        sample_rate: int = _STT_SAMPLE_RATE,
+        threshold: float = 3.0,
+        min_energy: float = 300.0,
+        start_ms: int = 90,
+        silence_ms: int = _STT_SILENCE_MS,
+    ):
+        """
+        Energy-based voice activity detection of 16-bit mono PCM frames.
+
+        A frame is loud when its RMS energy is `threshold` times over the background noise,
+        which is tracked while nobody speaks. An utterance starts after `start_ms` of loud
+        frames, so clicks are ignored, and ends after `silence_ms` of quiet ones, so short
+        pauses between words do not cut it.
+
+        Args:
+            sample_rate (int, optional): Samples per second. Defaults to STT_SAMPLE_RATE.
+            threshold (float, optional): Energy ratio over the noise for speech. Defaults to 3.0.
+            min_energy (float, optional): The minimum RMS energy of speech. Defaults to 300.0.
+            start_ms (int, optional): Loud audio that starts an utterance. Defaults to 90.
+            silence_ms (int, optional): Quiet audio that ends an utterance. Defaults to STT_SILENCE_MS.
+        """
+
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.min_energy = min_energy
+        self.start_ms = start_ms
+        self.silence_ms = silence_ms
+        self.speaking = False
+        self.noise = 0.0
+        self._loud_ms = 0.0
+        self._quiet_ms = 0.0
+
+    def update(self, frame: bytes) -> bool:
+        """
+        Process the next frame.
+
+        Args:
+            frame (bytes): 16-bit mono PCM samples, usually 10 to 30 ms.
+
+        Returns:
+            bool: Whether an utterance is in progress.
+        """
+
+        samples = _array.array("h", frame)
+        energy = (
+            _math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+            if samples
+            else 0.0
+        )
+        duration = len(samples) * 1000 / self.sample_rate
+        loud = energy > max(self.min_energy, self.noise * self.threshold)
+
+        if not self.speaking:
+            # Follow quiet backgrounds closely, and steady noisy ones slowly
+            self.noise += (0.005 if loud else 0.05) * (energy - self.noise)
+
+        if loud:
+            self._loud_ms += duration
+            self._quiet_ms = 0.0
+        else:
+            self._quiet_ms += duration
+            self._loud_ms = 0.0
+
+        if not self.speaking and self._loud_ms >= self.start_ms:
+            self.speaking = True
+        elif self.speaking and self._quiet_ms >= self.silence_ms:
+            self.speaking = False
+
+        return self.speaking
+
+
+class SpeechRecognizer:
+    # The transcription of one utterance, fed frame by frame
+
+    def accept(self, frame: bytes) -> str:
+        # Returns the partial transcript so far
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        # Returns the final transcript
+        raise NotImplementedError
+
+
+class TranscriptionBackend:
+    name: str = ""
+
+    def recognizer(self, sample_rate: int) -> SpeechRecognizer:
+        raise NotImplementedError
+
+
+class _VoskRecognizer(SpeechRecognizer):
+    def __init__(self, recognizer):
+        self._recognizer = recognizer
+        self._segments: list[str] = []
+
+    def accept(self, frame: bytes) -> str:
+        if self._recognizer.AcceptWaveform(frame):
+            # Vosk closed a segment at a pause inside the utterance
+            self._segments.append(_json.loads(self._recognizer.Result())["text"])
+            return self._text()
+
+        return self._text(_json.loads(self._recognizer.PartialResult())["partial"])
+
+    def finish(self) -> str:
+        return self._text(_json.loads(self._recognizer.FinalResult())["text"])
+
+    def _text(self, last: str = "") -> str:
+        return " ".join(segment for segment in [*self._segments, last] if segment)
+
+
+class VoskBackend(TranscriptionBackend):
+    def __init__(self, model_path: str = _STT_MODEL_PATH):
+        """
+        Offline streaming transcription with Vosk.
+
+        Args:
+            model_path (str, optional): The directory of a Vosk model. Defaults to STT_MODEL_PATH.
+
+        Raises:
+            ImportError: If `vosk` is not installed.
+            FileNotFoundError: If there is no model in `model_path`.
+        """
+
+        # Vosk only logs a missing model and raises a bare Exception
+        if not _os.path.isdir(model_path):
+            raise FileNotFoundError(f"No Vosk model in {model_path}, set STT_MODEL_PATH")
+
+        self._vosk = _importlib.import_module("vosk")
+        self._vosk.SetLogLevel(-1)
+        self.model = self._vosk.Model(model_path)
+        self.name = f"vosk-{model_path}"
+
+    def recognizer(self, sample_rate: int) -> SpeechRecognizer:
+        return _VoskRecognizer(self._vosk.KaldiRecognizer(self.model, sample_rate))
+
+
+class _BatchRecognizer(SpeechRecognizer):
+    def __init__(self, backend: "BatchTranscriptionBackend", sample_rate: int):
+        self._backend = backend
+        self._sample_rate = sample_rate
+        self._audio = bytearray()
+        self._transcribed = 0
+        self._partial = ""
+
+    def accept(self, frame: bytes) -> str:
+        self._audio += frame
+        # 2 bytes per sample
+        if len(self._audio) - self._transcribed >= self._backend.interval * self._sample_rate * 2:
+            self._transcribed = len(self._audio)
+            self._partial = self._backend.transcribe(bytes(self._audio), self._sample_rate)
+
+        return self._partial
+
+    def finish(self) -> str:
+        return self._backend.transcribe(bytes(self._audio), self._sample_rate)
+
+
+class BatchTranscriptionBackend(TranscriptionBackend):
+    def __init__(
+        self, transcribe: Callable[[bytes, int], str], interval: float = 1.0, name: str = "batch"
+    ):
+        """
+        Incremental transcription with an engine that transcribes whole clips, like whisper.cpp.
+
+        The utterance is transcribed again every `interval` seconds of new audio for the partial
+        transcripts, and once more when it ends. Utterances are short, so this stays cheap.
+
+        Args:
+            transcribe (Callable[[bytes, int], str]): Transcribes 16-bit mono PCM at a sample rate.
+            interval (float, optional): Seconds of audio between partial transcripts. Defaults to 1.0.
+            name (str, optional): The engine name. Defaults to "batch".
+        """
+
+        self.transcribe = transcribe
+        self.interval = interval
+        self.name = name
+
+    def recognizer(self, sample_rate: int) -> SpeechRecognizer:
+        return _BatchRecognizer(self, sample_rate)
+
+
+class SpeechToTextTool(BaseTool):
+    def __init__(
+        self,
+        backend: TranscriptionBackend | None = None,
+        sample_rate: int = _STT_SAMPLE_RATE,
+        silence_ms: int = _STT_SILENCE_MS,
+        preroll_ms: int = 300,
+        frame_ms: int = 30,
+    ):
+        """
+        Transcribe spoken answers while they are being spoken.
+
+        Microphone frames go through voice activity detection, and each utterance is fed to the
+        recognizer as it is spoken, so its transcript is final a moment after the candidate stops
+        speaking instead of after the whole recording is processed.
+
+        Args:
+            backend (TranscriptionBackend | None, optional): The speech engine. Defaults to
+                STT_BACKEND, "vosk" with the model in STT_MODEL_PATH.
+            sample_rate (int, optional): The sample rate of the frames. Defaults to STT_SAMPLE_RATE.
+            silence_ms (int, optional): Silence that ends an utterance. Defaults to STT_SILENCE_MS.
+            preroll_ms (int, optional): Audio kept before the detected start of speech, so the first
+                syllable is not cut. Defaults to 300.
+            frame_ms (int, optional): Frame length when transcribing whole recordings. Defaults to 30.
+
+        Raises:
+            ValueError: If STT_BACKEND names an unknown engine.
+        """
+
+        super().__init__()
+
+        if backend is None:
+            if _STT_BACKEND not in ("", "vosk"):
+                raise ValueError(f'Unknown STT_BACKEND "{_STT_BACKEND}", expected "vosk"')
+
+            backend = VoskBackend()
+
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.silence_ms = silence_ms
+        self.preroll_ms = preroll_ms
+        self.frame_ms = frame_ms
+
+    def run(self, audio: bytes) -> str | None:
+        """
+        Transcribe a whole recording.
+
+        Args:
+            audio (bytes): A 16-bit mono WAV file, or raw PCM at the tool's sample rate.
+
+        Returns:
+            str | None: The transcript, or None if nothing was understood or an error occurs.
+        """
+
+        try:
+            pcm, sample_rate = self._pcm(audio)
+            size = sample_rate * self.frame_ms // 1000 * 2
+            frames = (pcm[i : i + size] for i in range(0, len(pcm), size))
+            texts = [item["text"] for item in self.stream(frames, sample_rate) if item["final"]]
+        except Exception:
+            return None
+
+        return " ".join(texts) or None
+
+    def stream(
+        self, frames: Iterable[bytes], sample_rate: int | None = None
+    ) -> Iterator[Transcript]:
+        """
+        Transcribe a stream of audio frames, e.g. from a microphone callback queue.
+
+        Args:
+            frames (Iterable[bytes]): 16-bit mono PCM frames, usually 10 to 30 ms.
+            sample_rate (int | None, optional): Their sample rate. Defaults to the tool's.
+
+        Yields:
+            Transcript: The partial transcript of the current utterance whenever it changes, and
+                its final transcript when it ends.
+        """
+
+        sample_rate = sample_rate or self.sample_rate
+        detector = VoiceActivityDetector(sample_rate, silence_ms=self.silence_ms)
+        preroll: _deque[bytes] = _deque()
+        recognizer = None
+        text = ""
+        start = elapsed = 0.0
+
+        for frame in frames:
+            duration = len(frame) / 2 / sample_rate
+            speaking = detector.update(frame)
+            elapsed += duration
+
+            if recognizer is None:
+                preroll.append(frame)
+                if not speaking:
+                    while (
+                        len(preroll) > 1 and (len(preroll) - 1) * duration * 1000 >= self.preroll_ms
+                    ):
+                        preroll.popleft()
+                    continue
+
+                # The utterance starts with the audio just before it was detected
+                recognizer = self.backend.recognizer(sample_rate)
+                start = elapsed - sum(len(item) for item in preroll) / 2 / sample_rate
+                frame = b"".join(preroll)
+                preroll.clear()
+
+            partial = recognizer.accept(frame)
+            if speaking and partial != text:
+                text = partial
+                yield Transcript(text=text, final=False, start=start, end=elapsed)
+
+            if not speaking:
+                yield from self._finish(recognizer, start, elapsed)
+                recognizer = None
+                text = ""
+
+        if recognizer is not None:
+            yield from self._finish(recognizer, start, elapsed)
+
+    def _finish(
+        self, recognizer: SpeechRecognizer, start: float, end: float
+    ) -> Iterator[Transcript]:
+        # Noise that triggered the detector gives no text
+        text = recognizer.finish().strip()
+        if text:
+            yield Transcript(text=text, final=True, start=start, end=end)
+
+    def _pcm(self, audio: bytes) -> tuple[bytes, int]:
+        if not audio.startswith(b"RIFF"):
+            return audio, self.sample_rate
+
+        with _wave.open(_io.BytesIO(audio), "rb") as file:
+            if file.getnchannels() != 1 or file.getsampwidth() != 2:
+                raise ValueError("Only 16-bit mono WAV audio can be transcribed")
+
+            return file.readframes(file.getnframes()), file.getframerate()
@@ -0,0 +1,571 @@
+import contextlib as _contextlib
+import contextvars as _contextvars
+import functools as _functools
+import importlib as _importlib
+import inspect as _inspect
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+from collections import deque as _deque
+from typing import Any, Awaitable, Callable, Iterator
+
+from lib.configs import PRICES as _PRICES
+from lib.configs import TRACING as _TRACING
+from lib.configs import TRACING_BUFFER_SIZE as _TRACING_BUFFER_SIZE
+from lib.configs import TRACING_OTEL as _TRACING_OTEL
+from lib.prompts import count_tokens as _count_tokens
+from lib.types import Span, SpanTotals
+
+__all__ = [
+    "RingBufferExporter",
+    "OpenTelemetryExporter",
+    "configure",
+    "enabled",
+    "session",
+    "spans",
+    "totals",
+    "traced",
+]
+
+# The span of the agent call in progress, None when tracing is disabled or outside of a call
+_current: _contextvars.ContextVar["_Span | None"] = _contextvars.ContextVar("span", default=None)
+# The interview session the calls are made for
+_session: _contextvars.ContextVar[str | None] = _contextvars.ContextVar("session", default=None)
+
+
+class _Span:
+    __slots__ = (
+        "name",
+        "provider",
+        "model",
+        "session",
+        "start",
+        "queue_wait",
+        "network",
+        "parse",
+        "requests",
+        "prompt_tokens",
+        "completion_tokens",
+        "estimated_tokens",
+        "_started",
+        "_lock",
+    )
+
+    def __init__(self, name: str, provider: str, model: str):
+        self.name = name
+        self.provider = provider
+        self.model = model
+        self.session = _session.get()
+        self.start = _time.time()
+        self.queue_wait = 0.0
+        self.network = 0.0
+        self.parse = 0.0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_tokens = False
+        self._started = _time.perf_counter()
+        # Batched evaluations update one span from several threads
+        self._lock = _threading.Lock()
+
+    def add(self, name: str, value: float) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def finish(self, error: str | None) -> Span:
+        input_price, output_price = _PRICES.get(self.model, (0.0, 0.0))
+
+        return Span(
+            name=self.name,
+            provider=self.provider,
+            model=self.model,
+            session=self.session,
+            start=self.start,
+            duration=_time.perf_counter() - self._started,
+            queue_wait=self.queue_wait,
+            network=self.network,
+            parse=self.parse,
+            requests=self.requests,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            estimated_tokens=self.estimated_tokens,
+            cost=(self.prompt_tokens * input_price + self.completion_tokens * output_price) / 1000,
+            error=error,
+        )
+
+
+def _empty_totals() -> SpanTotals:
+    return SpanTotals(
+        calls=0,
+        errors=0,
+        requests=0,
+        duration=0.0,
+        queue_wait=0.0,
+        network=0.0,
+        parse=0.0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        cost=0.0,
+    )
+
+
+class RingBufferExporter:
+    def __init__(self, max_spans: int = 2048, max_sessions: int = 1024):
+        """
+        Keep the latest spans in memory, and running totals per interview session.
+
+        Args:
+            max_spans (int, optional): The number of spans kept. Defaults to 2048.
+            max_sessions (int, optional): The number of sessions with totals kept, the least
+                recently active ones are dropped first. Defaults to 1024.
+        """
+
+        self.max_sessions = max_sessions
+        self._spans: _deque[Span] = _deque(maxlen=max_spans)
+        self._totals: _OrderedDict[str | None, SpanTotals] = _OrderedDict()
+        self._lock = _threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+            totals = self._totals.get(span["session"])
+            if totals is None:
+                totals = self._totals[span["session"]] = _empty_totals()
+                if len(self._totals) > self.max_sessions:
+                    self._totals.popitem(last=False)
+            self._totals.move_to_end(span["session"])
+
+            totals["calls"] += 1
+            totals["errors"] += span["error"] is not None
+            for key in (
+                "requests",
+                "duration",
+                "queue_wait",
+                "network",
+                "parse",
+                "prompt_tokens",
+                "completion_tokens",
+                "cost",
+            ):
+                totals[key] += span[key]
+
+    def spans(self, session: str | None = None) -> list[Span]:
+        with self._lock:
+            return [span for span in self._spans if session is None or span["session"] == session]
+
+    def totals(self, session: str | None = None) -> SpanTotals:
+        with self._lock:
+            if session is not None:
+                return SpanTotals(**self._totals.get(session, _empty_totals()))
+
+            result = _empty_totals()
+            for totals in self._totals.values():
+                for key, value in totals.items():
+                    result[key] += value
+
+            return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+
+class OpenTelemetryExporter:
+    def __init__(self, tracer=None):
+        """
+        Send the spans to OpenTelemetry, with the GenAI semantic conventions where they exist.
+
+        Needs the optional `opentelemetry-api` package, and an SDK configured by the application
+        to actually export anything.
+
+        Args:
+            tracer (opentelemetry.trace.Tracer | None, optional): The tracer to use. Defaults to
+                the tracer of the global tracer provider.
+        """
+
+        self._trace = _importlib.import_module("opentelemetry.trace")
+        self._tracer = tracer or self._trace.get_tracer("lib.agents")
+
+    def export(self, span: Span) -> None:
+        start = int(span["start"] * 1e9)
+        attributes = {
+            "gen_ai.system": span["provider"],
+            "gen_ai.request.model": span["model"],
+            "gen_ai.usage.input_tokens": span["prompt_tokens"],
+            "gen_ai.usage.output_tokens": span["completion_tokens"],
+            "agent.session": span["session"] or "",
+            "agent.queue_wait": span["queue_wait"],
+            "agent.network": span["network"],
+            "agent.parse": span["parse"],
+            "agent.requests": span["requests"],
+            "agent.estimated_tokens": span["estimated_tokens"],
+            "agent.cost": span["cost"],
+        }
+
+        otel_span = self._tracer.start_span(span["name"], start_time=start, attributes=attributes)
+        if span["error"] is not None:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span["error"]))
+        otel_span.end(end_time=start + int(span["duration"] * 1e9))
+
+
+class _Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.buffer = RingBufferExporter(_TRACING_BUFFER_SIZE)
+        self.exporters: list = []
+
+    def export(self, span: _Span, error: str | None) -> None:
+        record = span.finish(error)
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception:
+                # A broken exporter never fails the agent call
+                pass
+
+
+_tracer = _Tracer()
+
+
+def configure(enabled: bool = True, exporters: list | None = None) -> None:
+    """
+    Turn tracing of agent calls on or off.
+
+    Args:
+        enabled (bool, optional): Whether to trace. Defaults to True.
+        exporters (list | None, optional): Objects with an `export(span)` method receiving the
+            finished spans. Defaults to the in-process ring buffer, read by `spans()` and `totals()`.
+    """
+
+    _tracer.exporters = [_tracer.buffer] if exporters is None else list(exporters)
+    _tracer.enabled = enabled
+
+
+def enabled() -> bool:
+    return _tracer.enabled
+
+
+@_contextlib.contextmanager
+def session(session_id: str | None) -> Iterator[None]:
+    """
+    Attribute the agent calls started in the block to an interview session.
+
+    Calls started in background threads or tasks from the block inherit the session.
+
+    Args:
+        session_id (str | None): The session identifier.
+    """
+
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def spans(session: str | None = None) -> list[Span]:
+    """
+    Get the latest spans of the in-process ring buffer.
+
+    Args:
+        session (str | None, optional): Only the spans of this session. Defaults to all spans.
+
+    Returns:
+        list[Span]: The spans, oldest first.
+    """
+
+    return _tracer.buffer.spans(session)
+
+
+def totals(session: str | None = None) -> SpanTotals:
+    """
+    Get the totals of the traced calls, including the ones already dropped from the ring buffer.
+
+    Args:
+        session (str | None, optional): Only the calls of this session. Defaults to all calls.
+
+    Returns:
+        SpanTotals: The number of calls, the time, tokens and estimated cost they add up to.
+    """
+
+    return _tracer.buffer.totals(session)
+
+
+def traced(method: Callable) -> Callable:
+    """
+    Trace each call of an agent method as one span, unless it runs inside another traced call.
+
+    Works for plain methods, coroutines and generators, e.g. `run`, `arun` and `stream`.
+
+    Args:
+        method (Callable): The agent method.
+
+    Returns:
+        Callable: The traced method.
+    """
+
+    if _inspect.isgeneratorfunction(method):
+        wrapper = _traced_stream(method)
+    elif _inspect.iscoroutinefunction(method):
+        wrapper = _traced_coroutine(method)
+    else:
+        wrapper = _traced_call(method)
+
+    wrapper.__traced__ = True
+
+    return _functools.wraps(method)(wrapper)
+
+
+def _start(agent, method: Callable) -> _Span:
+    return _Span(f"{type(agent).__name__}.{method.__name__}", agent.provider, agent.model)
+
+
+def _traced_call(method: Callable) -> Callable:
+    def traced_call(self, *args, **kwargs):
+        if not _tracer.enabled or _current.get() is not None:
+            return method(self, *args, **kwargs)
+
+        span = _start(self, method)
+        token = _current.set(span)
+        error = "NoResult"
+        try:
+            result = method(self, *args, **kwargs)
+            if result is not None:
+                error = None
+            return result
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            _tracer.export(span, error)
+
+    return traced_call
+
+
+def _traced_coroutine(method: Callable) -> Callable:
+    async def traced_coroutine(self, *args, **kwargs):
+        if not _tracer.enabled or _current.get() is not None:
+            return await method(self, *args, **kwargs)
+
+        span = _start(self, method)
+        token = _current.set(span)
+        error = "NoResult"
+        try:
+            result = await method(self, *args, **kwargs)
+            if result is not None:
+                error = None
+            return result
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            _tracer.export(span, error)
+
+    return traced_coroutine
+
+
+def _traced_stream(method: Callable) -> Callable:
+    def traced_stream(self, *args, **kwargs):
+        if not _tracer.enabled or _current.get() is not None:
+            yield from method(self, *args, **kwargs)
+            return
+
+        span = _start(self, method)
+        iterator = method(self, *args, **kwargs)
+        error = None
+        # The span is only current while the stream runs, not while the consumer handles items
+        try:
+            while True:
+                token = _current.set(span)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    _current.reset(token)
+
+                yield item
+        except GeneratorExit:
+            # The consumer stopped early, e.g. a cancelled background task
+            raise
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            iterator.close()
+            _tracer.export(span, error)
+
+    return traced_stream
+
+
+def _estimate(span: _Span, model: str, prompt: str, system: str | None, output: str) -> None:
+    # Providers that don't report usage, and streams, are billed by the local token count
+    prompt_tokens = _count_tokens(prompt, model)
+    if system is not None:
+        prompt_tokens += _count_tokens(system, model)
+
+    with span._lock:
+        span.prompt_tokens += prompt_tokens
+        span.completion_tokens += _count_tokens(output, model)
+        span.estimated_tokens = True
+
+
+def trace_request(request: Callable[[], str], model: str, prompt: str, system: str | None) -> str:
+    """
+    Time one provider request of the current span and count its tokens.
+
+    The provider reports the usage with `record_usage()` during the request if it can,
+    otherwise the tokens are counted locally.
+
+    Args:
+        request (Callable[[], str]): Sends the request and returns the completion.
+        model (str): The model name.
+        prompt (str): The rendered prompt.
+        system (str | None): The rendered system prompt, if any.
+
+    Returns:
+        str: The completion.
+    """
+
+    span = _current.get()
+    if span is None:
+        return request()
+
+    queue_wait, prompt_tokens = span.queue_wait, span.prompt_tokens
+    start = _time.perf_counter()
+    try:
+        output = request()
+    finally:
+        with span._lock:
+            span.requests += 1
+            span.network += _time.perf_counter() - start - (span.queue_wait - queue_wait)
+
+    if span.prompt_tokens == prompt_tokens:
+        _estimate(span, model, prompt, system, output)
+
+    return output
+
+
+async def atrace_request(
+    request: Callable[[], Awaitable[str]], model: str, prompt: str, system: str | None
+) -> str:
+    """
+    Time one provider request of the current span and count its tokens.
+
+    Args:
+        request (Callable[[], Awaitable[str]]): Sends the request and returns the completion.
+        model (str): The model name.
+        prompt (str): The rendered prompt.
+        system (str | None): The rendered system prompt, if any.
+
+    Returns:
+        str: The completion.
+    """
+
+    span = _current.get()
+    if span is None:
+        return await request()
+
+    queue_wait, prompt_tokens = span.queue_wait, span.prompt_tokens
+    start = _time.perf_counter()
+    try:
+        output = await request()
+    finally:
+        with span._lock:
+            span.requests += 1
+            span.network += _time.perf_counter() - start - (span.queue_wait - queue_wait)
+
+    if span.prompt_tokens == prompt_tokens:
+        _estimate(span, model, prompt, system, output)
+
+    return output
+
+
+def trace_stream(
+    request: Callable[[], Iterator[str]], model: str, prompt: str, system: str | None
+) -> Iterator[str]:
+    """
+    Time one streamed provider request of the current span and count its tokens.
+
+    Only the time spent waiting for chunks counts as network time, not the time the consumer
+    spends between chunks.
+
+    Args:
+        request (Callable[[], Iterator[str]]): Sends the request and yields the completion chunks.
+        model (str): The model name.
+        prompt (str): The rendered prompt.
+        system (str | None): The rendered system prompt, if any.
+
+    Yields:
+        str: The completion chunks.
+    """
+
+    span = _current.get()
+    if span is None:
+        yield from request()
+        return
+
+    iterator = request()
+    chunks = []
+    span.add("requests", 1)
+    try:
+        while True:
+            queue_wait = span.queue_wait
+            start = _time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                span.add("network", _time.perf_counter() - start - (span.queue_wait - queue_wait))
+
+            chunks.append(chunk)
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+        _estimate(span, model, prompt, system, "".join(chunks))
+
+
+def trace_parse(parse: Callable[[str], Any], output: str) -> Any:
+    # Time spent parsing model outputs, repairs included
+    span = _current.get()
+    if span is None:
+        return parse(output)
+
+    start = _time.perf_counter()
+    try:
+        return parse(output)
+    finally:
+        span.add("parse", _time.perf_counter() - start)
+
+
+def record_usage(prompt_tokens: int | None, completion_tokens: int | None) -> None:
+    # Token usage reported by the provider for the request in progress
+    span = _current.get()
+    if span is None or prompt_tokens is None:
+        return
+
+    with span._lock:
+        span.prompt_tokens += prompt_tokens
+        span.completion_tokens += completion_tokens or 0
+
+
+def record_wait(seconds: float) -> None:
+    # Time spent waiting for a provider limiter slot or rate
+    span = _current.get()
+    if span is not None:
+        span.add("queue_wait", seconds)
+
+
+if _TRACING:
+    configure(
+        enabled=True,
+        exporters=[_tracer.buffer, OpenTelemetryExporter()] if _TRACING_OTEL else None,
+    )
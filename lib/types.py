@@ -1,11 +1,42 @@
-from typing import Literal, TypedDict
+from typing import Any, Literal, TypedDict
 
-__all__ = ["Question", "Evaluation"]
+__all__ = [
+    "UserData",
+    "Message",
+    "SessionState",
+    "Question",
+    "Evaluation",
+    "PackedEvaluation",
+    "CacheStats",
+    "ProviderStats",
+    "PoolStats",
+    "EvaluationProgress",
+    "ResumeSummary",
+    "FailureStats",
+    "RetrievalStats",
+    "Span",
+    "SpanTotals",
+    "Voice",
+    "Transcript",
+    "MemoryState",
+    "FlightStats",
+    "BatchStats",
+    "Job",
+    "JobStats",
+    "Priority",
+    "HistogramStats",
+    "SchedulerStats",
+]
+
+
+Voice = Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
+# Scheduling classes of the provider calls, from the most to the least urgent
+Priority = Literal["question", "evaluation", "batch"]
 
 
 class Question(TypedDict):
     question: str
-    type: Literal["personal", "role-specific", "behavioral", "situational"]
+    type: Literal["personal", "role-specific", "behavioural", "situational"]
 
 
 class Evaluation(TypedDict):
@@ -13,3 +44,193 @@ class Evaluation(TypedDict):
     feedback: str | None
     reason: str | None
     samples: list[str] | None
+
+
+class PackedEvaluation(Evaluation):
+    # One evaluation of a packed request, `id` is the 1-based position of its pair
+    id: int
+
+
+class CacheStats(TypedDict):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    hit_rate: float
+
+
+class ProviderStats(TypedDict):
+    calls: int
+    p50: float | None
+    p95: float | None
+    error_rate: float
+    healthy: bool
+
+
+class FlightStats(TypedDict):
+    calls: int
+    # Calls that waited for an identical call in flight instead of making their own
+    coalesced: int
+    in_flight: int
+
+
+class BatchStats(TypedDict):
+    rows: int
+    # Rows done by a previous run of the job
+    skipped: int
+    failed: int
+    seconds: float
+
+
+class Job(TypedDict):
+    id: int
+    # Idempotency key, submitting the same key again returns this job
+    key: str | None
+    kind: str
+    payload: dict
+    status: Literal["queued", "running", "done", "failed", "cancelled"]
+    attempts: int
+    result: Any
+    error: str | None
+    created_at: float
+    updated_at: float
+
+
+class JobStats(TypedDict):
+    queued: int
+    running: int
+    done: int
+    failed: int
+    cancelled: int
+
+
+class HistogramStats(TypedDict):
+    # Upper bounds of the buckets, the last count is for the values above the last bound
+    bounds: list[float]
+    counts: list[int]
+    count: int
+    sum: float
+    p50: float
+    p95: float
+
+
+class SchedulerStats(TypedDict):
+    in_flight: int
+    waiting: dict[Priority, int]
+    # Tokens of the per-minute budget that can be spent right away, None without a budget
+    tokens_available: float | None
+    # Seconds from the request of a slot to the call, by priority class
+    wait: dict[Priority, HistogramStats]
+    # Calls already waiting when a call requests a slot
+    depth: HistogramStats
+
+
+class PoolStats(TypedDict):
+    requests: int
+    connections: int
+    idle_connections: int
+    active_connections: int
+    http2: bool
+
+
+class EvaluationProgress(TypedDict):
+    total: int
+    pending: int
+    finished: int
+    failed: int
+
+
+class ResumeSummary(TypedDict):
+    sha256: str
+    filename: str
+    characters: int
+    summary: str
+
+
+class FailureStats(TypedDict):
+    transport: int
+    rate_limit: int
+    parse: int
+    repaired: int
+    retries: int
+    deadline_exceeded: int
+    backoff_seconds: float
+
+
+class RetrievalStats(TypedDict):
+    retrieved: int
+    fallbacks: int
+    coverage: float
+
+
+class Span(TypedDict):
+    name: str
+    provider: str
+    model: str
+    session: str | None
+    start: float
+    duration: float
+    queue_wait: float
+    network: float
+    parse: float
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    estimated_tokens: bool
+    cost: float
+    error: str | None
+
+
+class SpanTotals(TypedDict):
+    calls: int
+    errors: int
+    requests: int
+    duration: float
+    queue_wait: float
+    network: float
+    parse: float
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+
+
+class UserData(TypedDict):
+    fullname: str
+    role: str
+    experience: int | float
+    about: str
+    resume: ResumeSummary | None
+
+
+class Message(TypedDict):
+    # "system" only in the model views of a conversation, see lib.memory
+    role: Literal["system", "user", "assistant"]
+    content: str
+
+
+class MemoryState(TypedDict):
+    # Running summary of the messages before `summarized`, the older turns of the conversation
+    summary: str
+    summarized: int
+
+
+class SessionState(TypedDict):
+    id: str
+    phase: Literal["greet", "generate", "ask", "collect", "evaluate", "close"]
+    user_data: UserData | None
+    questions: list[Question]
+    # False while the questions are still being generated, even in a state saved meanwhile
+    generated: bool
+    answers: list[str]
+    evaluations: list[Evaluation | None]
+    messages: list[Message]
+    memory: MemoryState
+
+
+class Transcript(TypedDict):
+    text: str
+    # False for the partial transcripts of an utterance still being spoken
+    final: bool
+    # Seconds since the start of the audio stream
+    start: float
+    end: float
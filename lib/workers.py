@@ -0,0 +1,147 @@
+import contextvars as _contextvars
+import threading as _threading
+from collections.abc import Iterator as _IteratorABC
+from concurrent.futures import Future as _Future
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+from lib.configs import MAX_CONCURRENCY as _MAX_CONCURRENCY
+from lib.configs import WORKER_THREADS as _WORKER_THREADS
+from lib.limits import current_priority as _current_priority
+from lib.types import Priority
+
+__all__ = ["BackgroundTask", "get_executor"]
+
+_executors: dict[Priority, _ThreadPoolExecutor] = {}
+_executor_lock = _threading.Lock()
+
+
+def get_executor(priority: Priority | None = None) -> _ThreadPoolExecutor:
+    """
+    Get the process-wide worker pool of a priority class for background agent calls.
+
+    Each class has its own pool, so a question never queues behind evaluations that hold their
+    threads while waiting for the provider budget, and the limiter alone orders the classes.
+    A pool has at least as many threads as the provider calls allowed in flight.
+
+    Args:
+        priority (Priority | None, optional): The priority class. Defaults to the current one,
+            see lib.limits.scheduling.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+
+    if priority is None:
+        priority = _current_priority()
+
+    with _executor_lock:
+        if priority not in _executors:
+            _executors[priority] = _ThreadPoolExecutor(
+                max_workers=max(_WORKER_THREADS, *_MAX_CONCURRENCY.values()),
+                thread_name_prefix=f"agent-{priority}",
+            )
+
+        return _executors[priority]
+
+
+class BackgroundTask:
+    def __init__(self, fn: Callable, *args, **kwargs):
+        """
+        Run a function in the shared worker pool of the current priority class.
+
+        When the function returns an iterator, e.g. an agent `stream()`, the worker consumes it
+        and collects the items, which are readable while the rest is still being produced.
+        Cancelling stops the iteration at the next item and closes the iterator.
+
+        Args:
+            fn (Callable): The function to run.
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+        """
+
+        self.items: list = []
+        self._cancelled = _threading.Event()
+        self._condition = _threading.Condition()
+        # The function runs in a copy of the caller's context, e.g. its tracing session
+        context = _contextvars.copy_context()
+        self._future: _Future = get_executor().submit(context.run, self._run, fn, args, kwargs)
+        self._future.add_done_callback(self._notify)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        self._future.cancel()
+
+    def result(self, timeout: float | None = None) -> Any:
+        """
+        Wait for the task to finish.
+
+        Args:
+            timeout (float | None, optional): Seconds to wait, None waits forever. Defaults to None.
+
+        Returns:
+            Any: The function result, the collected items for iterators, or None if the task failed or was cancelled.
+        """
+
+        if self._future.cancelled():
+            return None
+
+        try:
+            return self._future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def iter_items(self) -> Iterator[Any]:
+        """
+        Yield the collected items as they are produced, until the task finishes.
+
+        Yields:
+            Any: The items of the iterator returned by the function.
+        """
+
+        i = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self.items) > i or self._future.done())
+
+                if len(self.items) <= i:
+                    return
+
+                item = self.items[i]
+
+            i += 1
+            yield item
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        if self.cancelled:
+            return None
+
+        result = fn(*args, **kwargs)
+        if not isinstance(result, _IteratorABC):
+            return result
+
+        try:
+            for item in result:
+                if self.cancelled:
+                    return None
+
+                with self._condition:
+                    self.items.append(item)
+                    self._condition.notify_all()
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+
+        return self.items
+
+    def _notify(self, future: _Future) -> None:
+        with self._condition:
+            self._condition.notify_all()
@@ -0,0 +1,5 @@
+import os
+
+# The config is read on import, enable OpenAI for the agents of the tests, whose requests are
+# patched to mock providers
+os.environ.setdefault("OPENAI_API_KEY", "mock")
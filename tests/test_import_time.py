@@ -0,0 +1,36 @@
+import importlib.util
+import statistics
+
+import pytest
+
+from benchmarks.import_time import BUDGETS, LAZY, first_agent, import_time
+
+RUNS = 3
+MODULES = [name for name in BUDGETS if name != "first agent"]
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_within_budget(module):
+    runs = [import_time(module) for _ in range(RUNS)]
+
+    median = statistics.median(elapsed for elapsed, _ in runs)
+    assert median <= BUDGETS[module], f"{module} took {median:.1f}ms"
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_loads_no_sdk(module):
+    _, loaded = import_time(module)
+
+    assert not [name for name in LAZY if name in loaded]
+
+
+@pytest.mark.skipif(importlib.util.find_spec("openai") is None, reason="needs the OpenAI SDK")
+def test_first_agent_within_budget_and_loads_only_its_sdk():
+    runs = [first_agent() for _ in range(RUNS)]
+
+    median = statistics.median(elapsed for elapsed, _ in runs)
+    assert median <= BUDGETS["first agent"], f"the first agent took {median:.1f}ms"
+
+    # Only OpenAI is enabled, the SDKs of the disabled providers stay unloaded
+    _, loaded = runs[0]
+    assert not [name for name in LAZY if name not in ("openai", "httpx") and name in loaded]
@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from lib.router import RouterAgent
+
+
+class FakeAgent:
+    def __init__(self, provider: str, latencies: list[float], fails: bool = False):
+        """
+        A provider answering after scripted latencies, the last one repeated.
+
+        Args:
+            provider (str): The provider name the router reports.
+            latencies (list[float]): The latency in seconds of each call.
+            fails (bool, optional): Raise instead of answering. Defaults to False.
+        """
+
+        self.provider = provider
+        self.fails = fails
+        self.calls = 0
+        # When each call started, on the clock of the hedge timers
+        self.started: list[float] = []
+        self._latencies = itertools.chain(latencies, itertools.repeat(latencies[-1]))
+
+    def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        self.started.append(time.monotonic())
+        time.sleep(next(self._latencies))
+        if self.fails:
+            raise RuntimeError(f"{self.provider} is down")
+
+        return f"{self.provider}: {prompt}"
+
+    async def arun(self, prompt: str) -> str:
+        self.calls += 1
+        self.started.append(time.monotonic())
+        await asyncio.sleep(next(self._latencies))
+        if self.fails:
+            raise RuntimeError(f"{self.provider} is down")
+
+        return f"{self.provider}: {prompt}"
+
+
+class _NoneAgent:
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> None:
+        self.calls += 1
+
+        return None
+
+    async def arun(self, prompt: str) -> None:
+        self.calls += 1
+
+        return None
+
+
+def _warm_up(router: RouterAgent) -> None:
+    # Until every agent has `min_samples` calls, the unmeasured ones are tried first
+    for _ in range(router.min_samples * len(router.agents)):
+        router.run("warm up")
+
+
+def test_routes_to_the_fastest_healthy_provider():
+    slow = FakeAgent("slow", [0.03])
+    fast = FakeAgent("fast", [0.001])
+    medium = FakeAgent("medium", [0.015])
+    router = RouterAgent([slow, fast, medium], min_samples=3)
+
+    _warm_up(router)
+    assert [agent.calls for agent in (slow, fast, medium)] == [3, 3, 3]
+
+    for _ in range(5):
+        assert router.run("question") == "fast: question"
+
+    assert (slow.calls, fast.calls, medium.calls) == (3, 8, 3)
+    assert router.stats()["fast"]["p50"] < router.stats()["medium"]["p50"]
+
+
+def test_routes_away_from_a_provider_that_slows_down():
+    drifting = FakeAgent("drifting", [0.001] * 3 + [0.04])
+    steady = FakeAgent("steady", [0.01])
+    router = RouterAgent([drifting, steady], min_samples=3, window=3)
+
+    _warm_up(router)
+    assert router.run("question") == "drifting: question"
+
+    # Once its rolling p50 passes the other provider, calls move over
+    for _ in range(3):
+        router.run("question")
+
+    calls = steady.calls
+    assert router.run("question") == "steady: question"
+    assert steady.calls == calls + 1
+
+
+@pytest.mark.parametrize(
+    "broken",
+    [FakeAgent("broken", [0.001], fails=True), _NoneAgent("broken")],
+    ids=["raises", "returns-none"],
+)
+def test_fails_over_on_errors(broken):
+    backup = FakeAgent("backup", [0.005])
+    router = RouterAgent([broken, backup], min_samples=3, cooldown=60.0)
+
+    for _ in range(3):
+        assert router.run("question") == "backup: question"
+
+    assert broken.calls == 3
+    assert router.stats()["broken"]["error_rate"] == 1.0
+    assert not router.stats()["broken"]["healthy"]
+
+    # Unhealthy providers rank last, calls go straight to the backup until the cooldown
+    for _ in range(3):
+        assert router.run("question") == "backup: question"
+
+    assert broken.calls == 3
+
+
+def test_returns_none_when_every_provider_fails():
+    router = RouterAgent([FakeAgent("a", [0.001], fails=True), _NoneAgent("b")])
+
+    assert router.run("question") is None
+    assert all(stats["error_rate"] == 1.0 for stats in router.stats().values())
+
+
+def _assert_hedged(primary: FakeAgent, secondary: FakeAgent, calls: int, p95: float) -> None:
+    assert secondary.calls == calls + 1
+
+    # Timers may wake up to a millisecond early
+    assert secondary.started[-1] - primary.started[-1] >= p95 - 1e-3
+
+
+def test_hedge_fires_after_the_p95_delay():
+    primary = FakeAgent("primary", [0.01] * 3 + [1.0])
+    secondary = FakeAgent("secondary", [0.05] * 3 + [0.01])
+    router = RouterAgent([primary, secondary], hedge=True, min_samples=3)
+
+    _warm_up(router)
+    p95 = router.trackers["primary"].quantile(0.95)
+    calls = secondary.calls
+
+    # The primary stalls, the secondary is called once the primary passes its p95
+    assert router.run("question") == "secondary: question"
+    _assert_hedged(primary, secondary, calls, p95)
+
+
+def test_hedge_not_sent_within_the_p95_delay():
+    primary = FakeAgent("primary", [0.001, 0.001, 0.3, 0.001])
+    secondary = FakeAgent("secondary", [0.05])
+    router = RouterAgent([primary, secondary], hedge=True, min_samples=3)
+
+    _warm_up(router)
+    calls = secondary.calls
+
+    for _ in range(3):
+        assert router.run("question") == "primary: question"
+
+    assert secondary.calls == calls
+
+
+def test_async_hedge_fires_after_the_p95_delay():
+    primary = FakeAgent("primary", [0.01] * 3 + [1.0])
+    secondary = FakeAgent("secondary", [0.05] * 3 + [0.01])
+    router = RouterAgent([primary, secondary], hedge=True, min_samples=3)
+
+    async def main() -> tuple[list[str], float, int, str]:
+        warm_up = [await router.arun("warm up") for _ in range(6)]
+        p95 = router.trackers["primary"].quantile(0.95)
+        calls = secondary.calls
+
+        return warm_up, p95, calls, await router.arun("question")
+
+    warm_up, p95, calls, result = asyncio.run(main())
+
+    assert warm_up.count("primary: warm up") == 3
+    assert result == "secondary: question"
+    _assert_hedged(primary, secondary, calls, p95)
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lib.agents import OpenAIConversationSummaryAgent
+from lib.singleflight import SingleFlight
+
+N = 16
+LATENCY = 0.2
+
+
+class MockProvider:
+    # A slow provider counting the calls that reach it
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(LATENCY)
+
+        return "answer"
+
+    async def acall(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(LATENCY)
+
+        return "answer"
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    # A public agent whose provider requests go to the slow mock provider
+    pytest.importorskip("openai")
+
+    mock = MockProvider()
+    agent_cls = OpenAIConversationSummaryAgent
+    monkeypatch.setattr(agent_cls, "_request", lambda self, *args: mock())
+    monkeypatch.setattr(agent_cls, "_arequest", lambda self, *args: mock.acall())
+
+    agent = OpenAIConversationSummaryAgent()
+    agent.flight = SingleFlight()
+    agent.mock = mock
+
+    return agent
+
+
+def _threaded(fn) -> list:
+    # Every thread calls at once, while the first call is still in flight
+    barrier = threading.Barrier(N)
+    results = [None] * N
+
+    def worker(i: int) -> None:
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(N)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def _gathered(fn) -> list:
+    async def main() -> list:
+        return await asyncio.gather(*(fn() for _ in range(N)))
+
+    return asyncio.run(main())
+
+
+def test_threaded_calls_coalesce():
+    flight = SingleFlight()
+    provider = MockProvider()
+
+    results = _threaded(lambda: flight.do("request", provider))
+
+    assert results == ["answer"] * N
+    assert provider.calls == 1
+    assert flight.stats() == {"calls": N, "coalesced": N - 1, "in_flight": 0}
+
+
+def test_async_calls_coalesce():
+    flight = SingleFlight()
+    provider = MockProvider()
+
+    results = _gathered(lambda: flight.ado("request", provider.acall))
+
+    assert results == ["answer"] * N
+    assert provider.calls == 1
+    assert flight.stats() == {"calls": N, "coalesced": N - 1, "in_flight": 0}
+
+
+def test_threaded_agent_calls_make_one_provider_call(agent):
+    results = _threaded(lambda: agent.run("", "Interviewer: Tell me about yourself"))
+
+    assert results == ["answer"] * N
+    assert agent.mock.calls == 1
+    assert agent.flight.stats()["coalesced"] == N - 1
+
+
+def test_async_agent_calls_make_one_provider_call(agent):
+    results = _gathered(lambda: agent.arun("", "Interviewer: Tell me about yourself"))
+
+    assert results == ["answer"] * N
+    assert agent.mock.calls == 1
+    assert agent.flight.stats()["coalesced"] == N - 1
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    provider = MockProvider()
+    keys = iter(range(N))
+    lock = threading.Lock()
+
+    def call() -> str:
+        with lock:
+            key = next(keys)
+        return flight.do(key, provider)
+
+    _threaded(call)
+
+    assert provider.calls == N
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_waiters_get_the_error_of_the_call():
+    flight = SingleFlight()
+    calls = []
+
+    def fail() -> None:
+        calls.append(1)
+        time.sleep(LATENCY)
+        raise RuntimeError("provider is down")
+
+    def call() -> BaseException | None:
+        try:
+            flight.do("request", fail)
+        except RuntimeError as error:
+            return error
+
+    errors = _threaded(call)
+
+    assert len(calls) == 1
+    assert all(isinstance(error, RuntimeError) for error in errors)
+
+
+def test_later_calls_are_not_coalesced():
+    flight = SingleFlight()
+    provider = MockProvider()
+
+    flight.do("request", provider)
+    flight.do("request", provider)
+
+    assert provider.calls == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_streams_replay_to_every_caller():
+    flight = SingleFlight()
+    calls = []
+
+    def stream():
+        calls.append(1)
+        for chunk in ("a", "b", "c"):
+            time.sleep(LATENCY / 4)
+            yield chunk
+
+    results = _threaded(lambda: list(flight.iterate("request", stream)))
+
+    assert len(calls) == 1
+    assert results == [["a", "b", "c"]] * N
+    assert flight.stats()["coalesced"] == N - 1